@@ -4,8 +4,9 @@ from .views import (
     ResumeViewSet, JobDescriptionViewSet, home, api_root, RegisterView, 
     api_info,
     LoginView, LogoutView, PasswordResetRequestView, PasswordResetConfirmView,
-    ChangePasswordView, UserProfileView, DashboardStatsView,analyze_resume_job,
-    google_login,google_callback,GenerateResumeAPIView,AnalyzeSpeech
+    ChangePasswordView, UserProfileView, DashboardStatsView,analyze_resume_job,analyze_batch,analyze_resume_job_async,
+    google_login,google_callback,GenerateResumeAPIView,AnalyzeSpeech,CacheStatsView,metrics,
+    generate_resume_async,analyze_speech_async,
 )
 from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
 
@@ -46,12 +47,18 @@ urlpatterns = [
     
     #analysis result
     path('api/analyze/',analyze_resume_job,name='analyze_resume_job'),
+    path('api/analyze/batch/',analyze_batch,name='analyze_batch'),
+    path('api/analyze/async/',analyze_resume_job_async,name='analyze_resume_job_async'),
 
 
     path("api/auth/google/login/",google_login, name="google_login"),
     path("api/auth/google/callback/", google_callback, name="google_callback"),
     path("api/generate-resume/",GenerateResumeAPIView.as_view(),name="generate_resume"),
+    path("api/generate-resume/async/",generate_resume_async,name="generate_resume_async"),
+    path("api/cache/stats/",CacheStatsView.as_view(),name="cache_stats"),
+    path("api/metrics/",metrics,name="metrics"),
     path("api/speak-assessment/",AnalyzeSpeech.as_view(),name="speak_assessment"),
+    path("api/speak-assessment/async/",analyze_speech_async,name="speak_assessment_async"),
 ]
 
 
@@ -1,14 +1,26 @@
 from django.contrib import admin
-from .models import Resume, JobDescription, UserProfile, AnalysisResult, PasswordResetToken
+from django.http import FileResponse, Http404
+from django.shortcuts import get_object_or_404
+from django.urls import path, reverse
+from django.utils.html import format_html
+from .models import Resume, JobDescription, UserProfile, AnalysisResult, PasswordResetToken, ProcessingTask, RequestProfile
+from .profiling import summarize
 
 @admin.register(Resume)
 class ResumeAdmin(admin.ModelAdmin):
-    list_display = ['id', 'user', 'file', 'uploaded_at', 'file_size_mb', 'processing_status']
+    list_display = ['id', 'user', 'file_name', 'uploaded_at', 'file_size_mb', 'processing_status']
     list_filter = ['processing_status', 'uploaded_at', 'file_type']
-    search_fields = ['user__username', 'file']
+    search_fields = ['user__username', 'file_name', 'file_sha256']
     readonly_fields = ['uploaded_at', 'updated_at', 'file_size_mb']
     date_hierarchy = 'uploaded_at'
 
+    def get_queryset(self, request):
+        queryset = super().get_queryset(request)
+        # The changelist only shows metadata; change forms also need the text
+        if request.resolver_match and request.resolver_match.url_name.endswith('_changelist'):
+            return queryset.summary()
+        return queryset.with_text()
+
 @admin.register(JobDescription)
 class JobDescriptionAdmin(admin.ModelAdmin):
     list_display = ['id', 'title', 'company', 'user', 'job_type', 'uploaded_at', 'analysis_status']
@@ -17,6 +29,12 @@ class JobDescriptionAdmin(admin.ModelAdmin):
     readonly_fields = ['uploaded_at', 'updated_at']
     date_hierarchy = 'uploaded_at'
 
+    def get_queryset(self, request):
+        queryset = super().get_queryset(request)
+        if request.resolver_match and request.resolver_match.url_name.endswith('_changelist'):
+            return queryset.summary()
+        return queryset
+
 @admin.register(UserProfile)
 class UserProfileAdmin(admin.ModelAdmin):
     list_display = ['id', 'user', 'phone', 'is_verified', 'created_at', 'last_login']
@@ -26,15 +44,79 @@ class UserProfileAdmin(admin.ModelAdmin):
 
 @admin.register(AnalysisResult)
 class AnalysisResultAdmin(admin.ModelAdmin):
-    list_display = ['id', 'user', 'analysis_type', 'resume', 'job', 'created_at']
+    list_display = ['id', 'user', 'analysis_type', 'resume', 'job', 'match_percent', 'duration_ms', 'created_at']
     list_filter = ['analysis_type', 'created_at']
-    search_fields = ['user__username', 'resume__file', 'job__title']
+    search_fields = ['user__username', 'resume__file_name', 'job__title']
     readonly_fields = ['created_at', 'updated_at']
     date_hierarchy = 'created_at'
 
+    def get_queryset(self, request):
+        queryset = super().get_queryset(request).select_related('user', 'resume__user', 'job')
+        queryset = queryset.defer('resume__file', 'resume__parsed_text', 'job__description', 'job__requirements')
+        if request.resolver_match and request.resolver_match.url_name.endswith('_changelist'):
+            return queryset.summary()
+        return queryset
+
 @admin.register(PasswordResetToken)
 class PasswordResetTokenAdmin(admin.ModelAdmin):
     list_display = ['id', 'user', 'is_used', 'created_at', 'expires_at']
     list_filter = ['is_used', 'created_at', 'expires_at']
     search_fields = ['user__username', 'user__email', 'token']
     readonly_fields = ['created_at']
+
+@admin.register(ProcessingTask)
+class ProcessingTaskAdmin(admin.ModelAdmin):
+    list_display = ['id', 'task_type', 'resume', 'status', 'attempts', 'run_after', 'created_at']
+    list_filter = ['task_type', 'status', 'created_at']
+    search_fields = ['resume__user__username', 'resume__file_name', 'last_error']
+    readonly_fields = ['created_at', 'updated_at', 'locked_at']
+
+
+@admin.register(RequestProfile)
+class RequestProfileAdmin(admin.ModelAdmin):
+    list_display = ['id', 'created_at', 'method', 'path', 'view_name', 'status_code', 'duration_ms', 'trigger',
+                    'user', 'size_bytes', 'download_link']
+    list_filter = ['view_name', 'trigger', 'created_at']
+    search_fields = ['path', 'user__username', 'file_name']
+    readonly_fields = ['file_name', 'view_name', 'method', 'path', 'user', 'trigger', 'status_code', 'duration_ms',
+                       'size_bytes', 'created_at', 'download_link', 'top_functions']
+    date_hierarchy = 'created_at'
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def get_urls(self):
+        return [
+            path('<int:pk>/download/', self.admin_site.admin_view(self.download), name='analysis_requestprofile_download'),
+        ] + super().get_urls()
+
+    def download(self, request, pk):
+        profile = get_object_or_404(RequestProfile, pk=pk)
+        try:
+            return FileResponse(open(profile.file_path, 'rb'), as_attachment=True, filename=profile.file_name)
+        except FileNotFoundError:
+            raise Http404("The profile file has been rotated away.")
+
+    @admin.display(description='File')
+    def download_link(self, obj):
+        return format_html('<a href="{}">{}</a>', reverse('admin:analysis_requestprofile_download', args=[obj.pk]),
+                           'Download .prof')
+
+    @admin.display(description='Top functions (cumulative)')
+    def top_functions(self, obj):
+        try:
+            return format_html('<pre>{}</pre>', summarize(obj.file_path))
+        except FileNotFoundError:
+            return 'The profile file has been rotated away.'
+
+    def delete_model(self, request, obj):
+        obj.delete_file()
+        super().delete_model(request, obj)
+
+    def delete_queryset(self, request, queryset):
+        for profile in queryset:
+            profile.delete_file()
+        super().delete_queryset(request, queryset)
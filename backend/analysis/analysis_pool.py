@@ -0,0 +1,110 @@
+"""
+Process pool for CPU-bound analysis from async views
+
+Async views must not run spaCy on the event loop, and threads would still
+share one GIL. analyze_gap is therefore sent to a bounded ProcessPoolExecutor
+whose workers load the model and skill matchers once when they start. At most
+ANALYSIS_POOL_MAX_PENDING analyses may be queued or running at a time; beyond
+that run_analysis() raises PoolSaturated so the view can answer 429 instead of
+letting the queue (and latency) grow without bound.
+"""
+import asyncio
+import logging
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+
+class PoolSaturated(Exception):
+    """Too many analyses are already queued or running"""
+
+
+def _init_worker():
+    """Runs once in every pool process before it takes work"""
+    import django
+    from django.apps import apps
+
+    if not apps.ready:
+        django.setup()
+
+    from .nlp_module.nlp_setup import warm_up
+
+    warm_up()
+
+
+def _run_analysis(resume_text, job_text, resume_skills, job_skills):
+    from .nlp_module.job_resume_analyzer import analyze_gap
+
+    started = time.perf_counter()
+    result = analyze_gap(resume_text, job_text, resume_skills=resume_skills, job_skills=job_skills)
+    return result, round((time.perf_counter() - started) * 1000)
+
+
+_pool = None
+_pending = 0
+_lock = threading.Lock()
+
+
+def _get_pool():
+    global _pool
+    with _lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(
+                max_workers=settings.ANALYSIS_POOL_WORKERS,
+                initializer=_init_worker,
+            )
+        return _pool
+
+
+def _reset_pool():
+    global _pool
+    with _lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+
+
+def pending():
+    """Analyses currently queued or running in this server process"""
+    return _pending
+
+
+async def run_analysis(resume_text, job_text, resume_skills=None, job_skills=None):
+    """
+    Run analyze_gap in the pool and return (result, duration_ms)
+
+    Raises PoolSaturated when ANALYSIS_POOL_MAX_PENDING analyses are already
+    in flight, and asyncio.TimeoutError after ANALYSIS_POOL_TIMEOUT seconds.
+    """
+    global _pending
+    with _lock:
+        if _pending >= settings.ANALYSIS_POOL_MAX_PENDING:
+            raise PoolSaturated()
+        _pending += 1
+
+    try:
+        future = _get_pool().submit(_run_analysis, resume_text, job_text, resume_skills, job_skills)
+    except BaseException:
+        _release()
+        raise
+    # The slot is given back when the pool is really done with the analysis:
+    # after a timeout it may still be running and still counts as pending
+    future.add_done_callback(_release)
+
+    try:
+        return await asyncio.wait_for(asyncio.wrap_future(future), timeout=settings.ANALYSIS_POOL_TIMEOUT)
+    except BrokenProcessPool:
+        logger.error("Analysis pool crashed; it will be recreated on the next request.", exc_info=True)
+        _reset_pool()
+        raise
+
+
+def _release(future=None):
+    global _pending
+    with _lock:
+        _pending -= 1
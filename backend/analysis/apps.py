@@ -4,3 +4,11 @@ from django.apps import AppConfig
 class AnalysisConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "analysis"
+
+    def ready(self):
+        from django.db.backends.signals import connection_created
+
+        from .instrumentation import install_query_counter
+
+        # Queries are counted per request by InstrumentationMiddleware
+        connection_created.connect(install_query_counter, dispatch_uid="analysis.count_queries")
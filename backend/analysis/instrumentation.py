@@ -0,0 +1,205 @@
+"""
+Lightweight request instrumentation
+
+InstrumentationMiddleware opens a RequestTimings for every request. Every
+database connection carries the count_current_query() wrapper (installed by
+AnalysisConfig.ready()), which charges each query to the request of the
+current context; this also covers queries an async view runs through
+sync_to_async in another thread. Code on the hot path marks stages with `stage()`,
+used as a context manager or decorator:
+
+    with stage("db_fetch"):
+        resume = Resume.objects.get(...)
+
+    @stage("extract_skills")
+    def extract_skills(text): ...
+
+Each stage records its duration and the queries it ran. The middleware then
+reports the request in three ways:
+- a Server-Timing header, shown in the browser devtools;
+- one structured (JSON) log line on the "analysis.requests" logger;
+- the process-wide histograms below, rendered in Prometheus text format by
+  the /api/metrics/ endpoint.
+Stages outside a request (management commands, the analysis pool) still
+feed the histograms.
+
+Metrics live in process memory; with several gunicorn workers each worker
+keeps and serves its own numbers.
+"""
+import bisect
+import functools
+import threading
+import time
+from contextvars import ContextVar
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100)
+
+
+class Histogram:
+    """Cumulative-bucket histogram keyed by a tuple of label values"""
+
+    def __init__(self, name, documentation, labels, buckets):
+        self.name = name
+        self.documentation = documentation
+        self.labels = labels
+        self.buckets = tuple(buckets)
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, *label_values):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = self._series[label_values] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def snapshot(self, *label_values):
+        """(cumulative bucket counts, sum, count) for one label set"""
+        with self._lock:
+            counts, total, count = self._series.get(label_values, [[0] * (len(self.buckets) + 1), 0.0, 0])
+            return [sum(counts[:i + 1]) for i in range(len(counts))], total, count
+
+    def clear(self):
+        with self._lock:
+            self._series.clear()
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            series = sorted(self._series.items())
+        for label_values, (counts, total, count) in series:
+            labels = ",".join(f'{name}="{_escape(value)}"' for name, value in zip(self.labels, label_values))
+            prefix = labels + "," if labels else ""
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + ("+Inf",), counts):
+                cumulative += bucket_count
+                lines.append(f'{self.name}_bucket{{{prefix}le="{bound}"}} {cumulative}')
+            suffix = f"{{{labels}}}" if labels else ""
+            lines.append(f"{self.name}_sum{suffix} {total}")
+            lines.append(f"{self.name}_count{suffix} {count}")
+        return "\n".join(lines)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+REQUEST_DURATION = Histogram(
+    "http_request_duration_seconds", "Time spent handling a request.",
+    ("method", "view", "status"), DURATION_BUCKETS,
+)
+REQUEST_QUERIES = Histogram(
+    "http_request_db_queries", "SQL queries run while handling a request.",
+    ("method", "view"), QUERY_BUCKETS,
+)
+STAGE_DURATION = Histogram(
+    "stage_duration_seconds", "Time spent in an instrumented stage.",
+    ("stage",), DURATION_BUCKETS,
+)
+METRICS = (REQUEST_DURATION, REQUEST_QUERIES, STAGE_DURATION)
+
+
+def render_metrics():
+    """All histograms in the Prometheus text exposition format"""
+    return "\n".join(metric.render() for metric in METRICS) + "\n"
+
+
+class RequestTimings:
+    """Stages and SQL queries of the request being handled"""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.query_seconds = 0.0
+        # name -> [total ms, calls, queries]; repeated stages are summed
+        self.stages = {}
+
+    def add_stage(self, name, seconds, queries):
+        entry = self.stages.setdefault(name, [0.0, 0, 0])
+        entry[0] += seconds * 1000
+        entry[1] += 1
+        entry[2] += queries
+
+    def count_query(self, execute, sql, params, many, context):
+        """connection.execute_wrapper() hook"""
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.query_seconds += time.perf_counter() - started
+            self.queries += 1
+
+    def elapsed_ms(self):
+        return (time.perf_counter() - self.started) * 1000
+
+    def server_timing(self):
+        """Value of the Server-Timing header"""
+        metrics = [f'db;dur={self.query_seconds * 1000:.1f};desc="{self.queries} queries"']
+        for name, (ms, calls, queries) in self.stages.items():
+            metrics.append(f'{name};dur={ms:.1f}' + (f';desc="{calls} calls"' if calls > 1 else ""))
+        metrics.append(f"total;dur={self.elapsed_ms():.1f}")
+        return ", ".join(metrics)
+
+
+_current = ContextVar("request_timings", default=None)
+
+
+def current_timings():
+    """The RequestTimings of the request being handled, or None"""
+    return _current.get()
+
+
+class stage:
+    """Time a block or function as a named stage (see module docstring)"""
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        timings = _current.get()
+        self._queries = timings.queries if timings is not None else 0
+        self._started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        seconds = time.perf_counter() - self._started
+        STAGE_DURATION.observe(seconds, self.name)
+        timings = _current.get()
+        if timings is not None:
+            timings.add_stage(self.name, seconds, timings.queries - self._queries)
+        return False
+
+    def __call__(self, func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with stage(self.name):
+                return func(*args, **kwargs)
+        return wrapper
+
+
+def count_current_query(execute, sql, params, many, context):
+    """execute_wrapper hook charging the query to the current request, if any"""
+    timings = _current.get()
+    if timings is None:
+        return execute(sql, params, many, context)
+    return timings.count_query(execute, sql, params, many, context)
+
+
+def install_query_counter(sender, connection, **kwargs):
+    """connection_created receiver adding count_current_query() once per connection"""
+    if count_current_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(count_current_query)
+
+
+def start_request():
+    """Begin timing a request; returns (timings, token for finish_request)"""
+    timings = RequestTimings()
+    return timings, _current.set(timings)
+
+
+def finish_request(token):
+    _current.reset(token)
@@ -0,0 +1,310 @@
+"""
+Shared OpenAI access for the resume generation and speech views
+
+One pooled HTTP client per process (sync and async flavours) is reused for
+every call instead of opening a connection per request. Every call:
+
+- has a connect/read timeout (OPENAI_CONNECT_TIMEOUT / OPENAI_TIMEOUT),
+- waits for one of OPENAI_MAX_CONCURRENCY slots, giving up with LLMBusy after
+  OPENAI_QUEUE_TIMEOUT seconds so a slow upstream can't absorb every worker.
+  The slots live in the OPENAI_SLOT_CACHE cache, so the cap holds across all
+  gunicorn workers rather than per process (see SharedSlots),
+- is retried up to OPENAI_MAX_RETRIES times on timeouts, connection errors,
+  429s and 5xx responses, with exponential backoff and full jitter,
+- fits, slot wait and retries included, in one Deadline of
+  OPENAI_REQUEST_DEADLINE seconds, kept below the gunicorn worker timeout.
+  A view making several calls passes one Deadline to all of them.
+
+OPENAI_BASE_URL points the clients at another server, such as the local stub
+in analysis/openai_stub.py used by tests and load tests.
+"""
+import asyncio
+import logging
+import random
+import threading
+import time
+import uuid
+import weakref
+
+import httpx
+import openai
+from django.conf import settings
+from django.core.cache import caches
+
+logger = logging.getLogger(__name__)
+
+RETRYABLE_ERRORS = (
+    openai.APITimeoutError,
+    openai.APIConnectionError,
+    openai.RateLimitError,
+    openai.InternalServerError,
+)
+
+
+class LLMBusy(Exception):
+    """No concurrency slot became free within OPENAI_QUEUE_TIMEOUT"""
+
+
+class LLMDeadlineExceeded(Exception):
+    """The request's Deadline ran out before OpenAI answered"""
+
+
+class Deadline:
+    """One time budget shared by every OpenAI call a request makes"""
+
+    def __init__(self, seconds=None):
+        if seconds is None:
+            seconds = settings.OPENAI_REQUEST_DEADLINE
+        self.expires = time.monotonic() + seconds
+
+    def remaining(self):
+        return max(0.0, self.expires - time.monotonic())
+
+    def check(self):
+        """Seconds left, raising LLMDeadlineExceeded if there are none"""
+        remaining = self.remaining()
+        if remaining <= 0:
+            raise LLMDeadlineExceeded()
+        return remaining
+
+
+def _timeout(read=None):
+    read = settings.OPENAI_TIMEOUT if read is None else min(read, settings.OPENAI_TIMEOUT)
+    return httpx.Timeout(read, connect=min(read, settings.OPENAI_CONNECT_TIMEOUT))
+
+
+def _limits():
+    return httpx.Limits(
+        max_connections=settings.OPENAI_MAX_CONNECTIONS,
+        max_keepalive_connections=settings.OPENAI_MAX_CONNECTIONS,
+    )
+
+
+def _client_options():
+    if not settings.OPENAI_API_KEY:
+        raise ValueError("OPENAI_API_KEY is not set in settings")
+    return {
+        "api_key": settings.OPENAI_API_KEY,
+        "base_url": settings.OPENAI_BASE_URL,
+        "timeout": _timeout(),
+        # Retries are done here, with jitter and inside the concurrency slot
+        "max_retries": 0,
+    }
+
+
+def backoff_delay(attempt):
+    """Full-jitter exponential backoff: uniform in [0, base * 2**attempt], capped"""
+    ceiling = min(settings.OPENAI_RETRY_MAX_DELAY, settings.OPENAI_RETRY_BASE_DELAY * 2 ** attempt)
+    return random.uniform(0, ceiling)
+
+
+class SharedSlots:
+    """
+    A fixed number of slots shared by every process through a Django cache
+
+    Taking a slot is cache.add() of one of `size` keys, which only one caller
+    can win. Keys expire after `lease` seconds, so a worker killed mid-call
+    can't hold its slot forever. The cache has to be one all workers see,
+    such as the "llm" database cache; a locmem alias only limits its process.
+
+    Waiting callers poll with jittered exponential backoff, from
+    poll_interval up to max_poll_interval, so a queue of waiters doesn't turn
+    into a steady stream of cache queries.
+    """
+
+    poll_interval = 0.05
+    max_poll_interval = 1.0
+
+    def __init__(self, cache, size, lease, prefix="openai-slot"):
+        self.cache = cache
+        self.lease = lease
+        self.keys = [f"{prefix}:{i}" for i in range(size)]
+
+    def _free_keys(self, taken):
+        keys = [key for key in self.keys if key not in taken]
+        random.shuffle(keys)
+        return keys
+
+    def try_acquire(self):
+        """(key, token) of a slot taken now, or None if all are in use"""
+        token = uuid.uuid4().hex
+        for key in self._free_keys(self.cache.get_many(self.keys)):
+            if self.cache.add(key, token, self.lease):
+                return key, token
+        return None
+
+    def _delays(self, timeout):
+        """Sleeps between attempts, ending when timeout seconds have passed"""
+        deadline = time.monotonic() + timeout
+        interval = self.poll_interval
+        while time.monotonic() < deadline:
+            yield min(random.uniform(interval / 2, interval), max(0, deadline - time.monotonic()))
+            interval = min(self.max_poll_interval, interval * 2)
+
+    def acquire(self, timeout):
+        """A slot, waiting up to timeout seconds for one; None if none came free"""
+        slot = self.try_acquire()
+        for delay in self._delays(timeout):
+            if slot is not None:
+                break
+            time.sleep(delay)
+            slot = self.try_acquire()
+        return slot
+
+    def release(self, slot):
+        key, token = slot
+        # After an expired lease the key may belong to someone else by now
+        if self.cache.get(key) == token:
+            self.cache.delete(key)
+
+    async def atry_acquire(self):
+        token = uuid.uuid4().hex
+        for key in self._free_keys(await self.cache.aget_many(self.keys)):
+            if await self.cache.aadd(key, token, self.lease):
+                return key, token
+        return None
+
+    async def aacquire(self, timeout):
+        slot = await self.atry_acquire()
+        for delay in self._delays(timeout):
+            if slot is not None:
+                break
+            await asyncio.sleep(delay)
+            slot = await self.atry_acquire()
+        return slot
+
+    async def arelease(self, slot):
+        key, token = slot
+        if await self.cache.aget(key) == token:
+            await self.cache.adelete(key)
+
+
+_lock = threading.Lock()
+_client = None
+_slots = None
+
+
+def get_client():
+    """Process-wide OpenAI client with a pooled httpx.Client"""
+    global _client
+    with _lock:
+        if _client is None:
+            _client = openai.OpenAI(
+                http_client=httpx.Client(timeout=_timeout(), limits=_limits()),
+                **_client_options(),
+            )
+        return _client
+
+
+def _get_slots():
+    global _slots
+    with _lock:
+        if _slots is None:
+            _slots = SharedSlots(
+                caches[settings.OPENAI_SLOT_CACHE], settings.OPENAI_MAX_CONCURRENCY, settings.OPENAI_SLOT_LEASE,
+            )
+        return _slots
+
+
+def _retry_delay(attempt, error, deadline):
+    """Seconds to wait before the next attempt, or None to give up and re-raise"""
+    delay = backoff_delay(attempt)
+    if attempt == settings.OPENAI_MAX_RETRIES or delay >= deadline.remaining():
+        return None
+    logger.warning(f"OpenAI call failed ({type(error).__name__}); retry {attempt + 1} in {delay:.2f}s")
+    return delay
+
+
+def call(operation, deadline=None, **kwargs):
+    """
+    Run operation(client, **kwargs) within a concurrency slot, retrying transient errors
+
+    e.g. call(lambda c, **kw: c.chat.completions.create(**kw), model=..., messages=...)
+
+    Every attempt's timeout is cut to what is left of deadline (a fresh
+    Deadline if none is given); LLMDeadlineExceeded is raised once it is spent.
+    """
+    deadline = deadline or Deadline()
+    slots = _get_slots()
+    slot = slots.acquire(min(settings.OPENAI_QUEUE_TIMEOUT, deadline.remaining()))
+    if slot is None:
+        raise LLMBusy()
+    try:
+        for attempt in range(settings.OPENAI_MAX_RETRIES + 1):
+            client = get_client().with_options(timeout=_timeout(deadline.check()))
+            try:
+                return operation(client, **kwargs)
+            except RETRYABLE_ERRORS as e:
+                delay = _retry_delay(attempt, e, deadline)
+                if delay is None:
+                    raise
+                time.sleep(delay)
+    finally:
+        slots.release(slot)
+
+
+def chat_completion(deadline=None, **kwargs):
+    return call(lambda client, **kw: client.chat.completions.create(**kw), deadline=deadline, **kwargs)
+
+
+def transcribe(deadline=None, **kwargs):
+    return call(lambda client, **kw: client.audio.transcriptions.create(**kw), deadline=deadline, **kwargs)
+
+
+# Async flavour, for views served by an ASGI server. An httpx.AsyncClient
+# belongs to one event loop, so clients are kept per loop (and dropped with
+# it); the slots are the same shared ones as for sync calls.
+_async_clients = weakref.WeakKeyDictionary()
+
+
+def _get_async_client():
+    loop = asyncio.get_running_loop()
+    with _lock:
+        client = _async_clients.get(loop)
+        if client is None:
+            client = _async_clients[loop] = openai.AsyncOpenAI(
+                http_client=httpx.AsyncClient(timeout=_timeout(), limits=_limits()),
+                **_client_options(),
+            )
+        return client
+
+
+async def acall(operation, deadline=None, **kwargs):
+    """Async counterpart of call(); operation(client, **kwargs) must return an awaitable"""
+    deadline = deadline or Deadline()
+    async_client = _get_async_client()
+    slots = _get_slots()
+    slot = await slots.aacquire(min(settings.OPENAI_QUEUE_TIMEOUT, deadline.remaining()))
+    if slot is None:
+        raise LLMBusy()
+    try:
+        for attempt in range(settings.OPENAI_MAX_RETRIES + 1):
+            client = async_client.with_options(timeout=_timeout(deadline.check()))
+            try:
+                return await operation(client, **kwargs)
+            except RETRYABLE_ERRORS as e:
+                delay = _retry_delay(attempt, e, deadline)
+                if delay is None:
+                    raise
+                await asyncio.sleep(delay)
+    finally:
+        await slots.arelease(slot)
+
+
+async def achat_completion(deadline=None, **kwargs):
+    return await acall(lambda client, **kw: client.chat.completions.create(**kw), deadline=deadline, **kwargs)
+
+
+async def atranscribe(deadline=None, **kwargs):
+    return await acall(lambda client, **kw: client.audio.transcriptions.create(**kw), deadline=deadline, **kwargs)
+
+
+def reset():
+    """Drop the shared clients (tests, or after settings change)"""
+    global _client, _slots
+    with _lock:
+        if _client is not None:
+            _client.close()
+        _client = None
+        _slots = None
+        _async_clients.clear()
@@ -0,0 +1,212 @@
+import json
+import math
+import os
+import resource
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+FUNCTIONS = ("extract_skills", "analyze_resume_section", "analyze_gap")
+ENGINES = ("automaton", "phrasematcher")
+PIPELINES = ("tokenizer", "full")
+
+
+def percentile(samples, q):
+    """Nearest-rank percentile of a non-empty list"""
+    ordered = sorted(samples)
+    return ordered[max(0, math.ceil(q / 100 * len(ordered)) - 1)]
+
+
+def summarize(latencies, peaks, pages):
+    total = sum(latencies)
+    return {
+        "calls": len(latencies),
+        "p50_ms": round(percentile(latencies, 50) * 1000, 3),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 3),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 3),
+        "mean_ms": round(statistics.mean(latencies) * 1000, 3),
+        "max_ms": round(max(latencies) * 1000, 3),
+        "calls_per_s": round(len(latencies) / total, 1) if total else None,
+        "pages_per_s": round(len(latencies) * pages / total, 1) if total else None,
+        "peak_alloc_kb": round(max(peaks) / 1024, 1),
+    }
+
+
+def compare(baseline, current, threshold):
+    """
+    Rows of (config, function, pages, metric, before, after, change) for
+    p50/p95 latencies that got slower by more than threshold (0.25 = 25%)
+    """
+    regressions = []
+    before = {config["name"]: config for config in baseline.get("configs", [])}
+    for config in current.get("configs", []):
+        old = before.get(config["name"])
+        if not old or "results" not in old or "results" not in config:
+            continue
+        for function, sizes in config["results"].items():
+            for pages, stats in sizes.items():
+                old_stats = old["results"].get(function, {}).get(pages)
+                if not old_stats:
+                    continue
+                for metric in ("p50_ms", "p95_ms"):
+                    if not old_stats[metric]:
+                        continue
+                    change = stats[metric] / old_stats[metric] - 1
+                    if change > threshold:
+                        regressions.append(
+                            (config["name"], function, pages, metric, old_stats[metric], stats[metric], change)
+                        )
+    return regressions
+
+
+class Command(BaseCommand):
+    help = ("Benchmark extract_skills, analyze_resume_section and analyze_gap on a synthetic corpus "
+            "under each matcher engine and spaCy pipeline")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', default="1,5,10,20", help="Comma-separated document sizes in pages")
+        parser.add_argument('--docs', type=int, default=5, help="Resume/job pairs generated per size")
+        parser.add_argument('--runs', type=int, default=3, help="Timed calls per document")
+        parser.add_argument('--seed', type=int, default=0, help="Corpus seed")
+        parser.add_argument('--engines', default=",".join(ENGINES), help="Matcher engines to benchmark")
+        parser.add_argument('--pipelines', default=",".join(PIPELINES), help="spaCy pipelines to benchmark")
+        parser.add_argument('--output', help="Write the JSON report to this file")
+        parser.add_argument('--compare', help="Baseline JSON report to compare against")
+        parser.add_argument('--threshold', type=float, default=0.25,
+                            help="Fail if a p50/p95 latency is this much slower than the baseline")
+        parser.add_argument('--in-process', action='store_true',
+                            help="Only measure the configuration of this process (no subprocesses)")
+
+    def handle(self, *args, **options):
+        sizes = [int(size) for size in options['sizes'].split(",") if size]
+
+        if options['in_process']:
+            configs = [self.measure(sizes, options)]
+        else:
+            configs = [
+                self.run_config(engine, pipeline, options)
+                for engine in options['engines'].split(",") if engine
+                for pipeline in options['pipelines'].split(",") if pipeline
+            ]
+
+        report = {
+            "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": sys.version.split()[0],
+            "corpus": {"sizes": sizes, "docs": options['docs'], "runs": options['runs'], "seed": options['seed']},
+            "configs": configs,
+        }
+        output = json.dumps(report, indent=2)
+        if options['output']:
+            with open(options['output'], "w") as f:
+                f.write(output)
+            self.stderr.write(f"Wrote {options['output']}")
+        else:
+            self.stdout.write(output)
+
+        if options['compare']:
+            with open(options['compare']) as f:
+                baseline = json.load(f)
+            regressions = compare(baseline, report, options['threshold'])
+            for name, function, pages, metric, old, new, change in regressions:
+                self.stderr.write(self.style.ERROR(
+                    f"{name} {function} {pages}p {metric}: {old} -> {new} ms (+{change:.0%})"
+                ))
+            if regressions:
+                raise CommandError(f"{len(regressions)} latency regression(s) over {options['threshold']:.0%}")
+            self.stderr.write(self.style.SUCCESS("No latency regressions against the baseline"))
+
+    def run_config(self, engine, pipeline, options):
+        """Measure one configuration in a fresh interpreter, so module-level state doesn't leak"""
+        name = f"{engine}/{pipeline}"
+        env = dict(
+            os.environ,
+            DJANGO_SETTINGS_MODULE=os.environ.get('DJANGO_SETTINGS_MODULE', settings.SETTINGS_MODULE),
+            SKILL_MATCHER=engine,
+            NLP_FULL_PIPELINE="TRUE" if pipeline == "full" else "FALSE",
+        )
+        command = [
+            sys.executable, "-m", "django", "benchmark_nlp", "--in-process",
+            "--sizes", options['sizes'], "--docs", str(options['docs']),
+            "--runs", str(options['runs']), "--seed", str(options['seed']),
+        ]
+        self.stderr.write(f"Benchmarking {name}...")
+        completed = subprocess.run(command, env=env, cwd=settings.BASE_DIR, capture_output=True, text=True)
+        if completed.returncode != 0:
+            return {"name": name, "error": completed.stderr.strip().splitlines()[-1:]}
+
+        config = json.loads(completed.stdout)["configs"][0]
+        config["name"] = name
+        return config
+
+    def measure(self, sizes, options):
+        from analysis.nlp_module.job_resume_analyzer import analyze_gap
+        from analysis.nlp_module.nlp_setup import FULL_PIPELINE, warm_up
+        from analysis.nlp_module.section_analyzer import analyze_resume_section
+        from analysis.nlp_module.skill_extractor import extract_skills, get_engine
+        from analysis.result_cache import get_result_cache
+        from analysis.synthetic import make_corpus
+
+        started = time.perf_counter()
+        warm_up()
+        warm_up_ms = round((time.perf_counter() - started) * 1000, 1)
+
+        engine = get_engine()
+        config = {
+            "name": f"{engine}/{'full' if FULL_PIPELINE else 'tokenizer'}",
+            "requested_engine": settings.SKILL_MATCHER,
+            "engine": engine,
+            "full_pipeline": FULL_PIPELINE,
+            "warm_up_ms": warm_up_ms,
+        }
+        if settings.SKILL_MATCHER not in ("auto", engine):
+            # e.g. phrasematcher without a spaCy model: the numbers would be
+            # the automaton's under the wrong name
+            config["skipped"] = f"SKILL_MATCHER={settings.SKILL_MATCHER} is unavailable; {engine} would be used"
+            return config
+
+        # analyze_gap results are cached by text; measure the computation
+        analysis_cache = get_result_cache("analysis")
+        calls = {
+            "extract_skills": lambda resume, job: (extract_skills(resume), extract_skills(job)),
+            "analyze_resume_section": lambda resume, job: analyze_resume_section(resume),
+            "analyze_gap": lambda resume, job: analyze_gap(resume, job),
+        }
+
+        corpus = make_corpus(sizes, options['docs'], options['seed'])
+        results = {}
+        for function in FUNCTIONS:
+            call = calls[function]
+            results[function] = {}
+            for pages, pairs in corpus.items():
+                latencies = []
+                for resume, job in pairs:
+                    for _ in range(options['runs']):
+                        analysis_cache.clear()
+                        started = time.perf_counter()
+                        call(resume, job)
+                        latencies.append(time.perf_counter() - started)
+
+                # Allocation peaks come from a separate pass; tracing slows
+                # every allocation down and would skew the timings
+                peaks = []
+                tracemalloc.start()
+                try:
+                    for resume, job in pairs:
+                        analysis_cache.clear()
+                        tracemalloc.reset_peak()
+                        baseline = tracemalloc.get_traced_memory()[0]
+                        call(resume, job)
+                        peaks.append(tracemalloc.get_traced_memory()[1] - baseline)
+                finally:
+                    tracemalloc.stop()
+
+                results[function][str(pages)] = summarize(latencies, peaks, pages)
+
+        config["results"] = results
+        config["max_rss_mb"] = round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+        return config
@@ -0,0 +1,69 @@
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+from django.conf import settings
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+
+# Runs in a fresh interpreter: what a gunicorn worker does before it can answer
+# its first analysis request (load the URLconf, which imports the views and the
+# NLP modules, then extract skills once). RSS after the import is what a
+# process that never analyzes text (manage.py, auth-only traffic) keeps.
+PROBE = r"""
+import json, resource, time
+start = time.perf_counter()
+import django
+django.setup()
+from django.urls import get_resolver
+get_resolver().url_patterns
+imported = time.perf_counter()
+import_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+from analysis.nlp_module.skill_extractor import extract_skills
+extract_skills("Python developer with Django, PostgreSQL and Kubernetes experience")
+done = time.perf_counter()
+print(json.dumps({"import_ms": (imported - start) * 1000, "first_call_ms": (done - imported) * 1000,
+                  "total_ms": (done - start) * 1000, "import_rss_mb": import_rss,
+                  "rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024}))
+"""
+
+
+class Command(BaseCommand):
+    help = "Measure worker time-to-first-analysis with and without the skill matcher artifact"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--runs', type=int, default=5, help="Fresh interpreters per mode")
+        parser.add_argument('--json', action='store_true', help="Print the report as JSON")
+
+    def probe(self, artifact):
+        env = dict(os.environ, DJANGO_SETTINGS_MODULE=os.environ.get('DJANGO_SETTINGS_MODULE', settings.SETTINGS_MODULE))
+        env['SKILL_MATCHER_ARTIFACT'] = artifact or ""
+        output = subprocess.run(
+            [sys.executable, "-c", PROBE], env=env, cwd=settings.BASE_DIR,
+            capture_output=True, text=True, check=True,
+        ).stdout
+        return json.loads(output.strip().splitlines()[-1])
+
+    def handle(self, *args, **options):
+        artifact = settings.SKILL_MATCHER_ARTIFACT or os.path.join(settings.BASE_DIR, "var", "skill_matcher.pkl")
+        call_command('build_skill_matcher', output=artifact, stdout=self.stderr)
+
+        report = {}
+        for mode, path in (("from_source", None), ("from_artifact", artifact)):
+            samples = [self.probe(path) for _ in range(options['runs'])]
+            report[mode] = {
+                key: round(statistics.median(sample[key] for sample in samples), 1)
+                for key in ("import_ms", "first_call_ms", "total_ms", "import_rss_mb", "rss_mb")
+            }
+
+        if options['json']:
+            self.stdout.write(json.dumps(report, indent=2))
+            return
+        for mode, timings in report.items():
+            self.stdout.write(
+                f"{mode:>14}: import {timings['import_ms']:.1f} ms, first call {timings['first_call_ms']:.1f} ms, "
+                f"total {timings['total_ms']:.1f} ms, peak RSS {timings['import_rss_mb']:.0f} MB after import / "
+                f"{timings['rss_mb']:.0f} MB after first call (median of {options['runs']})"
+            )
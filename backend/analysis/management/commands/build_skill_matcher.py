@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from analysis.nlp_module.artifact import artifact_path, build_artifact, load_artifact
+from analysis.nlp_module.nlp_setup import get_model
+
+
+class Command(BaseCommand):
+    help = "Precompile the skill taxonomy and matchers into settings.SKILL_MATCHER_ARTIFACT"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--output', help="Write to this path instead of SKILL_MATCHER_ARTIFACT")
+        parser.add_argument('--if-stale', action='store_true', help="Do nothing if an up-to-date artifact exists")
+
+    def handle(self, *args, **options):
+        path = options['output'] or artifact_path()
+        if not path:
+            raise CommandError("SKILL_MATCHER_ARTIFACT is not set and no --output was given.")
+
+        if options['if_stale'] and load_artifact(path) is not None:
+            self.stdout.write(f"Skill matcher artifact {path} is up to date")
+            return
+
+        compiled = build_artifact(path, get_model())
+        patterns = "with" if compiled.patterns is not None else "without (no spaCy model)"
+        self.stdout.write(self.style.SUCCESS(
+            f"Wrote {path}: taxonomy {compiled.taxonomy.version}, "
+            f"{len(compiled.taxonomy.ids)} skills, {patterns} PhraseMatcher patterns"
+        ))
@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+
+from analysis.storage import collect_garbage
+
+
+class Command(BaseCommand):
+    help = ("Delete resume blobs no Resume references that have not been saved for BLOB_GC_GRACE seconds "
+            "(process_tasks also does this periodically)")
+
+    def handle(self, *args, **options):
+        deleted = collect_garbage()
+        self.stdout.write(self.style.SUCCESS(f"Deleted {len(deleted)} unreferenced blob(s)"))
@@ -0,0 +1,101 @@
+import json
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+
+# Fields of /proc/<pid>/smaps_rollup reported, in kB
+FIELDS = ("Rss", "Pss", "Shared_Clean", "Shared_Dirty", "Private_Clean", "Private_Dirty", "Swap")
+
+
+def read_rollup(pid):
+    values = {}
+    with open(f"/proc/{pid}/smaps_rollup") as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) >= 2 and parts[0].rstrip(":") in FIELDS:
+                values[parts[0].rstrip(":")] = int(parts[1])
+    return values
+
+
+def read_cmdline(pid):
+    with open(f"/proc/{pid}/cmdline", "rb") as f:
+        return f.read().replace(b"\0", b" ").decode(errors="replace").strip()
+
+
+def read_ppid(pid):
+    with open(f"/proc/{pid}/stat") as f:
+        # The command name may contain spaces; fields after it are fixed
+        return int(f.read().rsplit(")", 1)[1].split()[1])
+
+
+def list_pids():
+    return [int(name) for name in os.listdir("/proc") if name.isdigit()]
+
+
+class Command(BaseCommand):
+    help = "Report RSS/PSS of a gunicorn master and its workers (Linux only)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--pid', type=int, help="Master PID; defaults to every process matching --match")
+        parser.add_argument('--match', default="gunicorn", help="Substring of the command line to look for")
+        parser.add_argument('--json', action='store_true', help="Print the report as JSON")
+
+    def find_processes(self, options):
+        pids = list_pids()
+        if options['pid']:
+            children = [pid for pid in pids if self.safe(read_ppid, pid) == options['pid']]
+            return [options['pid'], *sorted(children)]
+        return sorted(
+            pid for pid in pids
+            if pid != os.getpid() and options['match'] in (self.safe(read_cmdline, pid) or "")
+        )
+
+    @staticmethod
+    def safe(reader, pid):
+        try:
+            return reader(pid)
+        except (FileNotFoundError, ProcessLookupError, PermissionError):
+            return None
+
+    def handle(self, *args, **options):
+        if not os.path.exists("/proc/self/smaps_rollup"):
+            raise CommandError("memory_report needs Linux /proc/<pid>/smaps_rollup.")
+
+        processes = []
+        for pid in self.find_processes(options):
+            rollup = self.safe(read_rollup, pid)
+            if rollup is None:
+                continue
+            processes.append({
+                "pid": pid,
+                "ppid": self.safe(read_ppid, pid),
+                "command": (self.safe(read_cmdline, pid) or "")[:80],
+                **{field.lower() + "_kb": rollup.get(field, 0) for field in FIELDS},
+            })
+        if not processes:
+            raise CommandError("No matching processes found.")
+
+        totals = {
+            "processes": len(processes),
+            "rss_kb": sum(p["rss_kb"] for p in processes),
+            # PSS divides shared pages between their users, so the sum is the
+            # real footprint; RSS counts shared pages once per process
+            "pss_kb": sum(p["pss_kb"] for p in processes),
+        }
+
+        if options['json']:
+            self.stdout.write(json.dumps({"processes": processes, "totals": totals}, indent=2))
+            return
+
+        self.stdout.write(f"{'PID':>7} {'PPID':>7} {'RSS MB':>8} {'PSS MB':>8} {'Shared MB':>10} {'Private MB':>11}  Command")
+        for p in processes:
+            shared = p["shared_clean_kb"] + p["shared_dirty_kb"]
+            private = p["private_clean_kb"] + p["private_dirty_kb"]
+            self.stdout.write(
+                f"{p['pid']:>7} {p['ppid'] or '-':>7} {p['rss_kb'] / 1024:>8.1f} {p['pss_kb'] / 1024:>8.1f} "
+                f"{shared / 1024:>10.1f} {private / 1024:>11.1f}  {p['command']}"
+            )
+        self.stdout.write(
+            f"Total: {totals['processes']} process(es), RSS {totals['rss_kb'] / 1024:.1f} MB, "
+            f"PSS {totals['pss_kb'] / 1024:.1f} MB"
+        )
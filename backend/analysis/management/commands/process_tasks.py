@@ -0,0 +1,53 @@
+import time
+import logging
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from analysis.storage import collect_garbage
+from analysis.tasks import claim_next_task, run_task
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = ("Run queued background tasks (resume text and skill extraction) and periodically "
+            "delete unreferenced resume blobs")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help="Drain the queue once and exit")
+        parser.add_argument('--sleep', type=float, default=2.0, help="Seconds to wait when the queue is empty")
+        parser.add_argument('--max-tasks', type=int, default=0, help="Exit after this many tasks (0 = no limit)")
+        parser.add_argument('--gc-interval', type=float, default=3600.0,
+                            help="Seconds between blob garbage collections (0 = never)")
+
+    def handle(self, *args, **options):
+        processed = 0
+        last_gc = None
+        self.stdout.write("Task worker started")
+
+        while True:
+            close_old_connections()
+            if options['gc_interval'] and (last_gc is None or time.monotonic() - last_gc >= options['gc_interval']):
+                last_gc = time.monotonic()
+                try:
+                    collect_garbage()
+                except Exception as e:
+                    logger.error(f"Blob garbage collection failed: {e}", exc_info=True)
+
+            task = claim_next_task()
+
+            if task is None:
+                if options['once']:
+                    break
+                time.sleep(options['sleep'])
+                continue
+
+            ok = run_task(task)
+            processed += 1
+            self.stdout.write(f"{'Finished' if ok else 'Failed'} {task}")
+
+            if options['max_tasks'] and processed >= options['max_tasks']:
+                break
+
+        self.stdout.write(self.style.SUCCESS(f"Processed {processed} task(s)"))
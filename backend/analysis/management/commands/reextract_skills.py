@@ -0,0 +1,66 @@
+import logging
+from collections import deque
+
+from django.core.management.base import BaseCommand
+from tqdm import tqdm
+
+from analysis.models import Resume, JobDescription
+from analysis.nlp_module.skill_extractor import iter_skill_ids, TAXONOMY_VERSION
+
+logger = logging.getLogger(__name__)
+
+MODELS = {
+    'resumes': Resume,
+    'jobs': JobDescription,
+}
+
+
+class Command(BaseCommand):
+    help = "Re-extract stored skills for resumes and job descriptions (e.g. after a skill list change)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--only', choices=sorted(MODELS), help="Limit to resumes or jobs")
+        parser.add_argument('--all', action='store_true', help="Re-extract every row, not only stale ones")
+        parser.add_argument('--batch-size', type=int, default=128, help="Texts per nlp.pipe batch")
+        parser.add_argument('--processes', type=int, default=1, help="spaCy worker processes (nlp.pipe n_process)")
+        parser.add_argument('--chunk-size', type=int, default=500, help="Rows fetched and saved per round trip")
+
+    def handle(self, *args, **options):
+        models = [MODELS[options['only']]] if options['only'] else list(MODELS.values())
+        for model in models:
+            updated = self.reextract(model, options)
+            self.stdout.write(self.style.SUCCESS(f"{model.__name__}: re-extracted skills for {updated} row(s)"))
+
+    def reextract(self, model, options):
+        source_field = model.skills_source_field
+        queryset = model.objects.only('pk', source_field, 'skills', 'skills_version').order_by('pk')
+        if not options['all']:
+            queryset = queryset.exclude(skills_version=TAXONOMY_VERSION)
+
+        total = queryset.count()
+        pending = deque()
+
+        def texts():
+            # Rows are streamed from the database and queued so each skill list
+            # yielded by iter_skill_ids (same order) can be matched to its row
+            for obj in queryset.iterator(chunk_size=options['chunk_size']):
+                pending.append(obj)
+                yield getattr(obj, source_field) or ""
+
+        batch = []
+        updated = 0
+        skills_stream = iter_skill_ids(texts(), batch_size=options['batch_size'], n_process=options['processes'])
+        for skills in tqdm(skills_stream, total=total, desc=model.__name__, unit="row"):
+            obj = pending.popleft()
+            obj.skills = skills
+            obj.skills_version = TAXONOMY_VERSION
+            batch.append(obj)
+            if len(batch) >= options['chunk_size']:
+                model.objects.bulk_update(batch, ['skills', 'skills_version'])
+                updated += len(batch)
+                batch = []
+
+        if batch:
+            model.objects.bulk_update(batch, ['skills', 'skills_version'])
+            updated += len(batch)
+        return updated
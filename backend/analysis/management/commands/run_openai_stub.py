@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand
+
+from analysis.openai_stub import StubServer
+
+
+class Command(BaseCommand):
+    help = "Serve a local stand-in for the OpenAI API (point OPENAI_BASE_URL at it)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--host', default='127.0.0.1')
+        parser.add_argument('--port', type=int, default=8089)
+        parser.add_argument('--delay', type=float, default=0.0, help="Seconds to wait before each response")
+        parser.add_argument('--fail-rate', type=float, default=0.0, help="Fraction of requests answered with --fail-status")
+        parser.add_argument('--fail-status', type=int, default=500)
+
+    def handle(self, *args, **options):
+        server = StubServer(
+            options['host'], options['port'],
+            delay=options['delay'], fail_rate=options['fail_rate'], fail_status=options['fail_status'],
+        )
+        self.stdout.write(f"OpenAI stub listening; set OPENAI_BASE_URL={server.base_url}")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
@@ -0,0 +1,82 @@
+import json
+import logging
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+
+from .instrumentation import REQUEST_DURATION, REQUEST_QUERIES, finish_request, start_request
+
+logger = logging.getLogger("analysis.requests")
+
+
+class InstrumentationMiddleware:
+    """
+    Times every request and counts its SQL queries (see instrumentation.py)
+
+    Adds a Server-Timing header (SERVER_TIMING_HEADER), an X-DB-Queries header
+    (QUERY_COUNT_HEADER, used by load tests), logs one JSON line per request
+    and feeds the /api/metrics/ histograms. INSTRUMENTATION_ENABLED=FALSE
+    removes the middleware at startup.
+
+    Works in both sync and async stacks, so under ASGI it doesn't push every
+    request through a thread.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not getattr(settings, "INSTRUMENTATION_ENABLED", True):
+            raise MiddlewareNotUsed()
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        timings, token = start_request()
+        try:
+            response = self.get_response(request)
+        finally:
+            finish_request(token)
+        return self.report(request, response, timings)
+
+    async def __acall__(self, request):
+        timings, token = start_request()
+        try:
+            response = await self.get_response(request)
+        finally:
+            finish_request(token)
+        return self.report(request, response, timings)
+
+    def report(self, request, response, timings):
+        """Record the finished request in the headers, histograms and log"""
+        duration_ms = timings.elapsed_ms()
+        match = getattr(request, "resolver_match", None)
+        view = match.view_name if match else "unmatched"
+        REQUEST_DURATION.observe(duration_ms / 1000, request.method, view, str(response.status_code))
+        REQUEST_QUERIES.observe(timings.queries, request.method, view)
+
+        if getattr(settings, "SERVER_TIMING_HEADER", True):
+            response["Server-Timing"] = timings.server_timing()
+        if getattr(settings, "QUERY_COUNT_HEADER", False):
+            response["X-DB-Queries"] = str(timings.queries)
+
+        if logger.isEnabledFor(logging.INFO):
+            logger.info(json.dumps({
+                "event": "request",
+                "method": request.method,
+                "path": request.path,
+                "view": view,
+                "status": response.status_code,
+                "duration_ms": round(duration_ms, 1),
+                "queries": timings.queries,
+                "db_ms": round(timings.query_seconds * 1000, 1),
+                "stages": {
+                    name: {"ms": round(ms, 1), "calls": calls, "queries": queries}
+                    for name, (ms, calls, queries) in timings.stages.items()
+                },
+            }))
+        return response
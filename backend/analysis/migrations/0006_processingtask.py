@@ -0,0 +1,45 @@
+# Generated by Django 5.0.3 on 2026-10-17 18:27
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+def mark_existing_resumes(apps, schema_editor):
+    """Resumes uploaded before background processing were extracted synchronously"""
+    Resume = apps.get_model('analysis', 'Resume')
+    Resume.objects.exclude(parsed_text__isnull=True).exclude(parsed_text='').update(
+        processing_status='completed', is_processed=True
+    )
+    Resume.objects.filter(processing_status='pending').update(processing_status='failed')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analysis', '0005_extracted_skills'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProcessingTask',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('task_type', models.CharField(choices=[('resume_extraction', 'Resume Extraction')], max_length=50)),
+                ('status', models.CharField(choices=[('queued', 'Queued'), ('running', 'Running'), ('done', 'Done'), ('failed', 'Failed')], default='queued', max_length=20)),
+                ('attempts', models.PositiveIntegerField(default=0)),
+                ('max_attempts', models.PositiveIntegerField(default=3)),
+                ('last_error', models.TextField(blank=True, null=True)),
+                ('run_after', models.DateTimeField(default=django.utils.timezone.now)),
+                ('locked_at', models.DateTimeField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('resume', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='processing_tasks', to='analysis.resume')),
+            ],
+            options={
+                'ordering': ['created_at'],
+                'indexes': [models.Index(fields=['status', 'run_after'], name='analysis_pr_status_ffcfaa_idx')],
+            },
+        ),
+        migrations.RunPython(mark_existing_resumes, migrations.RunPython.noop),
+    ]
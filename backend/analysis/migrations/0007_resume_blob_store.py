@@ -0,0 +1,79 @@
+# Generated by Django 5.0.3 on 2026-10-17 18:29
+
+import hashlib
+import os
+import tempfile
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+# Frozen copy of the LocalBlobStore layout this migration was written against,
+# so later changes to analysis.storage cannot change what it does
+def _blob_root():
+    return str(settings.RESUME_BLOB_STORE["OPTIONS"]["root"])
+
+
+def _blob_path(root, key):
+    return os.path.join(root, key[:2], key[2:4], key)
+
+
+def _save_blob(root, data):
+    key = hashlib.sha256(data).hexdigest()
+    dest = _blob_path(root, key)
+    if not os.path.exists(dest):
+        os.makedirs(os.path.dirname(dest), exist_ok=True)
+        os.makedirs(os.path.join(root, "tmp"), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.join(root, "tmp"))
+        try:
+            with os.fdopen(fd, "wb") as tmp:
+                tmp.write(data)
+            os.replace(tmp_path, dest)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            raise
+    return key, len(data)
+
+
+def move_files_to_blob_store(apps, schema_editor):
+    """Copy inline BinaryField uploads into the blob store and clear the column"""
+    Resume = apps.get_model('analysis', 'Resume')
+    root = _blob_root()
+    pending = Resume.objects.filter(file__isnull=False, file_sha256__isnull=True)
+
+    # Load one blob at a time so large tables never sit in memory together
+    for pk in pending.values_list('pk', flat=True).iterator():
+        data = Resume.objects.filter(pk=pk).values_list('file', flat=True).first()
+        if not data:
+            continue
+        file_sha256, size = _save_blob(root, bytes(data))
+        Resume.objects.filter(pk=pk).update(file_sha256=file_sha256, file_size=size, file=None)
+
+
+def restore_files_from_blob_store(apps, schema_editor):
+    Resume = apps.get_model('analysis', 'Resume')
+    root = _blob_root()
+    moved = Resume.objects.filter(file__isnull=True, file_sha256__isnull=False)
+
+    for pk, file_sha256 in moved.values_list('pk', 'file_sha256').iterator():
+        path = _blob_path(root, file_sha256)
+        if os.path.exists(path):
+            with open(path, "rb") as f:
+                Resume.objects.filter(pk=pk).update(file=f.read())
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analysis', '0006_processingtask'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='resume',
+            name='file_sha256',
+            field=models.CharField(blank=True, db_index=True, max_length=64, null=True),
+        ),
+        migrations.RunPython(move_files_to_blob_store, restore_files_from_blob_store),
+    ]
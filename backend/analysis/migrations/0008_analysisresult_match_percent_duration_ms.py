@@ -0,0 +1,49 @@
+# Generated by Django 5.0.3 on 2026-10-17 18:32
+
+from django.db import migrations, models
+
+# Keys older analyses may have stored their match score under, most specific first
+MATCH_SCORE_KEYS = ['match_percent', 'match_percentage', 'match_score', 'overall_match', 'match_accuracy', 'score']
+
+
+def backfill_match_percent(apps, schema_editor):
+    """Copy the match score out of result_data; durations were never recorded"""
+    AnalysisResult = apps.get_model('analysis', 'AnalysisResult')
+    batch = []
+    for analysis in AnalysisResult.objects.only('id', 'result_data').iterator(chunk_size=1000):
+        data = analysis.result_data if isinstance(analysis.result_data, dict) else {}
+        for key in MATCH_SCORE_KEYS:
+            try:
+                score = float(data[key])
+            except (KeyError, TypeError, ValueError):
+                continue
+            if 0 <= score <= 100:
+                analysis.match_percent = score
+                batch.append(analysis)
+            break
+        if len(batch) >= 1000:
+            AnalysisResult.objects.bulk_update(batch, ['match_percent'])
+            batch = []
+    if batch:
+        AnalysisResult.objects.bulk_update(batch, ['match_percent'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analysis', '0007_resume_blob_store'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='analysisresult',
+            name='duration_ms',
+            field=models.PositiveIntegerField(blank=True, db_index=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='analysisresult',
+            name='match_percent',
+            field=models.FloatField(blank=True, db_index=True, null=True),
+        ),
+        migrations.RunPython(backfill_match_percent, migrations.RunPython.noop),
+    ]
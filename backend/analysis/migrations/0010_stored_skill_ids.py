@@ -0,0 +1,24 @@
+# Generated by Django 5.0.3 on 2026-10-17 19:30
+
+from django.db import migrations
+
+
+def mark_skills_stale(apps, schema_editor):
+    """
+    Stored skills used to be display names and are now taxonomy ids; clearing
+    skills_version makes get_skills()/ensure_skills() re-extract them on next
+    use (or run `manage.py reextract_skills` to backfill up front)
+    """
+    for model_name in ('Resume', 'JobDescription'):
+        apps.get_model('analysis', model_name).objects.update(skills_version='')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analysis', '0009_requestprofile'),
+    ]
+
+    operations = [
+        migrations.RunPython(mark_skills_stale, migrations.RunPython.noop),
+    ]
@@ -1,6 +1,8 @@
 from django.db import models
+from django.conf import settings
 from django.contrib.auth.models import User
 from django.utils import timezone
+import os
 
 # Before: Basic models with minimal fields
 # class Resume(models.Model):
@@ -9,10 +11,83 @@ from django.utils import timezone
 #     parsed_text=models.TextField(blank=True,null=True)
 #     uploaded_at=models.DateTimeField(auto_now_add=True)
 
-class Resume(models.Model):
+class ResumeQuerySet(models.QuerySet):
+    """Projections so views never pull the file blob or full text by accident"""
+
+    def summary(self):
+        """Metadata only: no file blob and no extracted text (listings, dashboard)"""
+        return self.defer('file', 'parsed_text')
+
+    def with_text(self):
+        """Metadata plus parsed_text for analysis and detail views, without the blob"""
+        return self.defer('file')
+
+
+class JobDescriptionQuerySet(models.QuerySet):
+    def summary(self):
+        """Metadata only: no description or requirements text"""
+        return self.defer('description', 'requirements')
+
+
+class AnalysisResultQuerySet(models.QuerySet):
+    def summary(self):
+        """Row metadata without the result_data JSON"""
+        return self.defer('result_data')
+
+
+class ExtractedSkillsModel(models.Model):
+    """
+    Stores the skills extracted from one text field of the model
+
+    skills holds canonical taxonomy ids (e.g. "node.js"); serializers map
+    them to display names. skills_version records the skill taxonomy the
+    list was extracted with, so get_skills() can transparently re-extract
+    after the skill list changes.
+    """
+    skills_source_field = None
+
+    skills = models.JSONField(default=list, blank=True)
+    skills_version = models.CharField(max_length=64, blank=True, default='')
+
+    class Meta:
+        abstract = True
+
+    def update_skills(self, commit=True):
+        """Extract skills from the source field and store them"""
+        from .nlp_module.skill_extractor import extract_skill_ids, TAXONOMY_VERSION
+        self.skills = extract_skill_ids(getattr(self, self.skills_source_field) or "")
+        self.skills_version = TAXONOMY_VERSION
+        if commit and self.pk:
+            type(self).objects.filter(pk=self.pk).update(skills=self.skills, skills_version=self.skills_version)
+        return self.skills
+
+    def get_skills(self):
+        """Stored skills, re-extracted first if they predate the current skill list"""
+        from .nlp_module.skill_extractor import TAXONOMY_VERSION
+        if self.skills_version != TAXONOMY_VERSION:
+            return self.update_skills()
+        return self.skills
+
+    @classmethod
+    def ensure_skills(cls, instances):
+        """Bring stored skills of many rows up to date with one batched extraction"""
+        from .nlp_module.skill_extractor import extract_skill_ids_batch, TAXONOMY_VERSION
+        stale = [obj for obj in instances if obj.skills_version != TAXONOMY_VERSION]
+        if stale:
+            texts = [getattr(obj, cls.skills_source_field) or "" for obj in stale]
+            for obj, skills in zip(stale, extract_skill_ids_batch(texts)):
+                obj.skills = skills
+                obj.skills_version = TAXONOMY_VERSION
+            cls.objects.bulk_update(stale, ['skills', 'skills_version'])
+        return instances
+
+
+class Resume(ExtractedSkillsModel):
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='resumes')
     # file = models.FileField(upload_to='resumes/')
+    # Legacy inline storage; uploads now live in the blob store under file_sha256
     file = models.BinaryField(blank=True, null=True)
+    file_sha256 = models.CharField(max_length=64, blank=True, null=True, db_index=True)
     file_name = models.CharField(max_length=255, blank=True, null=True)
 
     parsed_text = models.TextField(blank=True, null=True)
@@ -28,12 +103,27 @@ class Resume(models.Model):
         ('failed', 'Failed')
     ], default='pending')
 
+    skills_source_field = 'parsed_text'
+
+    objects = ResumeQuerySet.as_manager()
+
     class Meta:
         ordering = ['-uploaded_at']
 
     def __str__(self):
-        return f"{self.user.username} - {self.file.name}"
+        return f"{self.user.username} - {self.file_name or 'Untitled Resume'}"
     
+    def file_source(self):
+        """
+        Where to read the uploaded file from: a local path when the blob store
+        has one, otherwise the bytes (blob store or legacy inline column)
+        """
+        if self.file_sha256:
+            from .storage import get_blob_store
+            store = get_blob_store()
+            return store.local_path(self.file_sha256) or store.read(self.file_sha256)
+        return bytes(self.file or b"")
+
     @property
     def file_size_mb(self):
         if self.file_size:
@@ -41,7 +131,7 @@ class Resume(models.Model):
         return 0
 
 
-class JobDescription(models.Model):
+class JobDescription(ExtractedSkillsModel):
     JOB_TYPE_CHOICES = [
         ('full-time', 'Full-time'),
         ('part-time', 'Part-time'),
@@ -68,6 +158,10 @@ class JobDescription(models.Model):
         ('failed', 'Failed')
     ], default='pending')
 
+    skills_source_field = 'description'
+
+    objects = JobDescriptionQuerySet.as_manager()
+
     class Meta:
         ordering = ['-uploaded_at']
 
@@ -99,9 +193,14 @@ class AnalysisResult(models.Model):
         ('gap_analysis', 'Gap Analysis'),
     ])
     result_data = models.JSONField(default=dict)
+    # Denormalized from result_data / measured by the view so stats run in SQL
+    match_percent = models.FloatField(null=True, blank=True, db_index=True)
+    duration_ms = models.PositiveIntegerField(null=True, blank=True, db_index=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = AnalysisResultQuerySet.as_manager()
+
     class Meta:
         ordering = ['-created_at']
 
@@ -109,6 +208,37 @@ class AnalysisResult(models.Model):
         return f"{self.user.username} - {self.analysis_type}"
 
 
+class ProcessingTask(models.Model):
+    """Background work item stored in the database and run by `manage.py process_tasks`"""
+    TASK_TYPE_CHOICES = [
+        ('resume_extraction', 'Resume Extraction'),
+    ]
+    STATUS_CHOICES = [
+        ('queued', 'Queued'),
+        ('running', 'Running'),
+        ('done', 'Done'),
+        ('failed', 'Failed'),
+    ]
+
+    task_type = models.CharField(max_length=50, choices=TASK_TYPE_CHOICES)
+    resume = models.ForeignKey(Resume, on_delete=models.CASCADE, related_name='processing_tasks', null=True, blank=True)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='queued')
+    attempts = models.PositiveIntegerField(default=0)
+    max_attempts = models.PositiveIntegerField(default=3)
+    last_error = models.TextField(blank=True, null=True)
+    run_after = models.DateTimeField(default=timezone.now)
+    locked_at = models.DateTimeField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['created_at']
+        indexes = [models.Index(fields=['status', 'run_after'])]
+
+    def __str__(self):
+        return f"{self.task_type} #{self.pk} ({self.status})"
+
+
 class PasswordResetToken(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     token = models.CharField(max_length=100, unique=True)
@@ -120,4 +250,38 @@ class PasswordResetToken(models.Model):
         return timezone.now() > self.expires_at
 
     def __str__(self):
-        return f"Reset token for {self.user.username}"
\ No newline at end of file
+        return f"Reset token for {self.user.username}"
+
+class RequestProfile(models.Model):
+    """A cProfile capture of one request, stored as a .prof file under PROFILE_DIR"""
+    TRIGGER_CHOICES = [
+        ('requested', 'Requested by staff'),
+        ('sampled', 'Sampled'),
+    ]
+
+    file_name = models.CharField(max_length=255, unique=True)
+    view_name = models.CharField(max_length=100, db_index=True)
+    method = models.CharField(max_length=10)
+    path = models.CharField(max_length=500)
+    user = models.ForeignKey(User, on_delete=models.SET_NULL, related_name='request_profiles', null=True, blank=True)
+    trigger = models.CharField(max_length=20, choices=TRIGGER_CHOICES)
+    status_code = models.PositiveSmallIntegerField()
+    duration_ms = models.PositiveIntegerField()
+    size_bytes = models.PositiveIntegerField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f"{self.method} {self.path} ({self.duration_ms} ms)"
+
+    @property
+    def file_path(self):
+        return os.path.join(settings.PROFILE_DIR, self.file_name)
+
+    def delete_file(self):
+        try:
+            os.unlink(self.file_path)
+        except FileNotFoundError:
+            pass
@@ -0,0 +1,124 @@
+"""
+Aho–Corasick phrase matcher for skill extraction without spaCy
+
+The automaton is built once over every skill phrase (and alias) and then finds
+all of them in a single pass over the text, independent of the number of
+phrases. A hit only counts when it sits on token boundaries, so "go" is not
+found in "good", nor "git" in "digital", nor "js" in "node.js" (a "." between
+word characters stays inside the token, as in spaCy's tokenizer). Of
+overlapping hits the leftmost-longest wins, the same rule extract_skill_ids
+applies to PhraseMatcher spans.
+"""
+from collections import deque
+
+
+def _is_word_char(ch):
+    return ch.isalnum() or ch == "_"
+
+
+def _inside_token(text, i):
+    """Whether position i (between text[i - 1] and text[i]) splits a token"""
+    if i <= 0 or i >= len(text):
+        return False
+    before, after = text[i - 1], text[i]
+    if _is_word_char(before) and _is_word_char(after):
+        return True
+    # "node|.js" and "node.|js"
+    if after == "." and _is_word_char(before):
+        return i + 1 < len(text) and _is_word_char(text[i + 1])
+    if before == "." and _is_word_char(after):
+        return i >= 2 and _is_word_char(text[i - 2])
+    return False
+
+
+def leftmost_longest(spans):
+    """
+    Keep the leftmost-longest of overlapping (start, end, ...) spans
+
+    Spans are returned in text order; a span starting inside an earlier kept
+    one is dropped, so "unit testing" leaves no separate "testing".
+    """
+    selected = []
+    last_end = None
+    for span in sorted(spans, key=lambda span: (span[0], -span[1])):
+        if last_end is None or span[0] >= last_end:
+            selected.append(span)
+            last_end = span[1]
+    return selected
+
+
+class PhraseAutomaton:
+    """
+    Matches lowercase phrases in lowercase text
+
+    phrases maps each phrase to the value reported when it is found, which lets
+    several spellings resolve to one canonical skill.
+    """
+
+    def __init__(self, phrases):
+        self._goto = [{}]
+        self._fail = [0]
+        # Per state: (phrase length, value) of every phrase ending there,
+        # including those inherited through failure links
+        self._output = [[]]
+
+        for phrase, value in phrases.items():
+            phrase = " ".join(phrase.lower().split())
+            if phrase:
+                self._add(phrase, value)
+        self._build_failure_links()
+
+    def _add(self, phrase, value):
+        state = 0
+        for ch in phrase:
+            next_state = self._goto[state].get(ch)
+            if next_state is None:
+                next_state = len(self._goto)
+                self._goto[state][ch] = next_state
+                self._goto.append({})
+                self._fail.append(0)
+                self._output.append([])
+            state = next_state
+        self._output[state].append((len(phrase), value))
+
+    def _build_failure_links(self):
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for ch, next_state in self._goto[state].items():
+                queue.append(next_state)
+                fallback = self._fail[state]
+                while fallback and ch not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                target = self._goto[fallback].get(ch, 0)
+                self._fail[next_state] = target if target != next_state else 0
+                self._output[next_state] = self._output[next_state] + self._output[self._fail[next_state]]
+
+    def __len__(self):
+        return len(self._goto)
+
+    def _candidates(self, text):
+        """Every (start, end, value) on token boundaries, overlapping or not"""
+        goto, fail, output = self._goto, self._fail, self._output
+        state = 0
+        for i, ch in enumerate(text):
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+            if not output[state]:
+                continue
+            end = i + 1
+            if _inside_token(text, end):
+                continue
+            for phrase_length, value in output[state]:
+                start = end - phrase_length
+                if not _inside_token(text, start):
+                    yield start, end, value
+
+    def iter_matches(self, text):
+        """Yield (start, end, value) for the leftmost-longest, non-overlapping phrases in text"""
+        return iter(leftmost_longest(self._candidates(text)))
+
+    def find(self, text):
+        """Return the set of values whose phrases occur in text"""
+        return {value for _, _, value in self.iter_matches(text)}
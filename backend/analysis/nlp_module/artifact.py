@@ -0,0 +1,124 @@
+"""
+Precompiled skill matcher artifact
+
+`python manage.py build_skill_matcher` compiles the taxonomy, the Aho–Corasick
+automaton and the tokenized PhraseMatcher patterns once and pickles them into
+settings.SKILL_MATCHER_ARTIFACT. Workers then load that file instead of parsing
+the taxonomy and tokenizing every phrase on startup.
+
+The artifact records the checksum of the taxonomy file it was built from and
+the spaCy model that tokenized its patterns; when either no longer matches it
+is ignored and everything is compiled from source as before.
+"""
+import logging
+import os
+import pickle
+import tempfile
+
+from django.conf import settings
+
+from .aho_corasick import PhraseAutomaton
+from .taxonomy import DEFAULT_TAXONOMY_PATH, read_taxonomy, taxonomy_checksum
+
+logger = logging.getLogger(__name__)
+
+# Bump when the pickled layout changes
+ARTIFACT_FORMAT = 1
+
+
+class CompiledSkills:
+    """Everything the skill matchers need, ready to use"""
+
+    def __init__(self, taxonomy, automaton, patterns=None, model=None):
+        self.taxonomy = taxonomy
+        self.automaton = automaton
+        # {skill_id: [(words, spaces), ...]} tokenized by `model`, or None
+        self.patterns = patterns
+        self.model = model
+
+
+def taxonomy_path():
+    return getattr(settings, "SKILL_TAXONOMY_PATH", None) or DEFAULT_TAXONOMY_PATH
+
+
+def artifact_path():
+    return getattr(settings, "SKILL_MATCHER_ARTIFACT", None)
+
+
+def model_id(nlp):
+    """Identifies the tokenizer patterns were built with"""
+    if nlp is None:
+        return None
+    return f"{nlp.meta.get('lang')}_{nlp.meta.get('name')}-{nlp.meta.get('version')}"
+
+
+def compile_skills(nlp=None):
+    """Compile the taxonomy from source; with a model, also tokenize the patterns"""
+    taxonomy = read_taxonomy(taxonomy_path())
+    automaton = PhraseAutomaton(taxonomy.phrases)
+    patterns = None
+    if nlp is not None:
+        patterns = {}
+        for phrase, skill_id in taxonomy.phrases.items():
+            doc = nlp.make_doc(phrase)
+            patterns.setdefault(skill_id, []).append(
+                ([token.text for token in doc], [bool(token.whitespace_) for token in doc])
+            )
+    return CompiledSkills(taxonomy, automaton, patterns, model_id(nlp))
+
+
+def build_artifact(path, nlp=None):
+    """Compile and write the artifact atomically; returns the CompiledSkills"""
+    compiled = compile_skills(nlp)
+    payload = {
+        "format": ARTIFACT_FORMAT,
+        "checksum": compiled.taxonomy.checksum,
+        "compiled": compiled,
+    }
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory)
+    try:
+        with os.fdopen(fd, "wb") as f:
+            pickle.dump(payload, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+    return compiled
+
+
+def load_artifact(path):
+    """CompiledSkills from path, or None if it is missing, unreadable or stale"""
+    try:
+        with open(path, "rb") as f:
+            payload = pickle.load(f)
+    except FileNotFoundError:
+        return None
+    except Exception as e:
+        logger.warning(f"Ignoring unreadable skill matcher artifact {path}: {e}")
+        return None
+
+    if payload.get("format") != ARTIFACT_FORMAT:
+        logger.warning(f"Ignoring skill matcher artifact {path}: built by another version.")
+        return None
+    if payload.get("checksum") != taxonomy_checksum(taxonomy_path()):
+        logger.warning(f"Ignoring skill matcher artifact {path}: the taxonomy has changed since it was built.")
+        return None
+    return payload["compiled"]
+
+
+def load_compiled_skills():
+    """
+    Compiled skills from the artifact when it is usable, else from source
+
+    Compiling from source never needs spaCy; PhraseMatcher patterns are only
+    available from an artifact, and are used if their model_id() matches the
+    model loaded later.
+    """
+    path = artifact_path()
+    compiled = load_artifact(path) if path else None
+    if compiled is None:
+        return compile_skills()
+    return compiled
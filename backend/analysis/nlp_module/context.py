@@ -0,0 +1,34 @@
+from .nlp_setup import make_doc, get_model
+import logging
+
+logger = logging.getLogger(__name__)
+
+class AnalysisContext:
+    """
+    Text prepared once per analysis and shared by the NLP helpers
+
+    Holds the whitespace-normalized text, its lowercase form and the spaCy Doc
+    built from it, so a resume is tokenized exactly once no matter how many
+    helpers look at it.
+    """
+
+    def __init__(self, text, doc=None):
+        self.raw_text = text or ""
+        self.text = " ".join(self.raw_text.split())
+        self.lower = self.text.lower()
+        # A Doc of self.lower produced elsewhere (e.g. by nlp.pipe) can be passed in
+        self._doc = doc
+
+    @property
+    def doc(self):
+        """spaCy Doc of the lowercase text, built on first use (None without a model)"""
+        if self._doc is None and get_model() is not None:
+            self._doc = make_doc(self.lower)
+        return self._doc
+
+
+def as_context(text):
+    """Return text as an AnalysisContext, reusing it if it already is one"""
+    if isinstance(text, AnalysisContext):
+        return text
+    return AnalysisContext(text)
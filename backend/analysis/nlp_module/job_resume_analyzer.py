@@ -1,53 +1,67 @@
-from .skill_extractor import extract_skills
+from .skill_extractor import extract_skill_ids, get_engine, skill_names, taxonomy, TAXONOMY_VERSION
 from .recommender import recommend_learning_path
 from .section_analyzer import analyze_resume_section
+from .context import AnalysisContext
+from ..result_cache import get_result_cache
+from django.conf import settings
 import logging
 
 logger = logging.getLogger(__name__)
 
-def analyze_gap(resume_text, job_text):
+# Bump whenever the shape or scoring of analyze_gap results changes so cached
+# results from the previous version are no longer served
+ANALYZER_VERSION = "4"
+
+def analysis_version():
+    """
+    Version string that cached analyze_gap results are keyed on
+
+    Covers everything that changes the result for the same texts: the
+    analyzer, parent coverage, the taxonomy, the matcher engine in use and
+    whether the full spaCy pipeline is loaded.
+    """
+    parents = "p" if settings.SKILL_PARENT_COVERAGE else ""
+    pipeline = "full" if settings.NLP_FULL_PIPELINE else "tok"
+    return f"{ANALYZER_VERSION}{parents}:{TAXONOMY_VERSION}:{get_engine()}-{pipeline}"
+
+def analyze_gap(resume_text, job_text, resume_skills=None, job_skills=None):
     """
     Analyze the gap between resume and job description
     
     Args:
         resume_text: Text extracted from resume
         job_text: Job description text
+        resume_skills: Skill ids already extracted from resume_text (optional)
+        job_skills: Skill ids already extracted from job_text (optional)
         
     Returns:
         Dictionary with analysis results including:
-        - resume_skills: Skills found in resume
-        - job_skills: Skills required by job
-        - missing_skills: Skills in job but not in resume
+        - resume_skills: Skills found in resume (display names)
+        - job_skills: Skills required by job (display names)
+        - missing_skills: Skills in job but not in resume (display names)
         - match_percent: Percentage match score
         - recommendations: Learning recommendations
         - resume_overview: Resume section analysis
+
+    When both skill lists are passed (e.g. stored on Resume/JobDescription) no
+    skill extraction runs and the gap is a plain set comparison. Results are
+    cached by the hash of both texts and analysis_version(), so repeating the
+    same pair skips spaCy entirely. Failed analyses are not cached, and cache
+    errors fall back to computing the result.
     """
+    cache = get_result_cache("analysis")
+    version = analysis_version()
     try:
-        resume_skills = extract_skills(resume_text) or []
-        job_skills = extract_skills(job_text) or []
-
-        # Calculate missing skills (case-insensitive comparison)
-        resume_skills_lower = [s.lower() for s in resume_skills]
-        missing_skills = [s for s in job_skills if s.lower() not in resume_skills_lower]
-
-        # Calculate match percentage
-        total = len(job_skills) if job_skills else 1
-        match_percent = round(100 * (len(job_skills) - len(missing_skills)) / total, 2)
-
-        # Generate recommendations
-        recommendations = recommend_learning_path(missing_skills)
-        
-        # Analyze resume sections
-        resume_info = analyze_resume_section(resume_text)
+        cached = cache.get((resume_text, job_text), version)
+    except Exception as e:
+        # A cache outage must not take the analysis down with it
+        logger.warning(f"Analysis cache lookup failed, computing instead: {e}")
+        cached = None
+    if cached is not None:
+        return cached
 
-        return {
-            "resume_skills": resume_skills,
-            "job_skills": job_skills,
-            "missing_skills": missing_skills,
-            "match_percent": match_percent,
-            "recommendations": recommendations,
-            "resume_overview": resume_info
-        }
+    try:
+        result = _compute_gap(resume_text, job_text, resume_skills, job_skills)
     except Exception as e:
         logger.error(f"Error in gap analysis: {e}", exc_info=True)
         # Return empty result on error
@@ -62,4 +76,60 @@ def analyze_gap(resume_text, job_text):
                 "has_education": False,
                 "year_experience": "Not specified"
             }
-        }
\ No newline at end of file
+        }
+
+    try:
+        cache.set((resume_text, job_text), result, version)
+    except Exception as e:
+        logger.warning(f"Could not cache analysis result: {e}")
+    return result
+
+def compare_skills(resume_skills, job_skills):
+    """
+    Compare two lists of canonical skill ids
+
+    Returns the job skill ids missing from the resume, in job order, and the
+    percentage of job skills the resume covers. With SKILL_PARENT_COVERAGE a
+    resume skill also covers its parents (Django covers Python).
+    """
+    have = set(resume_skills)
+    if settings.SKILL_PARENT_COVERAGE:
+        have = taxonomy.expand(have)
+    missing_skills = [s for s in job_skills if s not in have]
+
+    total = len(job_skills) if job_skills else 1
+    match_percent = round(100 * (len(job_skills) - len(missing_skills)) / total, 2)
+    return missing_skills, match_percent
+
+def _compute_gap(resume_text, job_text, resume_skills=None, job_skills=None):
+    """Run the uncached analysis; exceptions propagate to analyze_gap"""
+    # Normalize and tokenize each text once; every helper below reuses it
+    resume = AnalysisContext(resume_text)
+
+    if resume_skills is None:
+        resume_skills = extract_skill_ids(resume) or []
+    if job_skills is None:
+        job_skills = extract_skill_ids(AnalysisContext(job_text)) or []
+
+    # Analyze resume sections
+    resume_info = analyze_resume_section(resume)
+
+    return build_gap_result(resume_skills, job_skills, resume_info)
+
+def build_gap_result(resume_skills, job_skills, resume_overview):
+    """Assemble an analyze_gap result from already extracted skill ids"""
+    missing_skills, match_percent = compare_skills(resume_skills, job_skills)
+    # Ids are compared; the result is shown to users, so it carries names
+    missing_skills = skill_names(missing_skills)
+
+    # Generate recommendations
+    recommendations = recommend_learning_path(missing_skills)
+
+    return {
+        "resume_skills": skill_names(resume_skills),
+        "job_skills": skill_names(job_skills),
+        "missing_skills": missing_skills,
+        "match_percent": match_percent,
+        "recommendations": recommendations,
+        "resume_overview": resume_overview
+    }
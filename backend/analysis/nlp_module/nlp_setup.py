@@ -1,12 +1,29 @@
-import spacy
 import logging
+import threading
+from django.conf import settings
 
 logger = logging.getLogger(__name__)
 
-def get_nlp():
-    """Load spaCy English model with error handling"""
+# Pipeline components that skill matching never reads. The PhraseMatcher only
+# needs tokens, so these are excluded unless the full pipeline is switched on.
+UNUSED_COMPONENTS = ["tok2vec", "tagger", "parser", "attribute_ruler", "lemmatizer", "ner", "senter"]
+
+FULL_PIPELINE = getattr(settings, "NLP_FULL_PIPELINE", False)
+
+def get_nlp(full_pipeline=None):
+    """Load spaCy English model with error handling.
+
+    By default only the tokenizer is loaded; pass full_pipeline=True (or set
+    NLP_FULL_PIPELINE) to keep the tagger, parser, NER and lemmatizer.
+    """
+    import spacy
+
+    if full_pipeline is None:
+        full_pipeline = FULL_PIPELINE
     try:
-        return spacy.load("en_core_web_sm")
+        if full_pipeline:
+            return spacy.load("en_core_web_sm")
+        return spacy.load("en_core_web_sm", exclude=UNUSED_COMPONENTS)
     except OSError:
         logger.error("spaCy model 'en_core_web_sm' not found. Please run: python -m spacy download en_core_web_sm")
         raise ImportError(
@@ -14,10 +31,71 @@ def get_nlp():
             "Run: python -m spacy download en_core_web_sm"
         )
 
-# Initialize NLP model on module import
-try:
-    nlp = get_nlp()
-except ImportError:
-    nlp = None
-    logger.warning("spaCy model not loaded. NLP features will not work until model is installed.")
 
+class ModelRegistry:
+    """
+    Loads the spaCy model on first use, once per process
+
+    Importing the NLP modules no longer loads spaCy, so manage.py commands,
+    migrations and requests that never analyze text don't pay for the model.
+    A failed load is remembered and returns None, like the old import-time
+    fallback.
+    """
+
+    def __init__(self, loader):
+        self._loader = loader
+        self._lock = threading.Lock()
+        self._loaded = False
+        self._model = None
+
+    @property
+    def loaded(self):
+        return self._loaded
+
+    def get(self):
+        if self._loaded:
+            return self._model
+        with self._lock:
+            if not self._loaded:
+                try:
+                    self._model = self._loader()
+                except ImportError:
+                    self._model = None
+                    logger.warning("spaCy model not loaded. NLP features will not work until model is installed.")
+                self._loaded = True
+        return self._model
+
+    def set(self, model):
+        """Install a model directly (tests, or a caller that loaded one itself)"""
+        with self._lock:
+            self._model = model
+            self._loaded = True
+
+
+models = ModelRegistry(get_nlp)
+
+
+def get_model():
+    """The shared spaCy pipeline, loaded on first call (None if unavailable)"""
+    return models.get()
+
+
+def make_doc(text):
+    """Turn text into a Doc, running pipeline components only in full mode."""
+    nlp = get_model()
+    if FULL_PIPELINE:
+        return nlp(text)
+    return nlp.make_doc(text)
+
+
+def warm_up():
+    """
+    Load the model and build the skill matchers now instead of on first use
+
+    Called by web entry points (settings.NLP_WARMUP) so the first analysis
+    request doesn't pay for loading.
+    """
+    from .skill_extractor import get_matcher
+
+    get_matcher()
+    return get_model()
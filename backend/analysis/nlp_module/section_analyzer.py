@@ -1,47 +1,33 @@
 import re 
-from .nlp_setup import get_nlp, nlp
+from .context import as_context
+from ..instrumentation import stage
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Simple patterns for keyword matching
+EXPERIENCE_KEYWORDS = ["experience", "worked", "intern", "project", "developer", "engineer"]
+EDUCATION_KEYWORDS = ["bachelor", "master", "university", "college", "degree", "school"]
+
+@stage("analyze_resume_section")
 def analyze_resume_section(resume_text):
-    """Analyze resume sections (experience, education, years of experience)"""
-    if nlp is None:
-        logger.warning("NLP model not loaded. Using basic pattern matching.")
-        # Fallback to basic pattern matching
-        experience_keywords = ["experience", "worked", "intern", "project", "developer", "engineer"]
-        education_keywords = ["bachelor", "master", "university", "college", "degree", "school"]
-        
-        exp_found = any(word in resume_text.lower() for word in experience_keywords)
-        edu_found = any(word in resume_text.lower() for word in education_keywords)
-        year_exp = re.findall(r"(\d+)\+?\s+years?", resume_text.lower())
-        year_exp = year_exp[0] if year_exp else "Not specified"
-        
-        return {
-            "has_experience": exp_found,
-            "has_education": edu_found,
-            "year_experience": year_exp
-        }
-    
-    try:
-        doc = nlp(resume_text)
-    except Exception as e:
-        logger.warning(f"Error processing resume with NLP: {e}. Using basic pattern matching.")
-        # Fallback already handled above
-        pass
+    """
+    Analyze resume sections (experience, education, years of experience)
 
-    # Simple patterns for keyword matching
-    experience_keywords = ["experience", "worked", "intern", "project", "developer", "engineer"]
-    education_keywords = ["bachelor", "master", "university", "college", "degree", "school"]
+    Accepts raw text or an AnalysisContext; only the lowercase form is needed,
+    so no spaCy processing happens here.
+    """
+    context = as_context(resume_text)
+    text = context.lower
 
-    exp_found = any(word in resume_text.lower() for word in experience_keywords)
-    edu_found = any(word in resume_text.lower() for word in education_keywords)
+    exp_found = any(word in text for word in EXPERIENCE_KEYWORDS)
+    edu_found = any(word in text for word in EDUCATION_KEYWORDS)
     
-    year_exp = re.findall(r"(\d+)\+?\s+years?", resume_text.lower())
+    year_exp = re.findall(r"(\d+)\+?\s+years?", text)
     year_exp = year_exp[0] if year_exp else "Not specified"
 
     return {
         "has_experience": exp_found,
         "has_education": edu_found,
         "year_experience": year_exp
-    }
\ No newline at end of file
+    }
@@ -1,77 +1,173 @@
-from .nlp_setup import get_nlp, nlp
-from spacy.matcher import PhraseMatcher
+from .nlp_setup import get_model
+from .context import AnalysisContext, as_context
+from .artifact import load_compiled_skills, model_id
+from .aho_corasick import leftmost_longest
+from ..instrumentation import stage
+from django.conf import settings
 import logging
+import threading
 
 logger = logging.getLogger(__name__)
 
 # =========================================================
-# ✅ Master Skill List – Technical + Non-Technical
+# ✅ Skill Taxonomy – Technical + Non-Technical
 # =========================================================
-SKILL_LIST = [
-    # --- Technical Skills ---
-    "python", "django", "flask", "fastapi", "react", "javascript", "typescript",
-    "node.js", "express", "next.js", "java", "spring", "c++", "c#", "go", "rust",
-    "sql", "mysql", "postgresql", "mongodb", "redis", "sqlite", "oracle",
-    "aws", "azure", "gcp", "docker", "kubernetes", "terraform", "jenkins",
-    "git", "github", "gitlab", "bitbucket", "ci/cd",
-    "html", "css", "sass", "tailwind", "bootstrap",
-    "machine learning", "deep learning", "nlp", "data analysis",
-    "computer vision", "pandas", "numpy", "tensorflow", "pytorch",
-    "scikit-learn", "matplotlib", "power bi", "tableau",
-    "linux", "ubuntu", "bash", "shell scripting",
-    "rest", "graphql", "api development", "microservices",
-    "testing", "unit testing", "selenium", "pytest", "postman",
-    "cybersecurity", "networking", "cloud computing", "devops",
-    "data engineering", "big data", "hadoop", "spark",
-    "etl", "data visualization", "blockchain", "web3",
-    "flutter", "kotlin", "swift",
-
-    # --- Non-Technical / Soft Skills ---
-    "communication", "leadership", "teamwork", "problem solving",
-    "time management", "adaptability", "creativity", "critical thinking",
-    "attention to detail", "collaboration", "decision making",
-    "negotiation", "emotional intelligence", "work ethic",
-    "conflict resolution", "project management", "mentoring",
-    "presentation", "organization", "self motivation",
-    "analytical thinking", "strategic planning", "customer focus",
-    "multi-tasking", "innovation", "responsibility", "accountability",
-    "interpersonal skills", "flexibility", "initiative"
-]
+# Skills, aliases, categories and parents live in data/skills_taxonomy.json
+# (or settings.SKILL_TAXONOMY_PATH); matching works on canonical ids. A
+# prebuilt artifact (manage.py build_skill_matcher) is used when up to date.
+compiled = load_compiled_skills()
+taxonomy = compiled.taxonomy
+SKILL_LIST = taxonomy.ids
+
+# Changes whenever the taxonomy file is edited; stored skills and cached
+# analyses keyed on it go stale
+TAXONOMY_VERSION = f"{taxonomy.version}-{taxonomy.checksum}"
 
 # =========================================================
-# ✅ Initialize Matcher Once (for Performance)
+# ✅ Initialize Matchers Once (for Performance)
 # =========================================================
-matcher = None
-if nlp:
-    try:
-        matcher = PhraseMatcher(nlp.vocab)
-        patterns = [nlp.make_doc(skill) for skill in SKILL_LIST]
-        matcher.add("SKILLS", patterns)
-        logger.info("PhraseMatcher initialized successfully with skills.")
-    except Exception as e:
-        logger.error(f"Error initializing PhraseMatcher: {e}", exc_info=True)
-        matcher = None
+# "phrasematcher" uses spaCy tokens, "automaton" the pure-Python Aho–Corasick
+# matcher; "auto" picks the PhraseMatcher when a spaCy model is loaded.
+ENGINES = ("auto", "phrasematcher", "automaton")
 
+automaton = compiled.automaton
 
-# Skill Extraction Function
-def extract_skills(text: str):
-    """Extract skills from text using spaCy phrase matching."""
+_matcher = None
+_matcher_lock = threading.Lock()
+
+
+def _build_matcher(nlp):
+    from spacy.matcher import PhraseMatcher
+    from spacy.tokens import Doc
+
+    matcher = PhraseMatcher(nlp.vocab)
+    # One match key per skill id, with every spelling as a pattern
+    if compiled.patterns is not None and compiled.model == model_id(nlp):
+        spellings = {
+            skill_id: [Doc(nlp.vocab, words=words, spaces=spaces) for words, spaces in tokens]
+            for skill_id, tokens in compiled.patterns.items()
+        }
+    else:
+        spellings = {}
+        for phrase, skill_id in taxonomy.phrases.items():
+            spellings.setdefault(skill_id, []).append(nlp.make_doc(phrase))
+    for skill_id, patterns in spellings.items():
+        matcher.add(skill_id, patterns)
+    return matcher
+
+
+def get_matcher():
+    """
+    The spaCy PhraseMatcher, built on first use (None without a model)
+
+    Loading the model and building the matcher is deferred until a text is
+    actually matched, so importing this module stays cheap.
+    """
+    global _matcher
+    if _matcher is not None:
+        return _matcher
+    nlp = get_model()
+    if nlp is None:
+        return None
+    with _matcher_lock:
+        if _matcher is None:
+            try:
+                _matcher = _build_matcher(nlp)
+                logger.info("PhraseMatcher initialized successfully with skills.")
+            except Exception as e:
+                logger.error(f"Error initializing PhraseMatcher: {e}", exc_info=True)
+                return None
+    return _matcher
+
+
+def get_engine():
+    """Name of the matcher extract_skills uses, from settings.SKILL_MATCHER"""
+    engine = getattr(settings, "SKILL_MATCHER", "auto")
+    if engine not in ENGINES:
+        logger.warning(f"Unknown SKILL_MATCHER '{engine}'. Using 'auto'.")
+        engine = "auto"
+    if engine == "automaton" or get_matcher() is None:
+        return "automaton"
+    return "phrasematcher"
+
+
+@stage("extract_skills")
+def extract_skill_ids(text):
+    """
+    Canonical ids of the skills found in text, sorted
+
+    Accepts raw text or an AnalysisContext; passing a context reuses its
+    normalized text and Doc instead of tokenizing again. Of overlapping
+    matches only the leftmost-longest counts, with either engine. Ids are what
+    gets stored and compared; skill_names() turns them into display names.
+    """
     if not text:
         return []
 
-    # Normalize text (lowercase + remove extra spaces)
-    text = " ".join(text.split()).lower()
+    context = as_context(text)
 
-    if nlp is None or matcher is None:
-        logger.warning("NLP model or matcher not loaded. Using basic keyword matching.")
-        return [skill for skill in SKILL_LIST if skill.lower() in text]
+    if get_engine() == "automaton":
+        return sorted(automaton.find(context.lower))
 
     try:
-        doc = nlp(text)
-        matches = matcher(doc)
-        found = list({doc[start:end].text for _, start, end in matches})
-        # Return cleaned and capitalized results
-        return sorted([skill.title() for skill in found])
+        doc = context.doc
+        strings = doc.vocab.strings
+        matches = ((start, end, match_id) for match_id, start, end in get_matcher()(doc))
+        return sorted({strings[match_id] for _, _, match_id in leftmost_longest(matches)})
     except Exception as e:
         logger.error(f"Error extracting skills: {e}", exc_info=True)
-        return [skill for skill in SKILL_LIST if skill.lower() in text]
+        return sorted(automaton.find(context.lower))
+
+
+def skill_names(skill_ids):
+    """Display names for skill ids, sorted (for API responses and prompts)"""
+    return sorted(taxonomy.display(skill_id) for skill_id in skill_ids)
+
+
+# Skill Extraction Function
+def extract_skills(text):
+    """
+    Extract skills from text using spaCy phrase matching, or the
+    Aho–Corasick automaton when that engine is selected or no model is loaded.
+
+    Returns the canonical display name of each skill found (one per id, so
+    "k8s" and "Kubernetes" both give "Kubernetes"), sorted.
+    """
+    return skill_names(extract_skill_ids(text))
+
+
+def iter_skill_ids(texts, batch_size=64, n_process=1):
+    """
+    Yield the skill ids of each text, in input order
+
+    texts may be any iterable (a generator over a queryset, for instance) and
+    is consumed lazily. Tokenization is streamed through nlp.pipe in batches;
+    with n_process > 1 spaCy spreads the batches over worker processes, which
+    pays off for backfills of thousands of documents.
+    """
+    if get_engine() == "automaton":
+        for text in texts:
+            yield extract_skill_ids(text)
+        return
+
+    contexts = (AnalysisContext(text) for text in texts)
+    # nlp.pipe only sees strings, so keep each context alongside its text
+    pairs = ((context.lower, context) for context in contexts)
+    for doc, context in get_model().pipe(pairs, as_tuples=True, batch_size=batch_size, n_process=n_process):
+        yield extract_skill_ids(AnalysisContext(context.raw_text, doc=doc))
+
+
+def iter_skills(texts, batch_size=64, n_process=1):
+    """Like iter_skill_ids(), yielding display names"""
+    for skill_ids in iter_skill_ids(texts, batch_size=batch_size, n_process=n_process):
+        yield skill_names(skill_ids)
+
+
+def extract_skill_ids_batch(texts, batch_size=64, n_process=1):
+    """Skill ids of many texts, one sorted list per text in order"""
+    return list(iter_skill_ids(texts, batch_size=batch_size, n_process=n_process))
+
+
+def extract_skills_batch(texts, batch_size=64, n_process=1):
+    """Extract skills from many texts, returning one skill list per text in order"""
+    return list(iter_skills(texts, batch_size=batch_size, n_process=n_process))
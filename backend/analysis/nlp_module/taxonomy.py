@@ -0,0 +1,109 @@
+"""
+Skill taxonomy loaded from a versioned data file
+
+Each skill has a canonical id, a display name, a category (technical/soft),
+optional aliases and an optional parent skill. The file is compiled once into
+lookup tables shared by both matcher engines: every spelling (id, display name,
+alias) maps to exactly one id, so "Postgres", "postgresql" and "PostgreSQL" are
+the same skill everywhere downstream.
+
+The compiled form is normally loaded through artifact.load_compiled_skills().
+"""
+import hashlib
+import json
+import logging
+import os
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TAXONOMY_PATH = os.path.join(os.path.dirname(__file__), "data", "skills_taxonomy.json")
+
+CATEGORIES = ("technical", "soft")
+
+
+class TaxonomyError(ValueError):
+    """The taxonomy file is malformed"""
+
+
+def normalize_phrase(phrase):
+    """Lowercase, whitespace-collapsed form every spelling is looked up by"""
+    return " ".join(str(phrase).lower().split())
+
+
+class Taxonomy:
+    def __init__(self, data, checksum):
+        self.version = str(data.get("version", ""))
+        self.checksum = checksum
+        self.names = {}
+        self.categories = {}
+        self.parents = {}
+        # Every known spelling -> canonical id
+        self.phrases = {}
+
+        for entry in data.get("skills", []):
+            skill_id = normalize_phrase(entry.get("id", ""))
+            if not skill_id:
+                raise TaxonomyError(f"Skill without an id: {entry}")
+            if skill_id in self.names:
+                raise TaxonomyError(f"Duplicate skill id '{skill_id}'")
+            category = entry.get("category", "technical")
+            if category not in CATEGORIES:
+                raise TaxonomyError(f"Unknown category '{category}' for '{skill_id}'")
+
+            self.names[skill_id] = entry.get("name") or skill_id.title()
+            self.categories[skill_id] = category
+            if entry.get("parent"):
+                self.parents[skill_id] = normalize_phrase(entry["parent"])
+
+            for phrase in [skill_id, self.names[skill_id], *entry.get("aliases", [])]:
+                phrase = normalize_phrase(phrase)
+                owner = self.phrases.setdefault(phrase, skill_id)
+                if owner != skill_id:
+                    raise TaxonomyError(f"'{phrase}' is claimed by both '{owner}' and '{skill_id}'")
+
+        for skill_id, parent in self.parents.items():
+            if parent not in self.names:
+                raise TaxonomyError(f"Parent '{parent}' of '{skill_id}' is not a skill")
+
+        self.ids = list(self.names)
+
+    def resolve(self, skill):
+        """Canonical id for any spelling of a skill, or None if it is unknown"""
+        return self.phrases.get(normalize_phrase(skill))
+
+    def display(self, skill_id):
+        return self.names.get(skill_id, skill_id)
+
+    def ancestors(self, skill_id):
+        """Parent, grandparent, ... of a skill"""
+        seen = []
+        parent = self.parents.get(skill_id)
+        while parent and parent not in seen:
+            seen.append(parent)
+            parent = self.parents.get(parent)
+        return seen
+
+    def expand(self, skill_ids):
+        """skill_ids plus every ancestor, since knowing Django implies knowing Python"""
+        expanded = set(skill_ids)
+        for skill_id in skill_ids:
+            expanded.update(self.ancestors(skill_id))
+        return expanded
+
+
+def _checksum(raw):
+    # Covers the whole file, so any edit invalidates stored skills
+    return hashlib.sha256(raw).hexdigest()[:12]
+
+
+def taxonomy_checksum(path):
+    with open(path, "rb") as f:
+        return _checksum(f.read())
+
+
+def read_taxonomy(path):
+    with open(path, "rb") as f:
+        raw = f.read()
+    taxonomy = Taxonomy(json.loads(raw), _checksum(raw))
+    logger.info(f"Loaded skill taxonomy {taxonomy.version} ({len(taxonomy.ids)} skills) from {path}")
+    return taxonomy
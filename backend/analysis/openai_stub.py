@@ -0,0 +1,124 @@
+"""
+Local stand-in for the OpenAI API
+
+Implements just enough of /v1/chat/completions and /v1/audio/transcriptions
+for the views that call OpenAI, with configurable latency and injected
+failures, so tests and load tests never reach the real service. Run it with
+`python manage.py run_openai_stub` and set OPENAI_BASE_URL=http://host:port/v1,
+or start it in-process with StubServer(...).start().
+"""
+import contextlib
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+SPEECH_SCORES = {"clarity": 7, "confidence": 6, "fluency": 8, "feedback": "Slow down slightly and pause between points."}
+TRANSCRIPT = "I enjoy building reliable web applications with my team."
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, status, payload, headers=None):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        server = self.server
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0) or 0))
+        server.record(self.path)
+        with server.in_flight():
+            self._respond(server, body)
+
+    def _respond(self, server, body):
+        if server.delay:
+            time.sleep(server.delay)
+        if server.fail_rate and random.random() < server.fail_rate:
+            self._send(server.fail_status, {"error": {"message": "Injected failure", "type": "server_error"}},
+                       {"Retry-After": "0"})
+            return
+
+        if self.path.endswith("/chat/completions"):
+            request = json.loads(body or b"{}")
+            if (request.get("response_format") or {}).get("type") == "json_object":
+                content = json.dumps(SPEECH_SCORES)
+            else:
+                prompt = request.get("messages", [{}])[-1].get("content", "")
+                content = "PROFESSIONAL SUMMARY\n" + " ".join(prompt.split())[:200]
+            self._send(200, {
+                "id": "chatcmpl-stub",
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": request.get("model", "stub"),
+                "choices": [{
+                    "index": 0,
+                    "message": {"role": "assistant", "content": content},
+                    "finish_reason": "stop",
+                }],
+                "usage": {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0},
+            })
+        elif self.path.endswith("/audio/transcriptions"):
+            self._send(200, {"text": TRANSCRIPT if len(body) > 0 else ""})
+        else:
+            self._send(404, {"error": {"message": f"Unknown path {self.path}"}})
+
+
+class StubServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, host="127.0.0.1", port=0, delay=0.0, fail_rate=0.0, fail_status=500):
+        super().__init__((host, port), StubHandler)
+        self.delay = delay
+        self.fail_rate = fail_rate
+        self.fail_status = fail_status
+        self.requests = {}
+        # Requests being answered right now, and the most seen at once
+        self.active = 0
+        self.peak_active = 0
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def handle_error(self, request, client_address):
+        # Clients that time out hang up mid-response; that is expected here
+        pass
+
+    def record(self, path):
+        with self._lock:
+            self.requests[path] = self.requests.get(path, 0) + 1
+
+    @contextlib.contextmanager
+    def in_flight(self):
+        with self._lock:
+            self.active += 1
+            self.peak_active = max(self.peak_active, self.active)
+        try:
+            yield
+        finally:
+            with self._lock:
+                self.active -= 1
+
+    @property
+    def base_url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def start(self):
+        """Serve from a background thread; returns self"""
+        self._thread = threading.Thread(target=self.serve_forever, kwargs={"poll_interval": 0.05}, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
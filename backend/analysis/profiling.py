@@ -0,0 +1,220 @@
+"""
+On-demand cProfile capture of single requests
+
+ProfilingMiddleware wraps a view in cProfile when one of two things holds:
+- a staff user asks for it, with an `X-Profile: 1` header or `?profile=1`;
+- the request falls within PROFILE_SAMPLE_RATE (0.01 profiles 1%).
+Only views named in PROFILE_VIEWS are eligible.
+
+Under ASGI the profiler runs on the event loop thread while the request is
+awaited, so a profile there can include other requests served concurrently.
+
+The stats are written as a .prof file into PROFILE_DIR. That format is read
+by `python -m pstats`, snakeviz, and flameprof for flame graphs. Each file
+gets a RequestProfile row, listed in the Django admin. The directory is
+rotated after every capture: the oldest files are deleted until at most
+PROFILE_MAX_FILES files and PROFILE_MAX_BYTES bytes remain.
+"""
+import cProfile
+import io
+import logging
+import os
+import pstats
+import random
+import tempfile
+import time
+import uuid
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.urls import Resolver404, resolve
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+
+def profile_dir():
+    return settings.PROFILE_DIR
+
+
+def _staff_requested(request):
+    """True if the request asks to be profiled and comes from a staff user"""
+    if request.META.get("HTTP_X_PROFILE") != "1" and request.GET.get("profile") != "1":
+        return False
+    user = getattr(request, "user", None)
+    if user is not None and user.is_authenticated:
+        return user.is_staff
+    # API clients authenticate with a JWT, which DRF only checks inside the view
+    from rest_framework_simplejwt.authentication import JWTAuthentication
+    from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+
+    try:
+        user_auth = JWTAuthentication().authenticate(request)
+    except (InvalidToken, AuthenticationFailed):
+        return False
+    return bool(user_auth and user_auth[0].is_staff)
+
+
+def _view_name(request):
+    """URL name of the view the request will reach, or None if it resolves to none"""
+    try:
+        return resolve(request.path_info, getattr(request, "urlconf", None)).view_name
+    except Resolver404:
+        return None
+
+
+def profile_trigger(request, view_name):
+    """"requested", "sampled" or None if this request isn't to be profiled"""
+    if not settings.PROFILING_ENABLED or view_name not in settings.PROFILE_VIEWS:
+        return None
+    if _staff_requested(request):
+        return "requested"
+    if settings.PROFILE_SAMPLE_RATE and random.random() < settings.PROFILE_SAMPLE_RATE:
+        return "sampled"
+    return None
+
+
+def save_profile(profiler, request, view_name, trigger, status_code, duration_ms):
+    """Write the stats to PROFILE_DIR, record a RequestProfile and rotate"""
+    from .models import RequestProfile
+
+    directory = profile_dir()
+    os.makedirs(directory, exist_ok=True)
+    file_name = f"{timezone.now():%Y%m%d-%H%M%S}-{view_name}-{uuid.uuid4().hex[:8]}.prof"
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    os.close(fd)
+    try:
+        profiler.dump_stats(tmp_path)
+        os.replace(tmp_path, os.path.join(directory, file_name))
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+
+    user = getattr(request, "user", None)
+    profile = RequestProfile.objects.create(
+        file_name=file_name,
+        view_name=view_name,
+        method=request.method,
+        path=request.get_full_path()[:500],
+        user=user if user is not None and user.is_authenticated else None,
+        trigger=trigger,
+        status_code=status_code,
+        duration_ms=duration_ms,
+        size_bytes=os.path.getsize(os.path.join(directory, file_name)),
+    )
+    rotate()
+    return profile
+
+
+def rotate():
+    """Delete the oldest profiles beyond PROFILE_MAX_FILES / PROFILE_MAX_BYTES"""
+    from .models import RequestProfile
+
+    directory = profile_dir()
+    try:
+        entries = [entry for entry in os.scandir(directory) if entry.name.endswith(".prof")]
+    except FileNotFoundError:
+        return []
+    entries.sort(key=lambda entry: entry.stat().st_mtime, reverse=True)
+
+    kept_files = kept_bytes = 0
+    removed = []
+    for entry in entries:
+        size = entry.stat().st_size
+        if kept_files < settings.PROFILE_MAX_FILES and kept_bytes + size <= settings.PROFILE_MAX_BYTES:
+            kept_files += 1
+            kept_bytes += size
+            continue
+        try:
+            os.unlink(entry.path)
+        except FileNotFoundError:
+            pass
+        removed.append(entry.name)
+    if removed:
+        RequestProfile.objects.filter(file_name__in=removed).delete()
+    return removed
+
+
+def summarize(path, limit=30):
+    """Top functions by cumulative time, as pstats prints them"""
+    out = io.StringIO()
+    pstats.Stats(path, stream=out).sort_stats("cumulative").print_stats(limit)
+    return out.getvalue()
+
+
+class ProfilingMiddleware:
+    """
+    Runs eligible views under cProfile (see module docstring)
+
+    Kept last in MIDDLEWARE so only the view itself is profiled. The profiler
+    wraps the rest of the handler, so view exceptions are still turned into
+    responses as usual. Responses to a staff request carry an X-Profile-Id
+    header with the RequestProfile id. Works in both sync and async stacks.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if not settings.PROFILING_ENABLED:
+            return self.get_response(request)
+        view_name = _view_name(request)
+        trigger = profile_trigger(request, view_name)
+        profiler = self._start(trigger)
+        if profiler is None:
+            return self.get_response(request)
+
+        started = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            profiler.disable()
+        return self._finish(profiler, request, response, view_name, trigger, started)
+
+    async def __acall__(self, request):
+        if not settings.PROFILING_ENABLED:
+            return await self.get_response(request)
+        view_name = _view_name(request)
+        # Staff checks may authenticate a JWT against the database
+        trigger = await sync_to_async(profile_trigger)(request, view_name)
+        profiler = self._start(trigger)
+        if profiler is None:
+            return await self.get_response(request)
+
+        started = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            profiler.disable()
+        return await sync_to_async(self._finish)(profiler, request, response, view_name, trigger, started)
+
+    def _start(self, trigger):
+        """An enabled profiler, or None if the request isn't profiled"""
+        if trigger is None:
+            return None
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError:
+            # Another profiler is already active
+            return None
+        return profiler
+
+    def _finish(self, profiler, request, response, view_name, trigger, started):
+        duration_ms = round((time.perf_counter() - started) * 1000)
+        try:
+            profile = save_profile(profiler, request, view_name, trigger, response.status_code, duration_ms)
+        except Exception as e:
+            logger.error(f"Could not save request profile: {e}", exc_info=True)
+            return response
+        if trigger == "requested":
+            response["X-Profile-Id"] = str(profile.pk)
+        return response
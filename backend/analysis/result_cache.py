@@ -0,0 +1,188 @@
+"""
+Content-addressed caches for expensive, deterministic results
+
+Entries are keyed by a SHA-256 of the inputs plus a version string, so changing
+the version (analyzer release, skill list edit, ...) makes every old entry
+unreachable without an explicit flush. Each named cache is configured in
+settings.RESULT_CACHES and stored in a pluggable backend:
+
+- "locmem": per-process LRU with TTL and a maximum entry count
+- "django": any alias from settings.CACHES (database table, Redis, ...); size
+  eviction is then handled by that cache's own MAX_ENTRIES option
+- "none": caching disabled
+
+Hit and miss counts are kept in memory per process, so a lookup costs one
+backend round trip whatever the backend.
+"""
+import copy
+import hashlib
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+
+logger = logging.getLogger(__name__)
+
+_MISSING = object()
+
+
+class LRUBackend:
+    """Thread-safe in-process LRU store with per-entry expiry"""
+
+    def __init__(self, max_entries=512, **options):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return _MISSING
+            expires_at, value = entry
+            if expires_at is not None and expires_at <= time.monotonic():
+                del self._entries[key]
+                return _MISSING
+            self._entries.move_to_end(key)
+            return copy.deepcopy(value)
+
+    def set(self, key, value, ttl):
+        expires_at = time.monotonic() + ttl if ttl else None
+        with self._lock:
+            self._entries[key] = (expires_at, copy.deepcopy(value))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class DjangoCacheBackend:
+    """
+    Stores entries in a Django cache alias from settings.CACHES
+
+    The alias may be shared with other caches, so clear() doesn't flush it:
+    it bumps a generation number that every key of this cache includes,
+    leaving the old entries unreachable until they expire or are culled.
+    """
+
+    def __init__(self, alias="default", namespace="", **options):
+        self.alias = alias
+        self.generation_key = f"{namespace}:__generation__"
+
+    @property
+    def cache(self):
+        return caches[self.alias]
+
+    def _key(self, key):
+        return f"{self.cache.get(self.generation_key, 0)}:{key}"
+
+    def get(self, key):
+        return self.cache.get(self._key(key), _MISSING)
+
+    def set(self, key, value, ttl):
+        self.cache.set(self._key(key), value, timeout=ttl or None)
+
+    def clear(self):
+        try:
+            self.cache.incr(self.generation_key)
+        except ValueError:
+            if not self.cache.add(self.generation_key, 1, timeout=None):
+                self.cache.incr(self.generation_key)
+
+
+class NullBackend:
+    """Never stores anything; used to switch a cache off"""
+
+    def __init__(self, **options):
+        pass
+
+    def get(self, key):
+        return _MISSING
+
+    def set(self, key, value, ttl):
+        pass
+
+    def clear(self):
+        pass
+
+
+BACKENDS = {
+    "locmem": LRUBackend,
+    "django": DjangoCacheBackend,
+    "none": NullBackend,
+}
+
+
+class ResultCache:
+    """A named, versioned cache in front of a compute function"""
+
+    def __init__(self, name, backend, ttl=None):
+        self.name = name
+        self.backend = backend
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._stats_lock = threading.Lock()
+
+    def make_key(self, parts, version=""):
+        """Hash the inputs and version into a fixed-length cache key"""
+        payload = json.dumps([version, list(parts)], sort_keys=True, default=str)
+        digest = hashlib.sha256(payload.encode("utf-8")).hexdigest()
+        return f"{self.name}:{digest}"
+
+    def get(self, parts, version=""):
+        value = self.backend.get(self.make_key(parts, version))
+        with self._stats_lock:
+            if value is _MISSING:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return None if value is _MISSING else value
+
+    def set(self, parts, value, version=""):
+        self.backend.set(self.make_key(parts, version), value, self.ttl)
+
+    def clear(self):
+        self.backend.clear()
+
+    def stats(self):
+        """Hit/miss counts of this process, and the entry count for in-process backends"""
+        stats = {"name": self.name, "hits": self.hits, "misses": self.misses}
+        if hasattr(self.backend, "__len__"):
+            stats["entries"] = len(self.backend)
+        return stats
+
+
+_caches = {}
+_caches_lock = threading.Lock()
+
+
+def get_result_cache(name):
+    """Return the ResultCache configured as settings.RESULT_CACHES[name]"""
+    with _caches_lock:
+        if name not in _caches:
+            config = dict(getattr(settings, "RESULT_CACHES", {}).get(name, {}))
+            backend_name = config.pop("BACKEND", "locmem")
+            ttl = config.pop("TTL", None)
+            options = {key.lower(): value for key, value in config.items()}
+            if backend_name not in BACKENDS:
+                logger.warning(f"Unknown result cache backend '{backend_name}' for '{name}'. Caching disabled.")
+                backend_name = "none"
+            options.setdefault("namespace", name)
+            _caches[name] = ResultCache(name, BACKENDS[backend_name](**options), ttl=ttl)
+        return _caches[name]
+
+
+def all_stats():
+    """stats() of every cache configured in settings.RESULT_CACHES"""
+    return [get_result_cache(name).stats() for name in getattr(settings, "RESULT_CACHES", {})]
@@ -1,6 +1,7 @@
 from rest_framework import serializers
 from .models import Resume, JobDescription, UserProfile, AnalysisResult, PasswordResetToken
 from django.contrib.auth.models import User
+from .nlp_module.skill_extractor import skill_names
 from django.contrib.auth import authenticate
 from django.utils import timezone
 from datetime import timedelta
@@ -80,22 +81,31 @@ class UserProfileSerializer(serializers.ModelSerializer):
 #                  'file_size', 'file_size_mb', 'file_type', 'is_processed', 'processing_status']
 #         read_only_fields = ['id', 'user', 'uploaded_at', 'updated_at', 'file_size', 'file_type', 'is_processed', 'processing_status']
 
+class SkillNamesField(serializers.ReadOnlyField):
+    """Stored skill ids shown as display names"""
+
+    def to_representation(self, value):
+        return skill_names(value or [])
+
+
 class ResumeSerializer(serializers.ModelSerializer):
     user = serializers.PrimaryKeyRelatedField(read_only=True)
     file_size_mb = serializers.ReadOnlyField()
     username = serializers.CharField(source='user.username', read_only=True)
     file_content = serializers.SerializerMethodField()  # <-- optional: to view stored binary as base64 (for admin/debug)
+    skills = SkillNamesField()
 
     class Meta:
         model = Resume
         fields = [
             'id', 'user', 'username', 'file_name', 'parsed_text', 'uploaded_at', 'updated_at',
             'file_size', 'file_size_mb', 'file_type', 'is_processed', 'processing_status',
+            'skills',
             'file_content'  # optional: remove if you don't want to expose binary data
         ]
         read_only_fields = [
             'id', 'user', 'uploaded_at', 'updated_at',
-            'file_size', 'file_type', 'is_processed', 'processing_status'
+            'file_size', 'file_type', 'is_processed', 'processing_status', 'skills'
         ]
 
     def get_file_content(self, obj):
@@ -108,15 +118,32 @@ class ResumeSerializer(serializers.ModelSerializer):
             return base64.b64encode(obj.file_data).decode('utf-8')
         return None
 
+class ResumeSummarySerializer(serializers.ModelSerializer):
+    """Resume metadata for listings; leaves out parsed_text and file content"""
+    user = serializers.PrimaryKeyRelatedField(read_only=True)
+    file_size_mb = serializers.ReadOnlyField()
+    username = serializers.CharField(source='user.username', read_only=True)
+    skills = SkillNamesField()
+
+    class Meta:
+        model = Resume
+        fields = [
+            'id', 'user', 'username', 'file_name', 'uploaded_at', 'updated_at',
+            'file_size', 'file_size_mb', 'file_type', 'is_processed', 'processing_status',
+            'skills'
+        ]
+        read_only_fields = fields
+
 class JobDescriptionSerializer(serializers.ModelSerializer):
     username = serializers.CharField(source='user.username', read_only=True)
+    skills = SkillNamesField()
     
     class Meta:
         model = JobDescription
         fields = ['id', 'user', 'username', 'title', 'company', 'location', 'description', 
                  'requirements', 'salary', 'job_type', 'uploaded_at', 'updated_at', 
-                 'is_analyzed', 'analysis_status']
-        read_only_fields = ['id', 'user', 'uploaded_at', 'updated_at', 'is_analyzed', 'analysis_status']
+                 'is_analyzed', 'analysis_status', 'skills']
+        read_only_fields = ['id', 'user', 'uploaded_at', 'updated_at', 'is_analyzed', 'analysis_status', 'skills']
 
 
 class RegisterSerializer(serializers.ModelSerializer):
@@ -277,8 +304,8 @@ class AnalysisResultSerializer(serializers.ModelSerializer):
     class Meta:
         model = AnalysisResult
         fields = ['id', 'user', 'resume', 'job', 'resume_title', 'job_title', 
-                 'analysis_type', 'result_data', 'created_at', 'updated_at']
-        read_only_fields = ['id', 'user', 'created_at', 'updated_at']
+                 'analysis_type', 'result_data', 'match_percent', 'duration_ms', 'created_at', 'updated_at']
+        read_only_fields = ['id', 'user', 'match_percent', 'duration_ms', 'created_at', 'updated_at']
 
 
 class DashboardStatsSerializer(serializers.Serializer):
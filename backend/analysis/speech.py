@@ -0,0 +1,178 @@
+"""
+Speech assessment helpers: upload limits and pluggable transcription
+
+Audio uploads are capped at SPEECH_MAX_BYTES while the body is being read
+(AudioSizeLimitHandler stops the upload as soon as the limit is crossed) and
+at SPEECH_MAX_SECONDS once the duration can be read from the file header.
+Transcription goes through the backend named by SPEECH_TRANSCRIPTION_BACKEND,
+which receives the uploaded file object itself and streams it instead of
+holding a second copy of the audio in memory.
+"""
+import logging
+import wave
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.files.uploadhandler import FileUploadHandler, StopUpload
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+
+class AudioTooLarge(Exception):
+    """The upload exceeds SPEECH_MAX_BYTES or SPEECH_MAX_SECONDS"""
+
+
+# Room for multipart boundaries, part headers and small form fields on top
+# of the audio itself, when judging a request by its Content-Length
+MULTIPART_ALLOWANCE = 64 * 1024
+
+
+def body_too_large(content_length, max_bytes):
+    """True if a body of content_length can't hold a file within max_bytes"""
+    return bool(content_length) and content_length > max_bytes + MULTIPART_ALLOWANCE
+
+
+class AudioSizeLimitHandler(FileUploadHandler):
+    """
+    First upload handler in the chain; aborts the upload past max_bytes
+
+    The limit applies to the file bytes received. Chunks are passed through
+    untouched to the next handler (memory or temporary file), so the limit
+    costs nothing for uploads within it.
+    """
+
+    def __init__(self, max_bytes, request=None):
+        super().__init__(request)
+        self.max_bytes = max_bytes
+        self.received = 0
+        self.exceeded = False
+
+    def handle_raw_input(self, input_data, META, content_length, boundary, encoding=None):
+        # A body too large even after the multipart overhead is refused at
+        # its first file chunk
+        if body_too_large(content_length, self.max_bytes):
+            self.exceeded = True
+
+    def receive_data_chunk(self, raw_data, start):
+        self.received += len(raw_data)
+        if self.exceeded or self.received > self.max_bytes:
+            self.exceeded = True
+            raise StopUpload(connection_reset=True)
+        return raw_data
+
+    def file_complete(self, file_size):
+        return None
+
+
+def audio_duration(uploaded_file):
+    """
+    Duration in seconds read from the file header, or None if unknown
+
+    WAV is read with the standard library. Compressed formats (webm, ogg, mp3)
+    would need a decoder, so for those only the byte limit applies.
+    """
+    name = (uploaded_file.name or "").lower()
+    content_type = (getattr(uploaded_file, "content_type", "") or "").lower()
+    if not (name.endswith(".wav") or "wav" in content_type):
+        return None
+    try:
+        uploaded_file.seek(0)
+        with wave.open(uploaded_file, "rb") as audio:
+            return audio.getnframes() / float(audio.getframerate())
+    except (wave.Error, EOFError, ZeroDivisionError):
+        return None
+    finally:
+        uploaded_file.seek(0)
+
+
+def check_audio_limits(uploaded_file):
+    """Raise AudioTooLarge if the upload breaks the size or duration cap"""
+    if uploaded_file.size > settings.SPEECH_MAX_BYTES:
+        raise AudioTooLarge(f"Audio file is larger than {settings.SPEECH_MAX_BYTES // (1024 * 1024)} MB.")
+    duration = audio_duration(uploaded_file)
+    if duration is not None and duration > settings.SPEECH_MAX_SECONDS:
+        raise AudioTooLarge(f"Audio is longer than {settings.SPEECH_MAX_SECONDS} seconds.")
+
+
+class TranscriptionBackend:
+    """
+    Turns an uploaded audio file into text
+
+    deadline is the request's llm_client.Deadline, for backends that call
+    OpenAI.
+    """
+
+    def transcribe(self, audio_file, filename, content_type, deadline=None):
+        raise NotImplementedError
+
+    async def atranscribe(self, audio_file, filename, content_type, deadline=None):
+        """transcribe() for async views; runs it in a thread unless overridden"""
+        return await sync_to_async(self.transcribe, thread_sensitive=False)(
+            audio_file, filename, content_type, deadline=deadline,
+        )
+
+
+class OpenAITranscriptionBackend(TranscriptionBackend):
+    """Whisper via the shared OpenAI client (see llm_client)"""
+
+    def __init__(self, model="whisper-1"):
+        self.model = model
+
+    def transcribe(self, audio_file, filename, content_type, deadline=None):
+        from . import llm_client
+
+        def send(client, **kwargs):
+            # Rewind on every attempt; a retry must resend the whole file
+            audio_file.seek(0)
+            return client.audio.transcriptions.create(**kwargs)
+
+        # The SDK reads the file object while sending, so large uploads that
+        # Django spooled to disk are streamed rather than copied into memory
+        response = llm_client.call(
+            send, deadline=deadline, model=self.model, file=(filename, audio_file, content_type),
+        )
+        return response.text
+
+    async def atranscribe(self, audio_file, filename, content_type, deadline=None):
+        from . import llm_client
+
+        def send(client, **kwargs):
+            audio_file.seek(0)
+            return client.audio.transcriptions.create(**kwargs)
+
+        response = await llm_client.acall(
+            send, deadline=deadline, model=self.model, file=(filename, audio_file, content_type),
+        )
+        return response.text
+
+
+class StubTranscriptionBackend(TranscriptionBackend):
+    """Offline backend for tests and load tests; never touches the network"""
+
+    def __init__(self, transcript="I enjoy building reliable web applications with my team."):
+        self.transcript = transcript
+
+    def transcribe(self, audio_file, filename, content_type, deadline=None):
+        # Read through the file in chunks like a real backend would
+        for _ in audio_file.chunks():
+            pass
+        return self.transcript
+
+
+_backend = None
+
+
+def get_transcription_backend():
+    """Return the backend configured in settings.SPEECH_TRANSCRIPTION_BACKEND"""
+    global _backend
+    if _backend is None:
+        config = settings.SPEECH_TRANSCRIPTION_BACKEND
+        backend = import_string(config["BACKEND"])
+        _backend = backend(**config.get("OPTIONS", {}))
+    return _backend
+
+
+def reset_transcription_backend():
+    global _backend
+    _backend = None
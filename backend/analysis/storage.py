@@ -0,0 +1,183 @@
+"""
+Content-addressed storage for uploaded resume files
+
+Files are written in chunks while being hashed, stored under their SHA-256
+and deduplicated: uploading the same bytes twice keeps a single copy. The
+backend is chosen by settings.RESUME_BLOB_STORE, so an S3-compatible store
+can be dropped in by implementing the BlobStore interface.
+
+Because blobs are shared, one is only removed once no Resume references it
+and it has not been saved for BLOB_GC_GRACE seconds. An upload stores its blob
+before its row is committed, so the grace period keeps a concurrent delete of
+the same content from removing it in between.
+"""
+import hashlib
+import os
+import tempfile
+import time
+import logging
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+
+class BlobStore:
+    """Interface for blob backends; keys are SHA-256 hex digests of the content"""
+
+    def save(self, chunks):
+        """Store an iterable of byte chunks and return (key, size)"""
+        raise NotImplementedError
+
+    def open(self, key):
+        """Return a readable binary file object for key"""
+        raise NotImplementedError
+
+    def exists(self, key):
+        raise NotImplementedError
+
+    def delete(self, key):
+        raise NotImplementedError
+
+    def local_path(self, key):
+        """Filesystem path for key if the backend has one, else None"""
+        return None
+
+    def keys(self):
+        """Iterate over every stored key"""
+        raise NotImplementedError
+
+    def modified(self, key):
+        """Unix time key was last saved, or None if it is missing"""
+        raise NotImplementedError
+
+    def read(self, key):
+        with self.open(key) as f:
+            return f.read()
+
+
+class LocalBlobStore(BlobStore):
+    """Blobs stored on the local filesystem as <root>/ab/cd/abcd..."""
+
+    def __init__(self, root):
+        self.root = str(root)
+
+    def _path(self, key):
+        return os.path.join(self.root, key[:2], key[2:4], key)
+
+    def save(self, chunks):
+        tmp_dir = os.path.join(self.root, "tmp")
+        os.makedirs(tmp_dir, exist_ok=True)
+
+        hasher = hashlib.sha256()
+        size = 0
+        fd, tmp_path = tempfile.mkstemp(dir=tmp_dir)
+        try:
+            with os.fdopen(fd, "wb") as tmp:
+                for chunk in chunks:
+                    hasher.update(chunk)
+                    tmp.write(chunk)
+                    size += len(chunk)
+
+            key = hasher.hexdigest()
+            dest = self._path(key)
+            if os.path.exists(dest):
+                # Same content already stored; keep the existing copy but mark
+                # it as freshly saved so garbage collection leaves it alone
+                os.unlink(tmp_path)
+                os.utime(dest)
+            else:
+                os.makedirs(os.path.dirname(dest), exist_ok=True)
+                os.replace(tmp_path, dest)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            raise
+
+        return key, size
+
+    def open(self, key):
+        return open(self._path(key), "rb")
+
+    def exists(self, key):
+        return os.path.exists(self._path(key))
+
+    def delete(self, key):
+        try:
+            os.unlink(self._path(key))
+        except FileNotFoundError:
+            pass
+
+    def local_path(self, key):
+        return self._path(key)
+
+    def keys(self):
+        for dirpath, dirnames, filenames in os.walk(self.root):
+            if dirpath == self.root:
+                dirnames[:] = [name for name in dirnames if name != "tmp"]
+            yield from filenames
+
+    def modified(self, key):
+        try:
+            return os.path.getmtime(self._path(key))
+        except FileNotFoundError:
+            return None
+
+
+_store = None
+
+
+def get_blob_store():
+    """Return the blob store configured in settings.RESUME_BLOB_STORE"""
+    global _store
+    if _store is None:
+        config = settings.RESUME_BLOB_STORE
+        backend = import_string(config["BACKEND"])
+        _store = backend(**config.get("OPTIONS", {}))
+    return _store
+
+
+def _collectable(store, key, referenced, now):
+    if key in referenced:
+        return False
+    modified = store.modified(key)
+    grace = getattr(settings, "BLOB_GC_GRACE", 3600)
+    return modified is not None and now - modified >= grace
+
+
+def release_blob(key):
+    """
+    Delete key if no Resume points at it any more; returns True if deleted
+
+    Called after a resume is deleted. A blob saved within the grace period is
+    kept (a concurrent upload may be about to reference it) and left to
+    collect_garbage().
+    """
+    from .models import Resume
+
+    store = get_blob_store()
+    referenced = set(Resume.objects.filter(file_sha256=key).values_list("file_sha256", flat=True))
+    if not _collectable(store, key, referenced, time.time()):
+        return False
+    store.delete(key)
+    return True
+
+
+def collect_garbage():
+    """Delete every unreferenced blob older than the grace period and return their keys"""
+    from .models import Resume
+
+    store = get_blob_store()
+    now = time.time()
+    referenced = set(
+        Resume.objects.exclude(file_sha256__isnull=True).values_list("file_sha256", flat=True).distinct()
+    )
+    deleted = []
+    for key in list(store.keys()):
+        if _collectable(store, key, referenced, now):
+            store.delete(key)
+            deleted.append(key)
+    if deleted:
+        logger.info(f"Deleted {len(deleted)} unreferenced blob(s)")
+    return deleted
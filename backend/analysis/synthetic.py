@@ -0,0 +1,178 @@
+"""
+Synthetic resumes and job descriptions for benchmarks and load tests
+
+Documents are built from the skill taxonomy (display names and aliases, so
+both matcher engines have real work to do) padded with résumé-style prose to
+roughly WORDS_PER_PAGE words per page. Generation is seeded, so the same
+arguments always give the same text and runs stay comparable. make_pdf() and
+make_docx() wrap a text in an uploadable file for HTTP load tests.
+"""
+import io
+import random
+import textwrap
+
+from .nlp_module.artifact import taxonomy_path
+from .nlp_module.taxonomy import read_taxonomy
+
+# A dense single-spaced résumé page
+WORDS_PER_PAGE = 450
+
+COMPANIES = ["Acme Corp", "Globex", "Initech", "Umbrella Labs", "Hooli", "Stark Industries", "Wayne Enterprises"]
+ROLES = ["Software Engineer", "Backend Developer", "Data Analyst", "DevOps Engineer", "Frontend Developer",
+         "Machine Learning Engineer", "Project Coordinator"]
+VERBS = ["Built", "Designed", "Maintained", "Migrated", "Automated", "Optimized", "Led", "Delivered"]
+OBJECTS = ["an internal reporting service", "the customer onboarding flow", "a billing pipeline",
+           "the public REST API", "a recommendation engine", "nightly data imports", "the deployment process"]
+OUTCOMES = ["cutting response times by 40%", "for 2 million monthly users", "reducing support tickets",
+            "with zero downtime", "ahead of schedule", "across three regions", "saving 10 hours a week"]
+FILLER = ("worked closely with product and design teams to ship features on a weekly cadence while "
+          "keeping the codebase tested documented and easy for new engineers to pick up").split()
+DEGREES = ["Bachelor of Technology in Computer Science", "Master of Science in Data Science",
+           "Bachelor of Engineering in Information Technology"]
+UNIVERSITIES = ["State University", "Institute of Technology", "City College"]
+
+
+_taxonomy = None
+
+
+def _spellings():
+    """Every spelling of every skill, grouped per skill id"""
+    global _taxonomy
+    if _taxonomy is None:
+        _taxonomy = read_taxonomy(taxonomy_path())
+    spellings = {}
+    for phrase, skill_id in _taxonomy.phrases.items():
+        spellings.setdefault(skill_id, []).append(phrase)
+    for skill_id, name in _taxonomy.names.items():
+        spellings[skill_id].append(name)
+    return spellings
+
+
+def _skill_phrases(rng, count):
+    spellings = _spellings()
+    skill_ids = rng.sample(sorted(spellings), min(count, len(spellings)))
+    return [rng.choice(spellings[skill_id]) for skill_id in skill_ids]
+
+
+def _bullet(rng, skills):
+    return (f"- {rng.choice(VERBS)} {rng.choice(OBJECTS)} using {', '.join(rng.sample(skills, min(3, len(skills))))} "
+            f"{rng.choice(OUTCOMES)}; {' '.join(rng.sample(FILLER, 12))}.")
+
+
+def _pad(lines, rng, skills, pages):
+    """Append experience bullets until the document reaches its page budget"""
+    target = pages * WORDS_PER_PAGE
+    words = sum(len(line.split()) for line in lines)
+    while words < target:
+        if rng.random() < 0.15:
+            line = f"\n{rng.choice(ROLES)} - {rng.choice(COMPANIES)} ({rng.randint(2012, 2024)} - present)"
+        else:
+            line = _bullet(rng, skills)
+        lines.append(line)
+        words += len(line.split())
+    return "\n".join(lines)
+
+
+def make_resume(pages=1, seed=0):
+    """A resume of about `pages` pages mentioning 15–60 skills"""
+    rng = random.Random(f"resume-{pages}-{seed}")
+    skills = _skill_phrases(rng, min(60, 15 + 5 * pages))
+    lines = [
+        f"Candidate {seed}",
+        f"{rng.choice(ROLES)} with {rng.randint(1, 15)}+ years of experience.",
+        "",
+        "SKILLS",
+        ", ".join(skills),
+        "",
+        "EDUCATION",
+        f"{rng.choice(DEGREES)}, {rng.choice(UNIVERSITIES)} ({rng.randint(2005, 2022)})",
+        "",
+        "EXPERIENCE",
+    ]
+    return _pad(lines, rng, skills, pages)
+
+
+def make_job_description(pages=1, seed=0):
+    """A job description of about `pages` pages asking for 8–40 skills"""
+    rng = random.Random(f"job-{pages}-{seed}")
+    skills = _skill_phrases(rng, min(40, 8 + 4 * pages))
+    role = rng.choice(ROLES)
+    lines = [
+        f"{role} at {rng.choice(COMPANIES)}",
+        "",
+        f"We are looking for a {role.lower()} with {rng.randint(1, 8)}+ years of experience.",
+        "",
+        "REQUIREMENTS",
+        *[f"- Hands-on experience with {skill}" for skill in skills],
+        "",
+        "RESPONSIBILITIES",
+    ]
+    return _pad(lines, rng, skills, pages)
+
+
+def make_corpus(sizes=(1, 5, 10, 20), count=5, seed=0):
+    """{pages: [(resume_text, job_text), ...]} with `count` pairs per size"""
+    return {
+        pages: [(make_resume(pages, seed + i), make_job_description(pages, seed + i)) for i in range(count)]
+        for pages in sizes
+    }
+
+
+# Letter-sized page, 10pt Helvetica
+PDF_LINES_PER_PAGE = 56
+PDF_LINE_WIDTH = 95
+
+
+def _pdf_escape(line):
+    line = line.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+    return line.encode("latin-1", "replace")
+
+
+def make_pdf(text):
+    """A minimal text PDF of text, readable by pdfplumber like a real export"""
+    lines = []
+    for paragraph in text.splitlines():
+        lines.extend(textwrap.wrap(paragraph, PDF_LINE_WIDTH) or [""])
+    pages = [lines[i:i + PDF_LINES_PER_PAGE] for i in range(0, len(lines), PDF_LINES_PER_PAGE)] or [[]]
+
+    # 1: catalog, 2: page tree, 3: font, then a page and its content per page
+    objects = [b"<< /Type /Catalog /Pages 2 0 R >>", None, b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"]
+    page_refs = []
+    for page in pages:
+        shown = b"".join(b"(" + _pdf_escape(line) + b") Tj T* " for line in page)
+        stream = b"BT /F1 10 Tf 12 TL 50 760 Td " + shown + b"ET"
+        objects.append(b"<< /Length %d >>\nstream\n%s\nendstream" % (len(stream), stream))
+        content_ref = len(objects)
+        objects.append(
+            b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+            b"/Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>" % content_ref
+        )
+        page_refs.append(len(objects))
+    objects[1] = b"<< /Type /Pages /Kids [%s] /Count %d >>" % (
+        b" ".join(b"%d 0 R" % ref for ref in page_refs), len(page_refs)
+    )
+
+    out = io.BytesIO()
+    out.write(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(out.tell())
+        out.write(b"%d 0 obj\n%s\nendobj\n" % (number, body))
+    xref = out.tell()
+    out.write(b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1))
+    for offset in offsets:
+        out.write(b"%010d 00000 n \n" % offset)
+    out.write(b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%EOF\n" % (len(objects) + 1, xref))
+    return out.getvalue()
+
+
+def make_docx(text):
+    """A .docx with one paragraph per line of text"""
+    from docx import Document
+
+    document = Document()
+    for line in text.splitlines():
+        document.add_paragraph(line)
+    out = io.BytesIO()
+    document.save(out)
+    return out.getvalue()
@@ -0,0 +1,105 @@
+"""
+Database-backed background tasks
+
+Uploads enqueue a ProcessingTask row; `python manage.py process_tasks` claims
+queued rows one at a time and runs them. Claiming uses SELECT ... FOR UPDATE
+SKIP LOCKED where the database supports it, so several workers can share the
+table. Tasks left 'running' by a crashed worker are picked up again once their
+lock is older than TASK_LOCK_TIMEOUT seconds.
+"""
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import ProcessingTask, Resume
+from .text_extraction import extract_text
+from .nlp_module.skill_extractor import extract_skill_ids, TAXONOMY_VERSION
+
+logger = logging.getLogger(__name__)
+
+
+def process_resume(resume):
+    """
+    Extract text and skills for a stored resume and advance processing_status
+
+    Errors propagate with the row left 'processing'; run_task decides whether
+    it goes back to 'pending' for a retry or ends 'failed'.
+    """
+    Resume.objects.filter(pk=resume.pk).update(processing_status='processing')
+
+    text = extract_text(resume.file_source(), resume.file_name or "")
+    skills = extract_skill_ids(text)
+
+    resume.parsed_text = text
+    resume.skills = skills
+    resume.skills_version = TAXONOMY_VERSION
+    resume.is_processed = True
+    resume.processing_status = 'completed' if text else 'failed'
+    resume.save(update_fields=[
+        'parsed_text', 'skills', 'skills_version', 'is_processed', 'processing_status', 'updated_at'
+    ])
+    return resume
+
+
+def enqueue_resume_processing(resume):
+    """Queue text/skill extraction for an uploaded resume"""
+    return ProcessingTask.objects.create(task_type='resume_extraction', resume=resume)
+
+
+def claim_next_task():
+    """Lock and return the next runnable task, or None if the queue is empty"""
+    now = timezone.now()
+    stale = now - timedelta(seconds=getattr(settings, 'TASK_LOCK_TIMEOUT', 600))
+
+    with transaction.atomic():
+        task = (
+            ProcessingTask.objects
+            .select_for_update(skip_locked=True)
+            .filter(
+                Q(status='queued', run_after__lte=now) |
+                Q(status='running', locked_at__lt=stale)
+            )
+            .order_by('run_after', 'created_at')
+            .first()
+        )
+        if task is None:
+            return None
+        task.status = 'running'
+        task.attempts += 1
+        task.locked_at = now
+        task.save(update_fields=['status', 'attempts', 'locked_at', 'updated_at'])
+    return task
+
+
+def run_task(task):
+    """Run a claimed task, recording success, a retry or the final failure"""
+    try:
+        if task.task_type == 'resume_extraction':
+            process_resume(task.resume)
+        else:
+            raise ValueError(f"Unknown task type: {task.task_type}")
+    except Exception as e:
+        logger.error(f"Task {task.pk} ({task.task_type}) failed: {e}", exc_info=True)
+        task.last_error = str(e)
+        if task.attempts < task.max_attempts:
+            # Back off 30s, 60s, 120s, ... before the next attempt
+            task.status = 'queued'
+            task.run_after = timezone.now() + timedelta(seconds=30 * 2 ** (task.attempts - 1))
+        else:
+            task.status = 'failed'
+        task.locked_at = None
+        task.save(update_fields=['status', 'last_error', 'run_after', 'locked_at', 'updated_at'])
+        if task.resume_id:
+            # Clients polling the resume only see 'failed' once no retry is left
+            resume_status = 'pending' if task.status == 'queued' else 'failed'
+            Resume.objects.filter(pk=task.resume_id).update(processing_status=resume_status)
+        return False
+
+    task.status = 'done'
+    task.locked_at = None
+    task.save(update_fields=['status', 'locked_at', 'updated_at'])
+    return True
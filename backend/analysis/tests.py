@@ -1,3 +1,1823 @@
-from django.test import TestCase
+import os
+from unittest import mock
 
-# Create your tests here.
+from django.test import TestCase, TransactionTestCase
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from .models import Resume, JobDescription, AnalysisResult
+
+
+def use_temp_blob_store(test):
+    """Point RESUME_BLOB_STORE at a temporary directory for one test"""
+    import shutil
+    import tempfile
+    from . import storage
+
+    root = tempfile.mkdtemp(prefix='blobstore-test-')
+    override = test.settings(RESUME_BLOB_STORE={
+        'BACKEND': 'analysis.storage.LocalBlobStore', 'OPTIONS': {'root': root},
+    })
+    override.enable()
+    storage._store = None
+    test.addCleanup(shutil.rmtree, root, ignore_errors=True)
+    test.addCleanup(setattr, storage, '_store', None)
+    test.addCleanup(override.disable)
+    return root
+
+
+class QueryProjectionTests(TestCase):
+    """Listing, dashboard and analysis endpoints must not select large columns"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='projection', password='test12345')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.resume = Resume.objects.create(
+            user=self.user,
+            file=b'%PDF-1.4 blob',
+            file_name='cv.pdf',
+            parsed_text='Python developer with Django and Docker experience',
+            processing_status='completed',
+        )
+        self.job = JobDescription.objects.create(
+            user=self.user,
+            title='Backend Engineer',
+            description='Python, Django, Kubernetes',
+        )
+        AnalysisResult.objects.create(
+            user=self.user, resume=self.resume, job=self.job,
+            analysis_type='gap_analysis', result_data={'match_percent': 50.0},
+        )
+
+    def selected_columns(self, queries, table):
+        """Column lists of every SELECT that reads from table"""
+        quoted = connection.ops.quote_name(table)
+        columns = []
+        for query in queries:
+            sql = query['sql']
+            if not sql.startswith('SELECT') or f'FROM {quoted}' not in sql and f'JOIN {quoted}' not in sql:
+                continue
+            select_list = sql[len('SELECT'):sql.index(' FROM ')]
+            columns.append({
+                column.strip().split('.')[-1].strip('"`')
+                for column in select_list.split(',')
+                if column.strip().startswith(quoted)
+            })
+        return columns
+
+    def assertColumnsExcluded(self, url, method, table, excluded, data=None):
+        with CaptureQueriesContext(connection) as ctx:
+            response = getattr(self.client, method)(url, data, format='json')
+        self.assertLess(response.status_code, 400, response.data)
+        selects = self.selected_columns(ctx.captured_queries, table)
+        self.assertTrue(selects, f"{url} did not read {table}")
+        for columns in selects:
+            self.assertFalse(columns & set(excluded), f"{url} selected {columns & set(excluded)} from {table}")
+
+    def test_resume_list_skips_blob_and_text(self):
+        self.assertColumnsExcluded('/api/resumes/', 'get', 'analysis_resume', ['file', 'parsed_text'])
+
+    def test_resume_detail_skips_blob(self):
+        self.assertColumnsExcluded(f'/api/resumes/{self.resume.id}/', 'get', 'analysis_resume', ['file'])
+
+    def test_resume_status_skips_blob_and_text(self):
+        self.assertColumnsExcluded(f'/api/resumes/{self.resume.id}/status/', 'get', 'analysis_resume', ['file', 'parsed_text'])
+
+    def test_dashboard_skips_large_columns(self):
+        self.assertColumnsExcluded('/api/dashboard/stats/', 'get', 'analysis_resume', ['file', 'parsed_text'])
+        self.assertColumnsExcluded('/api/dashboard/stats/', 'get', 'analysis_jobdescription', ['description', 'requirements'])
+
+    def test_analyze_skips_blob(self):
+        self.assertColumnsExcluded(
+            '/api/analyze/', 'post', 'analysis_resume', ['file'],
+            data={'resume_id': self.resume.id, 'job_id': self.job.id},
+        )
+
+
+class DashboardStatsTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='dashboard', password='test12345')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.resume = Resume.objects.create(user=self.user, file_name='cv.pdf', parsed_text='python')
+        self.job = JobDescription.objects.create(user=self.user, title='Engineer', description='python')
+
+    def add_analyses(self, scores, duration_ms=1500):
+        AnalysisResult.objects.bulk_create([
+            AnalysisResult(
+                user=self.user, resume=self.resume, job=self.job, analysis_type='gap_analysis',
+                result_data={'match_percent': score}, match_percent=score, duration_ms=duration_ms,
+            )
+            for score in scores
+        ])
+
+    def test_averages_are_computed_in_sql(self):
+        self.add_analyses([40.0, 60.0, 0.0])
+        AnalysisResult.objects.create(user=self.user, analysis_type='gap_analysis')
+        response = self.client.get('/api/dashboard/stats/')
+        self.assertEqual(response.data['total_analyses'], 4)
+        self.assertEqual(response.data['total_resumes'], 1)
+        self.assertEqual(response.data['match_accuracy'], 33.3)
+        self.assertEqual(response.data['avg_analysis_time'], 1.5)
+
+    def test_analyze_records_score_and_duration(self):
+        self.client.post('/api/analyze/', {'resume_id': self.resume.id, 'job_id': self.job.id}, format='json')
+        analysis = AnalysisResult.objects.get()
+        self.assertEqual(analysis.match_percent, analysis.result_data['match_percent'])
+        self.assertIsNotNone(analysis.duration_ms)
+
+    def test_query_count_does_not_grow_with_history(self):
+        self.add_analyses([50.0])
+        with CaptureQueriesContext(connection) as small:
+            self.client.get('/api/dashboard/stats/')
+        self.add_analyses([70.0] * 50)
+        with CaptureQueriesContext(connection) as large:
+            self.client.get('/api/dashboard/stats/')
+        self.assertEqual(len(small), len(large))
+        self.assertLessEqual(len(large), 4)
+
+
+class StoredSkillsTests(TestCase):
+    """Skills are extracted at upload/create time and analysis compares the stored lists"""
+
+    def setUp(self):
+        from .result_cache import get_result_cache
+
+        self.user = User.objects.create_user(username='stored', password='test12345')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        get_result_cache('analysis').clear()
+        self.addCleanup(get_result_cache('analysis').clear)
+
+    def updates(self, queries, table):
+        quoted = connection.ops.quote_name(table)
+        return [query['sql'] for query in queries if query['sql'].startswith(f'UPDATE {quoted}')]
+
+    def test_skills_are_stored_when_a_job_is_created(self):
+        from .nlp_module.skill_extractor import TAXONOMY_VERSION
+
+        response = self.client.post('/api/jobs/', {
+            'title': 'Backend Engineer', 'description': 'Python, Docker and k8s',
+        }, format='json')
+        self.assertEqual(response.status_code, 201, response.data)
+        job = JobDescription.objects.get(pk=response.data['id'])
+        self.assertEqual(job.skills, ['docker', 'kubernetes', 'python'])
+        self.assertEqual(job.skills_version, TAXONOMY_VERSION)
+
+    def test_skills_are_stored_when_a_resume_is_uploaded(self):
+        from django.core.files.uploadedfile import SimpleUploadedFile
+        from .nlp_module.skill_extractor import TAXONOMY_VERSION
+        from .synthetic import make_pdf
+
+        use_temp_blob_store(self)
+        upload = SimpleUploadedFile('cv.pdf', make_pdf("Python developer with Django and PostgreSQL"))
+        with self.settings(RESUME_ASYNC_PROCESSING=False):
+            response = self.client.post('/api/resumes/', {'file': upload}, format='multipart')
+        self.assertEqual(response.status_code, 201, response.data)
+        resume = Resume.objects.get(pk=response.data['id'])
+        self.assertEqual(resume.skills, ['django', 'postgresql', 'python'])
+        self.assertEqual(resume.skills_version, TAXONOMY_VERSION)
+
+    def test_analysis_compares_stored_skills_without_extracting(self):
+        from .nlp_module import job_resume_analyzer, skill_extractor
+
+        version = skill_extractor.TAXONOMY_VERSION
+        # The stored lists deliberately disagree with the texts
+        resume = Resume.objects.create(
+            user=self.user, file_name='cv.pdf', parsed_text='nothing relevant', processing_status='completed',
+            skills=['python'], skills_version=version,
+        )
+        job = JobDescription.objects.create(
+            user=self.user, title='Engineer', description='nothing relevant either',
+            skills=['docker', 'python'], skills_version=version,
+        )
+        with mock.patch.object(skill_extractor, 'extract_skill_ids') as extract, \
+                mock.patch.object(job_resume_analyzer, 'extract_skill_ids') as extract_in_analyzer, \
+                CaptureQueriesContext(connection) as ctx:
+            response = self.client.post('/api/analyze/', {'resume_id': resume.id, 'job_id': job.id}, format='json')
+        self.assertEqual(response.status_code, 200, response.data)
+        extract.assert_not_called()
+        extract_in_analyzer.assert_not_called()
+        self.assertEqual(response.data['missing_skills'], ['Docker'])
+        self.assertEqual(response.data['match_percent'], 50.0)
+        self.assertFalse(self.updates(ctx.captured_queries, 'analysis_resume'))
+        self.assertFalse(self.updates(ctx.captured_queries, 'analysis_jobdescription'))
+
+    def test_stale_skills_are_reextracted_once_and_saved(self):
+        from .nlp_module.skill_extractor import TAXONOMY_VERSION
+
+        resume = Resume.objects.create(
+            user=self.user, file_name='cv.pdf', parsed_text='Python and Django', processing_status='completed',
+            skills=['cobol'], skills_version='old',
+        )
+        job = JobDescription.objects.create(
+            user=self.user, title='Engineer', description='Python and Docker',
+            skills=['cobol'], skills_version='old',
+        )
+        payload = {'resume_id': resume.id, 'job_id': job.id}
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.post('/api/analyze/', payload, format='json')
+        self.assertEqual(response.data['missing_skills'], ['Docker'])
+        self.assertEqual(len(self.updates(ctx.captured_queries, 'analysis_resume')), 1)
+        self.assertEqual(len(self.updates(ctx.captured_queries, 'analysis_jobdescription')), 1)
+        resume.refresh_from_db()
+        job.refresh_from_db()
+        self.assertEqual((resume.skills, resume.skills_version), (['django', 'python'], TAXONOMY_VERSION))
+        self.assertEqual((job.skills, job.skills_version), (['docker', 'python'], TAXONOMY_VERSION))
+
+        with CaptureQueriesContext(connection) as ctx:
+            self.client.post('/api/analyze/', payload, format='json')
+        self.assertFalse(self.updates(ctx.captured_queries, 'analysis_resume'))
+        self.assertFalse(self.updates(ctx.captured_queries, 'analysis_jobdescription'))
+
+
+class ResultCacheTests(TestCase):
+    """analyze_gap results cache: hits, misses, invalidation and failures"""
+
+    resume_text = 'Python developer with Django and PostgreSQL'
+    job_text = 'Looking for Python, Docker and PostgreSQL'
+
+    def setUp(self):
+        from .result_cache import get_result_cache
+
+        get_result_cache('analysis').clear()
+        self.addCleanup(get_result_cache('analysis').clear)
+
+    def analyze(self):
+        from .nlp_module import job_resume_analyzer
+
+        with mock.patch.object(job_resume_analyzer, '_compute_gap',
+                               wraps=job_resume_analyzer._compute_gap) as compute:
+            result = job_resume_analyzer.analyze_gap(self.resume_text, self.job_text)
+        return result, compute.call_count
+
+    def test_repeat_is_a_hit(self):
+        from .result_cache import get_result_cache
+
+        cache = get_result_cache('analysis')
+        hits, misses = cache.hits, cache.misses
+        first, computed_first = self.analyze()
+        second, computed_second = self.analyze()
+        self.assertEqual((computed_first, computed_second), (1, 0))
+        self.assertEqual(first, second)
+        self.assertEqual((cache.hits - hits, cache.misses - misses), (1, 1))
+
+    def test_taxonomy_or_analyzer_version_change_misses(self):
+        from .nlp_module import job_resume_analyzer
+
+        self.analyze()
+        with mock.patch.object(job_resume_analyzer, 'TAXONOMY_VERSION', 'edited-taxonomy'):
+            self.assertEqual(self.analyze()[1], 1)
+        with mock.patch.object(job_resume_analyzer, 'ANALYZER_VERSION', 'next'):
+            self.assertEqual(self.analyze()[1], 1)
+        self.assertEqual(self.analyze()[1], 0)
+
+    def test_backend_errors_fall_back_to_computing(self):
+        from .nlp_module import job_resume_analyzer
+        from .result_cache import ResultCache
+
+        broken = mock.Mock()
+        broken.get.side_effect = ConnectionError('cache down')
+        broken.set.side_effect = ConnectionError('cache down')
+        with mock.patch.object(job_resume_analyzer, 'get_result_cache',
+                               return_value=ResultCache('analysis', broken)):
+            result, computed = self.analyze()
+        self.assertEqual(computed, 1)
+        self.assertIn('Docker', result['missing_skills'])
+
+    def test_django_backend_clear_only_drops_its_own_entries(self):
+        from django.core.cache import caches
+        from .result_cache import DjangoCacheBackend, ResultCache
+
+        mine = ResultCache('mine', DjangoCacheBackend(alias='default', namespace='mine'))
+        other = ResultCache('other', DjangoCacheBackend(alias='default', namespace='other'))
+        caches['default'].set('unrelated', 'kept')
+        mine.set(('a',), 1)
+        other.set(('a',), 2)
+
+        mine.clear()
+        self.assertIsNone(mine.get(('a',)))
+        self.assertEqual(other.get(('a',)), 2)
+        self.assertEqual(caches['default'].get('unrelated'), 'kept')
+        mine.set(('a',), 3)
+        self.assertEqual(mine.get(('a',)), 3)
+
+
+class BlobStoreTests(TestCase):
+    """LocalBlobStore and the migration that moved inline uploads into it"""
+
+    def setUp(self):
+        self.root = use_temp_blob_store(self)
+
+    def test_chunked_save_is_content_addressed_and_deduplicated(self):
+        import hashlib
+        from .storage import get_blob_store
+
+        store = get_blob_store()
+        key, size = store.save([b'%PDF-1.4 ', b'resume ', b'bytes'])
+        self.assertEqual(key, hashlib.sha256(b'%PDF-1.4 resume bytes').hexdigest())
+        self.assertEqual(size, 21)
+        self.assertEqual(store.save([b'%PDF-1.4 resume bytes']), (key, size))
+
+        self.assertEqual(store.local_path(key), os.path.join(self.root, key[:2], key[2:4], key))
+        self.assertEqual(os.listdir(os.path.dirname(store.local_path(key))), [key])
+        self.assertEqual(os.listdir(os.path.join(self.root, 'tmp')), [])
+        self.assertEqual(store.read(key), b'%PDF-1.4 resume bytes')
+
+    def test_delete(self):
+        from .storage import get_blob_store
+
+        store = get_blob_store()
+        key, _ = store.save([b'to be removed'])
+        self.assertTrue(store.exists(key))
+        store.delete(key)
+        self.assertFalse(store.exists(key))
+        # Deleting a missing blob is not an error
+        store.delete(key)
+
+    def age(self, key, seconds):
+        import time
+        from .storage import get_blob_store
+
+        path = get_blob_store().local_path(key)
+        past = time.time() - seconds
+        os.utime(path, (past, past))
+
+    def test_garbage_collection_spares_referenced_and_recent_blobs(self):
+        from .storage import collect_garbage, get_blob_store
+
+        store = get_blob_store()
+        user = User.objects.create_user(username='gc', password='test12345')
+        kept, _ = store.save([b'still referenced'])
+        Resume.objects.create(user=user, file_name='cv.pdf', file_sha256=kept)
+        orphan, _ = store.save([b'orphaned'])
+        recent, _ = store.save([b'upload in flight'])
+        for key in (kept, orphan, recent):
+            self.age(key, 7200)
+        # Saving the same bytes again counts as a fresh save
+        store.save([b'upload in flight'])
+
+        with self.settings(BLOB_GC_GRACE=3600):
+            self.assertEqual(collect_garbage(), [orphan])
+        self.assertEqual(sorted(store.keys()), sorted([kept, recent]))
+
+    def test_deleting_a_resume_releases_its_blob_after_commit(self):
+        from .storage import get_blob_store
+
+        store = get_blob_store()
+        user = User.objects.create_user(username='owner', password='test12345')
+        client = APIClient()
+        client.force_authenticate(user)
+        shared, _ = store.save([b'shared bytes'])
+        self.age(shared, 7200)
+        first = Resume.objects.create(user=user, file_name='a.pdf', file_sha256=shared)
+        second = Resume.objects.create(user=user, file_name='b.pdf', file_sha256=shared)
+
+        with self.settings(BLOB_GC_GRACE=3600):
+            with self.captureOnCommitCallbacks(execute=True) as callbacks:
+                self.assertEqual(client.delete(f'/api/resumes/{first.pk}/').status_code, 204)
+            self.assertEqual(len(callbacks), 1)
+            self.assertTrue(store.exists(shared))
+
+            with self.captureOnCommitCallbacks(execute=False) as callbacks:
+                client.delete(f'/api/resumes/{second.pk}/')
+            # Nothing is removed before the delete commits
+            self.assertTrue(store.exists(shared))
+            callbacks[0]()
+            self.assertFalse(store.exists(shared))
+
+    def test_recently_saved_blob_survives_release(self):
+        from .storage import get_blob_store, release_blob
+
+        store = get_blob_store()
+        key, _ = store.save([b'concurrent upload'])
+        with self.settings(BLOB_GC_GRACE=3600):
+            self.assertFalse(release_blob(key))
+        self.assertTrue(store.exists(key))
+
+
+class BlobStoreMigrationTests(TransactionTestCase):
+    """0007 moves inline Resume.file bytes into the blob store"""
+
+    migrate_from = ('analysis', '0006_processingtask')
+    migrate_to = ('analysis', '0007_resume_blob_store')
+
+    def setUp(self):
+        from django.db.migrations.executor import MigrationExecutor
+
+        self.root = use_temp_blob_store(self)
+        self.executor = MigrationExecutor(connection)
+        self.executor.migrate([self.migrate_from])
+        self.addCleanup(self.migrate_to_latest)
+
+    def migrate_to_latest(self):
+        from django.db.migrations.executor import MigrationExecutor
+
+        executor = MigrationExecutor(connection)
+        executor.migrate(executor.loader.graph.leaf_nodes())
+
+    def test_forward_moves_inline_files(self):
+        import hashlib
+        from django.db.migrations.executor import MigrationExecutor
+        from .storage import get_blob_store
+
+        old_apps = self.executor.loader.project_state([self.migrate_from]).apps
+        OldUser = old_apps.get_model('auth', 'User')
+        OldResume = old_apps.get_model('analysis', 'Resume')
+        user = OldUser.objects.create(username='legacy')
+        inline = OldResume.objects.create(user=user, file=b'%PDF legacy upload', file_name='cv.pdf')
+        empty = OldResume.objects.create(user=user, file=b'', file_name='empty.pdf')
+        missing = OldResume.objects.create(user=user, file=None, file_name='none.pdf')
+
+        executor = MigrationExecutor(connection)
+        executor.migrate([self.migrate_to])
+        Resume = executor.loader.project_state([self.migrate_to]).apps.get_model('analysis', 'Resume')
+
+        moved = Resume.objects.get(pk=inline.pk)
+        key = hashlib.sha256(b'%PDF legacy upload').hexdigest()
+        self.assertEqual((moved.file_sha256, moved.file_size, moved.file), (key, 18, None))
+        self.assertEqual(get_blob_store().read(key), b'%PDF legacy upload')
+
+        for resume in (empty, missing):
+            untouched = Resume.objects.get(pk=resume.pk)
+            self.assertIsNone(untouched.file_sha256)
+            self.assertEqual(bytes(untouched.file or b''), b'')
+
+
+class TaskQueueTests(TestCase):
+    """The ProcessingTask queue, its worker command and async uploads"""
+
+    def setUp(self):
+        self.blob_root = use_temp_blob_store(self)
+        self.user = User.objects.create_user(username='queued', password='test12345')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def make_task(self, **fields):
+        from .models import ProcessingTask
+
+        resume = Resume.objects.create(user=self.user, file=b'', file_name='cv.pdf')
+        return ProcessingTask.objects.create(task_type='resume_extraction', resume=resume, **fields)
+
+    def test_claim_order_and_skip_locked(self):
+        from datetime import timedelta
+        from django.utils import timezone
+        from .models import ProcessingTask
+        from .tasks import claim_next_task
+
+        now = timezone.now()
+        later = self.make_task(run_after=now - timedelta(seconds=10))
+        first = self.make_task(run_after=now - timedelta(seconds=60))
+        self.make_task(run_after=now + timedelta(seconds=60))
+        self.make_task(status='done')
+
+        with mock.patch.object(ProcessingTask.objects, 'select_for_update',
+                               wraps=ProcessingTask.objects.select_for_update) as select_for_update:
+            claimed = [claim_next_task(), claim_next_task(), claim_next_task()]
+        select_for_update.assert_called_with(skip_locked=True)
+        self.assertEqual(claimed, [first, later, None])
+        first.refresh_from_db()
+        self.assertEqual((first.status, first.attempts), ('running', 1))
+        self.assertIsNotNone(first.locked_at)
+
+    def test_stale_running_task_is_reclaimed(self):
+        from datetime import timedelta
+        from django.utils import timezone
+        from .tasks import claim_next_task
+
+        now = timezone.now()
+        self.make_task(status='running', attempts=1, locked_at=now - timedelta(seconds=60))
+        stale = self.make_task(status='running', attempts=1, locked_at=now - timedelta(seconds=700))
+        with self.settings(TASK_LOCK_TIMEOUT=600):
+            claimed = claim_next_task()
+            self.assertIsNone(claim_next_task())
+        self.assertEqual(claimed, stale)
+        self.assertEqual(claimed.attempts, 2)
+        self.assertGreater(claimed.locked_at, now - timedelta(seconds=1))
+
+    def test_failures_back_off_then_fail(self):
+        from django.utils import timezone
+        from .tasks import claim_next_task, run_task
+
+        task = self.make_task(max_attempts=3)
+        delays = []
+        with mock.patch('analysis.tasks.extract_text', side_effect=RuntimeError('corrupt pdf')):
+            for _ in range(3):
+                claimed = claim_next_task()
+                self.assertEqual(claimed, task)
+                before = timezone.now()
+                self.assertFalse(run_task(claimed))
+                claimed.refresh_from_db()
+                self.assertIsNone(claimed.locked_at)
+                self.assertEqual(claimed.last_error, 'corrupt pdf')
+                resume_status = Resume.objects.get(pk=task.resume_id).processing_status
+                self.assertEqual(resume_status, 'pending' if claimed.status == 'queued' else 'failed')
+                if claimed.status == 'queued':
+                    delays.append(round((claimed.run_after - before).total_seconds()))
+                    # Not runnable until its backoff has passed
+                    self.assertIsNone(claim_next_task())
+                    type(claimed).objects.filter(pk=claimed.pk).update(run_after=before)
+
+        self.assertEqual(delays, [30, 60])
+        self.assertEqual((claimed.status, claimed.attempts), ('failed', 3))
+        self.assertIsNone(claim_next_task())
+        self.assertEqual(Resume.objects.get(pk=task.resume_id).processing_status, 'failed')
+
+    def test_async_upload_is_processed_by_the_worker(self):
+        import io
+        from django.core.files.uploadedfile import SimpleUploadedFile
+        from django.core.management import call_command
+        from . import tasks
+        from .models import ProcessingTask
+        from .synthetic import make_pdf, make_resume
+
+        upload = SimpleUploadedFile('cv.pdf', make_pdf(make_resume(pages=1, seed=5)))
+        with self.settings(RESUME_ASYNC_PROCESSING=True):
+            response = self.client.post('/api/resumes/', {'file': upload}, format='multipart')
+        self.assertEqual(response.status_code, 201, response.data)
+        resume_id = response.data['id']
+        status_url = f'/api/resumes/{resume_id}/status/'
+        self.assertEqual(self.client.get(status_url).data['processing_status'], 'pending')
+        task = ProcessingTask.objects.get(resume_id=resume_id)
+        self.assertEqual(task.status, 'queued')
+
+        # The row reads 'processing' while extraction runs
+        seen = []
+        real_extract_text = tasks.extract_text
+
+        def extract_text(source, file_name):
+            seen.append(Resume.objects.get(pk=resume_id).processing_status)
+            return real_extract_text(source, file_name)
+
+        out = io.StringIO()
+        with mock.patch('analysis.tasks.extract_text', side_effect=extract_text):
+            call_command('process_tasks', '--once', stdout=out)
+        self.assertEqual(seen, ['processing'])
+        self.assertIn('Processed 1 task(s)', out.getvalue())
+
+        task.refresh_from_db()
+        self.assertEqual((task.status, task.attempts), ('done', 1))
+        status = self.client.get(status_url).data
+        self.assertEqual(status['processing_status'], 'completed')
+        self.assertTrue(status['is_processed'])
+        self.assertTrue(status['skills'])
+
+
+class PdfExtractionTests(TestCase):
+    """Page cap, the in-process/pool split and the pool timeout backstop"""
+
+    def setUp(self):
+        from . import text_extraction
+
+        self.addCleanup(text_extraction._reset_pool, terminate=True)
+
+    def make_pdf(self, pages):
+        from .synthetic import PDF_LINES_PER_PAGE, make_pdf
+
+        # One marker line per page, padded so each marker starts a new page
+        lines = []
+        for page in range(pages):
+            lines += [f'marker{page}'] + ['filler'] * (PDF_LINES_PER_PAGE - 1)
+        return make_pdf('\n'.join(lines))
+
+    def markers(self, text):
+        return [word for word in text.split() if word.startswith('marker')]
+
+    def test_page_cap(self):
+        from .text_extraction import extract_pdf_text
+
+        with self.settings(PDF_MAX_PAGES=3, PDF_EXTRACTION_WORKERS=1):
+            text = extract_pdf_text(self.make_pdf(5), 'cv.pdf')
+        self.assertEqual(self.markers(text), ['marker0', 'marker1', 'marker2'])
+
+    def test_small_documents_stay_in_process(self):
+        from . import text_extraction
+
+        with self.settings(PDF_PARALLEL_MIN_PAGES=4, PDF_EXTRACTION_WORKERS=2, PDF_MAX_PAGES=40), \
+                mock.patch.object(text_extraction, '_extract_pages_parallel') as parallel:
+            text = text_extraction.extract_pdf_text(self.make_pdf(3), 'cv.pdf')
+        parallel.assert_not_called()
+        self.assertEqual(self.markers(text), ['marker0', 'marker1', 'marker2'])
+
+    def test_large_documents_are_split_across_the_pool_in_order(self):
+        from . import text_extraction
+
+        pdf = self.make_pdf(5)
+        with self.settings(PDF_PARALLEL_MIN_PAGES=4, PDF_EXTRACTION_WORKERS=2, PDF_MAX_PAGES=40):
+            with mock.patch.object(text_extraction, '_extract_pages_parallel',
+                                   wraps=text_extraction._extract_pages_parallel) as parallel:
+                text = text_extraction.extract_pdf_text(pdf, 'cv.pdf')
+            parallel.assert_called_once_with(pdf, 'cv.pdf', 5, 2, mock.ANY, mock.ANY)
+            self.assertIsNotNone(text_extraction._pool)
+        self.assertEqual(self.markers(text), [f'marker{i}' for i in range(5)])
+
+    def test_stuck_worker_hits_one_deadline_and_is_killed(self):
+        import multiprocessing
+        import time
+        from . import text_extraction
+
+        def stuck_get(timeout):
+            time.sleep(timeout)
+            raise multiprocessing.TimeoutError()
+
+        done = mock.Mock(**{'get.return_value': ['page one']})
+        stuck = [mock.Mock(**{'get.side_effect': stuck_get}) for _ in range(2)]
+        pool = mock.Mock()
+        pool.apply_async.side_effect = [done, *stuck]
+
+        with mock.patch.object(text_extraction, '_get_pool', return_value=pool), \
+                mock.patch.object(text_extraction, '_reset_pool') as reset_pool, \
+                mock.patch.object(text_extraction, 'POOL_GRACE_SECONDS', 0):
+            started = time.monotonic()
+            pages = text_extraction._extract_pages_parallel(b'%PDF', 'cv.pdf', 6, 3, page_timeout=0.1)
+            elapsed = time.monotonic() - started
+
+        self.assertEqual(pages, ['page one'])
+        # Both stuck ranges share the 2 x 0.1s deadline instead of waiting in turn
+        self.assertLess(elapsed, 0.35)
+        reset_pool.assert_called_once_with(terminate=True)
+
+    def test_document_budget_caps_the_pool_wait(self):
+        import multiprocessing
+        import time
+        from . import text_extraction
+
+        def stuck_get(timeout):
+            time.sleep(timeout)
+            raise multiprocessing.TimeoutError()
+
+        pool = mock.Mock()
+        pool.apply_async.return_value = mock.Mock(**{'get.side_effect': stuck_get})
+        with mock.patch.object(text_extraction, '_get_pool', return_value=pool), \
+                mock.patch.object(text_extraction, '_reset_pool'):
+            started = time.monotonic()
+            # Page timeouts alone would allow 20 x 10s + grace
+            text_extraction._extract_pages_parallel(b'%PDF', 'cv.pdf', 40, 2, 10,
+                                                    deadline=time.monotonic() + 0.2)
+        self.assertLess(time.monotonic() - started, 0.5)
+
+    def test_document_budget_caps_in_process_extraction(self):
+        import time
+        import pdfplumber.page
+        from .text_extraction import extract_pdf_text
+
+        def slow_extract(page, *args, **kwargs):
+            time.sleep(0.1)
+            return f'marker{page.page_number - 1}'
+
+        pdf = self.make_pdf(6)
+        with self.settings(PDF_EXTRACTION_WORKERS=1, PDF_PAGE_TIMEOUT=10, PDF_EXTRACTION_BUDGET=0.25), \
+                mock.patch.object(pdfplumber.page.Page, 'extract_text', slow_extract):
+            started = time.monotonic()
+            text = extract_pdf_text(pdf, 'cv.pdf')
+        self.assertLess(time.monotonic() - started, 0.6)
+        self.assertEqual(self.markers(text), ['marker0', 'marker1'])
+
+    def test_reset_pool_terminates_running_workers(self):
+        import os
+        import time
+        from . import text_extraction
+
+        pool = text_extraction._get_pool(1)
+        pid = pool.apply_async(os.getpid).get(timeout=10)
+        pool.apply_async(time.sleep, (30,))
+        started = time.monotonic()
+        text_extraction._reset_pool(terminate=True)
+        self.assertLess(time.monotonic() - started, 5)
+        with self.assertRaises(ProcessLookupError):
+            os.kill(pid, 0)
+        self.assertIsNone(text_extraction._pool)
+
+
+class BatchAnalysisTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='batch', password='test12345')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.resume = Resume.objects.create(
+            user=self.user, file_name='cv.pdf', parsed_text='python django', processing_status='completed',
+        )
+        self.jobs = [
+            JobDescription.objects.create(user=self.user, title=f'Job {i}', description='python django docker')
+            for i in range(3)
+        ]
+
+    def test_resume_against_all_jobs(self):
+        response = self.client.post('/api/analyze/batch/', {'resume_id': self.resume.id}, format='json')
+        self.assertEqual(response.status_code, 200, response.data)
+        self.assertEqual(response.data['count'], 3)
+        self.assertEqual(AnalysisResult.objects.filter(user=self.user).count(), 3)
+        scores = [item['match_percent'] for item in response.data['results']]
+        self.assertEqual(scores, sorted(scores, reverse=True))
+
+    def test_job_against_selected_resumes(self):
+        response = self.client.post(
+            '/api/analyze/batch/', {'job_id': self.jobs[0].id, 'resume_ids': [self.resume.id]}, format='json',
+        )
+        self.assertEqual(response.status_code, 200, response.data)
+        self.assertEqual(response.data['results'][0]['job_id'], self.jobs[0].id)
+        self.assertEqual(response.data['missing'], [])
+
+    def test_unknown_and_foreign_ids_are_reported_missing(self):
+        other = User.objects.create_user(username='other', password='test12345')
+        foreign = JobDescription.objects.create(user=other, title='Theirs', description='python')
+        job_ids = [self.jobs[0].id, foreign.id, 999999]
+        response = self.client.post(
+            '/api/analyze/batch/', {'resume_id': self.resume.id, 'job_ids': job_ids}, format='json',
+        )
+        self.assertEqual(response.status_code, 200, response.data)
+        self.assertEqual([item['job_id'] for item in response.data['results']], [self.jobs[0].id])
+        self.assertEqual(response.data['missing'], [foreign.id, 999999])
+
+    def test_requires_exactly_one_anchor(self):
+        response = self.client.post(
+            '/api/analyze/batch/', {'resume_id': self.resume.id, 'job_id': self.jobs[0].id}, format='json',
+        )
+        self.assertEqual(response.status_code, 400)
+
+    def test_batch_size_is_capped(self):
+        with self.settings(ANALYSIS_BATCH_MAX=2):
+            response = self.client.post('/api/analyze/batch/', {'resume_id': self.resume.id}, format='json')
+        self.assertEqual(response.status_code, 400)
+
+
+class ReextractSkillsCommandTests(TestCase):
+    def test_reextracts_stale_rows_only(self):
+        from io import StringIO
+        from django.core.management import call_command
+        from .nlp_module.skill_extractor import TAXONOMY_VERSION
+
+        user = User.objects.create_user(username='reextract', password='test12345')
+        stale = JobDescription.objects.create(user=user, title='Old', description='python and docker', skills_version='old')
+        current = JobDescription.objects.create(
+            user=user, title='New', description='python', skills=['Kept'], skills_version=TAXONOMY_VERSION,
+        )
+        call_command('reextract_skills', '--only', 'jobs', stdout=StringIO(), stderr=StringIO())
+
+        stale.refresh_from_db()
+        current.refresh_from_db()
+        self.assertEqual(stale.skills, ['docker', 'python'])
+        self.assertEqual(stale.skills_version, TAXONOMY_VERSION)
+        self.assertEqual(current.skills, ['Kept'])
+
+
+class PhraseAutomatonTests(TestCase):
+    def setUp(self):
+        from .nlp_module.aho_corasick import PhraseAutomaton
+        from .nlp_module.skill_extractor import SKILL_LIST
+        self.automaton = PhraseAutomaton({skill: skill for skill in SKILL_LIST})
+
+    def test_respects_word_boundaries(self):
+        text = "good interest in digital marketing and a restless attitude"
+        self.assertEqual(self.automaton.find(text), set())
+
+    def test_finds_longest_multi_word_phrases(self):
+        text = "unit testing with pytest, machine learning and deep learning in python."
+        self.assertEqual(
+            self.automaton.find(text),
+            {"unit testing", "pytest", "machine learning", "deep learning", "python"},
+        )
+
+    def test_leftmost_longest_without_overlaps(self):
+        from .nlp_module.aho_corasick import PhraseAutomaton
+        automaton = PhraseAutomaton({"unit testing": "a", "testing": "b", "testing tools": "c"})
+        self.assertEqual(
+            [(start, end, value) for start, end, value in automaton.iter_matches("unit testing tools")],
+            [(0, 12, "a")],
+        )
+        self.assertEqual(automaton.find("testing tools"), {"c"})
+
+    def test_symbols_inside_phrases(self):
+        self.assertEqual(self.automaton.find("c++, c# and node.js; ci/cd"), {"c++", "c#", "node.js", "ci/cd"})
+
+    def test_dot_between_word_characters_stays_in_the_token(self):
+        from .nlp_module.aho_corasick import PhraseAutomaton
+        automaton = PhraseAutomaton({"js": "javascript", "node": "node", "node.js": "node.js"})
+        self.assertEqual(automaton.find("react.js and express.js"), set())
+        self.assertEqual(automaton.find("node.js"), {"node.js"})
+        self.assertEqual(automaton.find("node. js."), {"node", "javascript"})
+
+    def test_engines_agree_over_the_taxonomy(self):
+        from .nlp_module import skill_extractor
+        use_blank_model(self)
+        phrases = sorted(skill_extractor.taxonomy.phrases)
+        texts = [f"Experienced in {phrase}." for phrase in phrases]
+        texts += [", ".join(phrases) + ".", " ".join(phrases)]
+        for text in texts:
+            with self.subTest(text=text[:60]), self.settings(SKILL_MATCHER='phrasematcher'):
+                self.assertEqual(skill_extractor.get_engine(), 'phrasematcher')
+                self.assertEqual(
+                    skill_extractor.extract_skill_ids(text),
+                    sorted(skill_extractor.automaton.find(text.lower())),
+                )
+
+    def test_aliases_resolve_to_one_value(self):
+        from .nlp_module.aho_corasick import PhraseAutomaton
+        automaton = PhraseAutomaton({"k8s": "kubernetes", "kubernetes": "kubernetes"})
+        self.assertEqual(automaton.find("k8s and kubernetes"), {"kubernetes"})
+
+    def test_automaton_engine_setting(self):
+        from .nlp_module.skill_extractor import extract_skills
+        with self.settings(SKILL_MATCHER='automaton'):
+            self.assertEqual(extract_skills("Go and Git, good digital skills"), ["Git", "Go"])
+
+
+class SkillTaxonomyTests(TestCase):
+    def test_aliases_extract_canonical_names(self):
+        from .nlp_module.skill_extractor import extract_skills
+        with self.settings(SKILL_MATCHER='automaton'):
+            self.assertEqual(
+                extract_skills("Postgres, k8s and ReactJS with JS"),
+                ["JavaScript", "Kubernetes", "PostgreSQL", "React"],
+            )
+
+    def test_compare_skills_uses_ids(self):
+        from .nlp_module.job_resume_analyzer import compare_skills
+        missing, percent = compare_skills(["django", "postgresql"], ["postgresql", "python", "kubernetes"])
+        self.assertEqual(missing, ["python", "kubernetes"])
+        self.assertEqual(percent, 33.33)
+
+    def test_parent_coverage_is_opt_in(self):
+        from .nlp_module.job_resume_analyzer import analysis_version, compare_skills
+        default_version = analysis_version()
+        with self.settings(SKILL_PARENT_COVERAGE=True):
+            missing, percent = compare_skills(["django", "postgresql"], ["postgresql", "python", "kubernetes"])
+            self.assertNotEqual(analysis_version(), default_version)
+        self.assertEqual(missing, ["kubernetes"])
+        self.assertEqual(percent, 66.67)
+
+    def test_version_covers_matcher_engine_and_pipeline(self):
+        from .nlp_module.job_resume_analyzer import analysis_version
+        use_blank_model(self)
+        versions = set()
+        for engine in ('phrasematcher', 'automaton'):
+            for full_pipeline in (False, True):
+                with self.settings(SKILL_MATCHER=engine, NLP_FULL_PIPELINE=full_pipeline):
+                    versions.add(analysis_version())
+        self.assertEqual(len(versions), 4)
+
+    def test_ids_are_stored_and_names_are_served(self):
+        user = User.objects.create_user(username='skills', password='test12345')
+        client = APIClient()
+        client.force_authenticate(user)
+        with self.settings(SKILL_MATCHER='automaton'):
+            response = client.post('/api/jobs/', {
+                'title': 'Backend', 'description': 'Docker, k8s and Postgres',
+            }, format='json')
+            self.assertEqual(response.status_code, 201, response.data)
+            job = JobDescription.objects.get(pk=response.data['id'])
+            self.assertEqual(job.skills, ['docker', 'kubernetes', 'postgresql'])
+            self.assertEqual(client.get(f'/api/jobs/{job.id}/').data['skills'],
+                             ['Docker', 'Kubernetes', 'PostgreSQL'])
+
+            resume = Resume.objects.create(
+                user=user, file_name='cv.pdf', parsed_text='Docker and PostgreSQL', processing_status='completed',
+            )
+            resume.update_skills()
+            self.assertEqual(resume.skills, ['docker', 'postgresql'])
+            response = client.post('/api/analyze/', {'resume_id': resume.id, 'job_id': job.id}, format='json')
+        self.assertEqual(response.status_code, 200, response.data)
+        self.assertEqual(response.data['missing_skills'], ['Kubernetes'])
+        self.assertEqual(response.data['resume_skills'], ['Docker', 'PostgreSQL'])
+
+    def test_legacy_display_strings_still_resolve(self):
+        from .nlp_module.skill_extractor import taxonomy
+        self.assertEqual(taxonomy.resolve("Node.Js"), "node.js")
+        self.assertEqual(taxonomy.display("node.js"), "Node.js")
+
+    def test_rejects_ambiguous_aliases(self):
+        from .nlp_module.taxonomy import Taxonomy, TaxonomyError
+        data = {"skills": [{"id": "go", "aliases": ["golang"]}, {"id": "golang"}]}
+        with self.assertRaises(TaxonomyError):
+            Taxonomy(data, checksum="x")
+
+
+class SkillMatcherArtifactTests(TestCase):
+    def setUp(self):
+        import tempfile
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+
+    def test_round_trip_and_staleness(self):
+        import os
+        import shutil
+        from .nlp_module.artifact import build_artifact, load_artifact, DEFAULT_TAXONOMY_PATH
+
+        taxonomy_path = os.path.join(self.tmp.name, 'skills.json')
+        shutil.copy(DEFAULT_TAXONOMY_PATH, taxonomy_path)
+        artifact = os.path.join(self.tmp.name, 'matcher.pkl')
+
+        with self.settings(SKILL_TAXONOMY_PATH=taxonomy_path):
+            build_artifact(artifact)
+            compiled = load_artifact(artifact)
+            self.assertEqual(compiled.automaton.find("k8s and postgres"), {"kubernetes", "postgresql"})
+
+            with open(taxonomy_path, 'a') as f:
+                f.write("\n")
+            self.assertIsNone(load_artifact(artifact))
+
+    def test_missing_artifact_is_ignored(self):
+        import os
+        from .nlp_module.artifact import load_artifact
+        self.assertIsNone(load_artifact(os.path.join(self.tmp.name, 'absent.pkl')))
+
+
+class ModelRegistryTests(TestCase):
+    def test_loads_once_on_first_use(self):
+        import threading
+        from .nlp_module.nlp_setup import ModelRegistry
+
+        calls = []
+        registry = ModelRegistry(lambda: calls.append(1) or object())
+        self.assertFalse(registry.loaded)
+
+        threads = [threading.Thread(target=registry.get) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(calls), 1)
+        self.assertIs(registry.get(), registry.get())
+
+    def test_missing_model_is_remembered(self):
+        from .nlp_module.nlp_setup import ModelRegistry
+
+        calls = []
+
+        def loader():
+            calls.append(1)
+            raise ImportError("no model")
+
+        registry = ModelRegistry(loader)
+        self.assertIsNone(registry.get())
+        self.assertIsNone(registry.get())
+        self.assertEqual(len(calls), 1)
+
+
+def use_blank_model(test):
+    """Serve a tokenizer-only spaCy pipeline as the shared model for one test"""
+    import spacy
+    from .nlp_module import nlp_setup, skill_extractor
+
+    nlp = spacy.blank('en')
+    for patcher in (
+        mock.patch.object(nlp_setup.models, 'get', return_value=nlp),
+        # The PhraseMatcher is built from whichever model is served
+        mock.patch.object(skill_extractor, '_matcher', None),
+    ):
+        patcher.start()
+        test.addCleanup(patcher.stop)
+    return nlp
+
+
+class TokenizerOnlyTests(TestCase):
+    def test_model_loads_without_unused_components(self):
+        from .nlp_module import nlp_setup
+
+        with mock.patch('spacy.load') as load:
+            nlp_setup.get_nlp()
+            load.assert_called_once_with('en_core_web_sm', exclude=nlp_setup.UNUSED_COMPONENTS)
+            load.reset_mock()
+            nlp_setup.get_nlp(full_pipeline=True)
+            load.assert_called_once_with('en_core_web_sm')
+
+    def test_make_doc_runs_the_pipeline_only_when_switched_on(self):
+        from .nlp_module import nlp_setup
+
+        nlp = mock.MagicMock()
+        with mock.patch.object(nlp_setup.models, 'get', return_value=nlp):
+            nlp_setup.make_doc('python')
+            nlp.make_doc.assert_called_once_with('python')
+            nlp.assert_not_called()
+
+            with mock.patch.object(nlp_setup, 'FULL_PIPELINE', True):
+                nlp_setup.make_doc('python')
+            nlp.assert_called_once_with('python')
+
+    def test_phrasematcher_matches_on_tokens_alone(self):
+        from .nlp_module.skill_extractor import automaton, extract_skill_ids, get_engine
+
+        use_blank_model(self)
+        text = "Docker, k8s and Postgres"
+        with self.settings(SKILL_MATCHER='phrasematcher'):
+            self.assertEqual(get_engine(), 'phrasematcher')
+            self.assertEqual(extract_skill_ids(text), sorted(automaton.find(text.lower())))
+
+
+class AnalysisContextTests(TestCase):
+    def test_each_text_is_tokenized_once_per_analysis(self):
+        from .nlp_module import context
+        from .nlp_module.job_resume_analyzer import _compute_gap
+
+        use_blank_model(self)
+        resume = "Python developer,  5 years of Django"
+        job = "Python, Django and Docker"
+        with self.settings(SKILL_MATCHER='phrasematcher'), \
+                mock.patch.object(context, 'make_doc', wraps=context.make_doc) as make_doc:
+            result = _compute_gap(resume, job)
+        self.assertEqual(
+            [call.args[0] for call in make_doc.call_args_list],
+            ["python developer, 5 years of django", "python, django and docker"],
+        )
+        self.assertEqual(result['missing_skills'], ['Docker'])
+        self.assertEqual(result['resume_overview']['year_experience'], '5')
+
+    def test_section_analysis_does_not_parse(self):
+        from .nlp_module import context
+        from .nlp_module.section_analyzer import analyze_resume_section
+
+        with mock.patch.object(context, 'make_doc') as make_doc:
+            overview = analyze_resume_section("Software Engineer, 3 years at a university lab")
+        make_doc.assert_not_called()
+        self.assertEqual(overview, {'has_experience': True, 'has_education': True, 'year_experience': '3'})
+
+    def test_context_is_reused_and_builds_its_doc_once(self):
+        from .nlp_module import context
+
+        use_blank_model(self)
+        ctx = context.AnalysisContext("  Python\n Django ")
+        self.assertIs(context.as_context(ctx), ctx)
+        self.assertEqual((ctx.text, ctx.lower), ("Python Django", "python django"))
+        with mock.patch.object(context, 'make_doc', wraps=context.make_doc) as make_doc:
+            self.assertIs(ctx.doc, ctx.doc)
+        make_doc.assert_called_once_with("python django")
+
+
+class MemoryReportCommandTests(TestCase):
+    def test_reports_current_process(self):
+        import json
+        import os
+        import unittest
+        from io import StringIO
+        from django.core.management import call_command
+
+        if not os.path.exists('/proc/self/smaps_rollup'):
+            raise unittest.SkipTest("needs Linux /proc")
+        out = StringIO()
+        call_command('memory_report', '--pid', str(os.getpid()), '--json', stdout=out)
+        report = json.loads(out.getvalue())
+        self.assertEqual(report['processes'][0]['pid'], os.getpid())
+        self.assertGreater(report['totals']['pss_kb'], 0)
+
+
+class AsyncAnalyzeTests(TestCase):
+    def setUp(self):
+        from rest_framework_simplejwt.tokens import RefreshToken
+
+        self.user = User.objects.create_user(username='async', password='test12345')
+        self.resume = Resume.objects.create(
+            user=self.user, file_name='cv.pdf', parsed_text='python django', processing_status='completed',
+        )
+        self.job = JobDescription.objects.create(user=self.user, title='Engineer', description='python docker')
+        self.auth = {'HTTP_AUTHORIZATION': f'Bearer {RefreshToken.for_user(self.user).access_token}'}
+
+    def post(self, data, **extra):
+        return self.client.post('/api/analyze/async/', data, content_type='application/json', **extra)
+
+    def test_runs_analysis_in_pool_and_records_result(self):
+        with self.settings(ANALYSIS_POOL_WORKERS=1):
+            response = self.post({'resume_id': self.resume.id, 'job_id': self.job.id}, **self.auth)
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertEqual(response.json()['missing_skills'], ['Docker'])
+        analysis = AnalysisResult.objects.get()
+        self.assertEqual(analysis.match_percent, 50.0)
+        self.assertIsNotNone(analysis.duration_ms)
+
+    def test_requires_jwt(self):
+        response = self.post({'resume_id': self.resume.id, 'job_id': self.job.id})
+        self.assertEqual(response.status_code, 401)
+
+    def test_saturated_pool_returns_429(self):
+        with self.settings(ANALYSIS_POOL_MAX_PENDING=0):
+            response = self.post({'resume_id': self.resume.id, 'job_id': self.job.id}, **self.auth)
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response['Retry-After'], '1')
+        self.assertFalse(AnalysisResult.objects.exists())
+
+    def test_timed_out_analysis_keeps_its_slot_until_the_worker_finishes(self):
+        import asyncio
+        from concurrent.futures import Future
+        from . import analysis_pool
+
+        running = Future()
+        running.set_running_or_notify_cancel()
+        pool = mock.Mock()
+        pool.submit.return_value = running
+
+        with self.settings(ANALYSIS_POOL_TIMEOUT=0.05, ANALYSIS_POOL_MAX_PENDING=1), \
+                mock.patch.object(analysis_pool, '_get_pool', return_value=pool):
+            with self.assertRaises(asyncio.TimeoutError):
+                asyncio.run(analysis_pool.run_analysis('python', 'docker'))
+            # The worker is still busy with it, so the pool is still full
+            self.assertEqual(analysis_pool.pending(), 1)
+            with self.assertRaises(analysis_pool.PoolSaturated):
+                asyncio.run(analysis_pool.run_analysis('python', 'docker'))
+
+            running.set_result(({}, 1))
+            self.assertEqual(analysis_pool.pending(), 0)
+
+    def test_timed_out_queued_analysis_is_cancelled_and_released(self):
+        import asyncio
+        from concurrent.futures import Future
+        from . import analysis_pool
+
+        queued = Future()
+        pool = mock.Mock()
+        pool.submit.return_value = queued
+
+        with self.settings(ANALYSIS_POOL_TIMEOUT=0.05), \
+                mock.patch.object(analysis_pool, '_get_pool', return_value=pool):
+            with self.assertRaises(asyncio.TimeoutError):
+                asyncio.run(analysis_pool.run_analysis('python', 'docker'))
+        self.assertTrue(queued.cancelled())
+        self.assertEqual(analysis_pool.pending(), 0)
+
+
+class OpenAIClientTests(TestCase):
+    """The OpenAI-backed views against the local stub server"""
+
+    def setUp(self):
+        from . import llm_client
+        from .openai_stub import StubServer
+
+        self.stub = StubServer().start()
+        self.addCleanup(self.stub.stop)
+        overrides = self.settings(
+            OPENAI_BASE_URL=self.stub.base_url, OPENAI_API_KEY='test-key',
+            OPENAI_RETRY_BASE_DELAY=0, OPENAI_TIMEOUT=5,
+        )
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+        llm_client.reset()
+        self.addCleanup(llm_client.reset)
+
+        self.user = User.objects.create_user(username='llm', password='test12345')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def generate(self):
+        return self.client.post('/api/generate-resume/', {
+            'name': 'Ada', 'education': 'BSc', 'skills': 'Python', 'projects': ['Parser'],
+        }, format='json')
+
+    def test_generate_resume(self):
+        response = self.generate()
+        self.assertEqual(response.status_code, 200, response.data)
+        self.assertIn('PROFESSIONAL SUMMARY', response.data['formatted_resume'])
+
+    def test_speech_analysis_makes_two_calls(self):
+        from django.core.files.uploadedfile import SimpleUploadedFile
+
+        audio = SimpleUploadedFile('clip.webm', b'\x1aE\xdf\xa3' * 64, content_type='audio/webm')
+        response = self.client.post('/api/speak-assessment/', {'audio': audio}, format='multipart')
+        self.assertEqual(response.status_code, 200, response.data)
+        self.assertEqual(response.data['clarity'], 7)
+        self.assertEqual(sum(self.stub.requests.values()), 2)
+
+    def test_transient_errors_are_retried(self):
+        self.stub.fail_rate = 1.0
+        with self.settings(OPENAI_MAX_RETRIES=2):
+            response = self.generate()
+        self.assertEqual(response.status_code, 500)
+        self.assertEqual(self.stub.requests['/v1/chat/completions'], 3)
+
+    def test_timeout_returns_504(self):
+        self.stub.delay = 0.5
+        with self.settings(OPENAI_TIMEOUT=0.1, OPENAI_MAX_RETRIES=0):
+            response = self.generate()
+        self.assertEqual(response.status_code, 504)
+
+    def test_deadline_bounds_attempts_and_retries(self):
+        import time
+
+        self.stub.delay = 1.0
+        with self.settings(OPENAI_REQUEST_DEADLINE=0.3, OPENAI_MAX_RETRIES=5):
+            started = time.monotonic()
+            response = self.generate()
+        self.assertEqual(response.status_code, 504)
+        self.assertLess(time.monotonic() - started, 0.9)
+        self.assertEqual(self.stub.requests['/v1/chat/completions'], 1)
+
+    def test_async_views(self):
+        from django.core.files.uploadedfile import SimpleUploadedFile
+        from rest_framework_simplejwt.tokens import RefreshToken
+        from .result_cache import get_result_cache
+
+        get_result_cache('generate_resume').clear()
+        auth = {'HTTP_AUTHORIZATION': f'Bearer {RefreshToken.for_user(self.user).access_token}'}
+        payload = {'name': 'Ada', 'education': 'BSc', 'skills': 'Python', 'projects': ['Parser']}
+        first = self.client.post('/api/generate-resume/async/', payload, format='json', **auth)
+        second = self.client.post('/api/generate-resume/async/', payload, format='json', **auth)
+        self.assertEqual(first.status_code, 200, first.content)
+        self.assertIn('PROFESSIONAL SUMMARY', first.json()['formatted_resume'])
+        self.assertEqual((first['X-Cache'], second['X-Cache']), ('MISS', 'HIT'))
+
+        audio = SimpleUploadedFile('clip.webm', b'\x1aE\xdf\xa3' * 64, content_type='audio/webm')
+        response = self.client.post('/api/speak-assessment/async/', {'audio': audio}, format='multipart', **auth)
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertEqual(response.json()['clarity'], 7)
+        self.assertEqual(self.stub.requests['/v1/chat/completions'], 2)
+        self.assertEqual(self.stub.requests['/v1/audio/transcriptions'], 1)
+
+    def test_async_views_require_jwt(self):
+        self.client.force_authenticate(None)
+        self.assertEqual(self.client.post('/api/generate-resume/async/', {}, format='json').status_code, 401)
+        self.assertEqual(self.client.post('/api/speak-assessment/async/', {}).status_code, 401)
+
+    def test_concurrency_limit_returns_503(self):
+        from . import llm_client
+
+        with self.settings(OPENAI_MAX_CONCURRENCY=1, OPENAI_QUEUE_TIMEOUT=0.01):
+            slot = llm_client._get_slots().try_acquire()
+            try:
+                response = self.generate()
+            finally:
+                llm_client._get_slots().release(slot)
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(self.stub.requests, {})
+
+
+class SharedLLMSlotTests(TransactionTestCase):
+    """
+    OPENAI_MAX_CONCURRENCY slots held in the shared "llm" cache
+
+    A TransactionTestCase: the calls take slots from other threads, which
+    SQLite would block behind TestCase's open transaction.
+    """
+
+    def setUp(self):
+        from . import llm_client
+        from .openai_stub import StubServer
+
+        self.stub = StubServer(delay=0.2).start()
+        self.addCleanup(self.stub.stop)
+        overrides = self.settings(
+            OPENAI_BASE_URL=self.stub.base_url, OPENAI_API_KEY='test-key',
+            OPENAI_MAX_CONCURRENCY=2, OPENAI_QUEUE_TIMEOUT=10,
+        )
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+        llm_client.reset()
+        self.addCleanup(llm_client.reset)
+
+    def test_slots_are_shared_through_the_cache(self):
+        from django.core.cache import caches
+        from .llm_client import SharedSlots
+
+        # Two instances on one cache stand in for two gunicorn workers
+        worker_a = SharedSlots(caches['llm'], 2, lease=60, prefix='test-slot')
+        worker_b = SharedSlots(caches['llm'], 2, lease=60, prefix='test-slot')
+        first, second = worker_a.try_acquire(), worker_a.try_acquire()
+        self.assertIsNotNone(second)
+        self.assertIsNone(worker_b.acquire(timeout=0.1))
+        worker_a.release(first)
+        third = worker_b.try_acquire()
+        self.assertEqual(third[0], first[0])
+        worker_b.release(third)
+        worker_a.release(second)
+
+    def test_waiting_backs_off(self):
+        from django.core.cache import caches
+        from .llm_client import SharedSlots
+
+        slots = SharedSlots(caches['llm'], 1, lease=60, prefix='test-backoff')
+        held = slots.try_acquire()
+        with mock.patch.object(slots, 'try_acquire', wraps=slots.try_acquire) as attempt:
+            self.assertIsNone(slots.acquire(timeout=1.0))
+        # A fixed 50 ms poll would query the cache about 20 times
+        self.assertLessEqual(attempt.call_count, 8)
+        slots.release(held)
+
+    def test_slot_lease_expires(self):
+        import time
+        from django.core.cache import caches
+        from .llm_client import SharedSlots
+
+        slots = SharedSlots(caches['llm'], 1, lease=1, prefix='test-lease')
+        stale = slots.try_acquire()
+        self.assertIsNone(slots.try_acquire())
+        time.sleep(1.1)
+        fresh = slots.try_acquire()
+        self.assertIsNotNone(fresh)
+        # Releasing the expired slot must not free the new holder's
+        slots.release(stale)
+        self.assertIsNone(slots.try_acquire())
+        slots.release(fresh)
+
+    def test_cap_limits_concurrent_calls(self):
+        from concurrent.futures import ThreadPoolExecutor
+        from django.db import connections
+        from . import llm_client
+
+        def ask(i):
+            try:
+                response = llm_client.chat_completion(
+                    model='gpt-4o-mini', messages=[{'role': 'user', 'content': f'question {i}'}],
+                )
+                return response.choices[0].message.content
+            finally:
+                connections.close_all()
+
+        with ThreadPoolExecutor(max_workers=6) as pool:
+            answers = list(pool.map(ask, range(6)))
+        self.assertEqual([answer.split()[-1] for answer in answers], [str(i) for i in range(6)])
+        self.assertEqual(self.stub.requests['/v1/chat/completions'], 6)
+        self.assertEqual(self.stub.peak_active, 2)
+
+    def test_async_calls_share_the_cap(self):
+        import asyncio
+        from . import llm_client
+
+        async def ask(i):
+            response = await llm_client.achat_completion(
+                model='gpt-4o-mini', messages=[{'role': 'user', 'content': f'question {i}'}],
+            )
+            return response.choices[0].message.content
+
+        async def run():
+            return await asyncio.gather(*(ask(i) for i in range(4)))
+
+        answers = asyncio.run(run())
+        self.assertEqual([answer.split()[-1] for answer in answers], ['0', '1', '2', '3'])
+        self.assertEqual(self.stub.requests['/v1/chat/completions'], 4)
+        self.assertEqual(self.stub.peak_active, 2)
+
+
+class GenerateResumeCacheTests(TestCase):
+    def setUp(self):
+        from . import llm_client
+        from .openai_stub import StubServer
+        from .result_cache import get_result_cache
+
+        self.stub = StubServer().start()
+        self.addCleanup(self.stub.stop)
+        overrides = self.settings(OPENAI_BASE_URL=self.stub.base_url, OPENAI_API_KEY='test-key')
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+        llm_client.reset()
+        self.addCleanup(llm_client.reset)
+        get_result_cache("generate_resume").clear()
+
+        self.user = User.objects.create_user(username='cache', password='test12345', is_staff=True)
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def generate(self, **overrides):
+        payload = {'name': 'Ada', 'education': 'BSc', 'skills': 'Python, SQL', 'projects': ['Parser']}
+        payload.update(overrides)
+        return self.client.post('/api/generate-resume/', payload, format='json')
+
+    def test_identical_normalized_input_is_served_from_cache(self):
+        first = self.generate()
+        second = self.generate(skills='  Python,   SQL ', education='BSc ')
+        self.assertEqual(first['X-Cache'], 'MISS')
+        self.assertEqual(second['X-Cache'], 'HIT')
+        self.assertEqual(first.data, second.data)
+        self.assertEqual(self.stub.requests['/v1/chat/completions'], 1)
+
+    def test_different_input_misses(self):
+        self.generate()
+        self.assertEqual(self.generate(skills='Go')['X-Cache'], 'MISS')
+        self.assertEqual(self.stub.requests['/v1/chat/completions'], 2)
+
+    def test_stats_count_hits_and_misses_in_process(self):
+        from .result_cache import get_result_cache
+
+        cache = get_result_cache("generate_resume")
+        hits, misses = cache.hits, cache.misses
+        self.generate()
+        self.generate()
+        data = self.client.get('/api/cache/stats/').data
+        stats = {c['name']: c for c in data['caches']}['generate_resume']
+        self.assertEqual(data['pid'], os.getpid())
+        self.assertEqual((stats['hits'] - hits, stats['misses'] - misses), (1, 1))
+        self.assertNotIn('shared', stats)
+
+    def test_stats_are_staff_only(self):
+        self.user.is_staff = False
+        self.user.save()
+        self.assertEqual(self.client.get('/api/cache/stats/').status_code, 403)
+
+
+class SpeechAssessmentTests(TestCase):
+    """Upload limits, the local transcription backend and stage timings"""
+
+    def setUp(self):
+        from . import llm_client
+        from .openai_stub import StubServer
+        from .speech import reset_transcription_backend
+
+        self.stub = StubServer().start()
+        self.addCleanup(self.stub.stop)
+        overrides = self.settings(
+            OPENAI_BASE_URL=self.stub.base_url, OPENAI_API_KEY='test-key',
+            SPEECH_MAX_BYTES=64 * 1024, SPEECH_MAX_SECONDS=2,
+            SPEECH_TRANSCRIPTION_BACKEND={
+                'BACKEND': 'analysis.speech.StubTranscriptionBackend',
+                'OPTIONS': {'transcript': 'Hello from the stub backend.'},
+            },
+        )
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+        llm_client.reset()
+        self.addCleanup(llm_client.reset)
+        reset_transcription_backend()
+        self.addCleanup(reset_transcription_backend)
+
+        self.user = User.objects.create_user(username='speaker', password='test12345')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def wav(self, seconds, rate=8000):
+        import io
+        import wave
+        from django.core.files.uploadedfile import SimpleUploadedFile
+
+        buffer = io.BytesIO()
+        with wave.open(buffer, 'wb') as audio:
+            audio.setnchannels(1)
+            audio.setsampwidth(1)
+            audio.setframerate(rate)
+            audio.writeframes(b'\x80' * int(seconds * rate))
+        return SimpleUploadedFile('clip.wav', buffer.getvalue(), content_type='audio/wav')
+
+    def post(self, audio):
+        return self.client.post('/api/speak-assessment/', {'audio': audio}, format='multipart')
+
+    def test_local_backend_and_stage_timings(self):
+        response = self.post(self.wav(1))
+        self.assertEqual(response.status_code, 200, response.data)
+        self.assertEqual(response.data['transcript'], 'Hello from the stub backend.')
+        self.assertEqual(set(response.data['timings_ms']), {'upload', 'transcribe', 'score', 'total'})
+        # Only the scoring call reaches OpenAI
+        self.assertEqual(self.stub.requests, {'/v1/chat/completions': 1})
+
+    def test_oversized_upload_is_rejected(self):
+        from django.core.files.uploadedfile import SimpleUploadedFile
+
+        audio = SimpleUploadedFile('clip.webm', b'\x00' * (128 * 1024), content_type='audio/webm')
+        response = self.post(audio)
+        self.assertEqual(response.status_code, 413)
+        self.assertEqual(self.stub.requests, {})
+
+    def test_file_exactly_at_the_limit_is_accepted(self):
+        from django.core.files.uploadedfile import SimpleUploadedFile
+
+        audio = SimpleUploadedFile('clip.webm', b'\x00' * (64 * 1024), content_type='audio/webm')
+        response = self.post(audio)
+        self.assertEqual(response.status_code, 200, response.data)
+
+    def test_one_byte_over_the_limit_is_rejected(self):
+        from django.core.files.uploadedfile import SimpleUploadedFile
+
+        audio = SimpleUploadedFile('clip.webm', b'\x00' * (64 * 1024 + 1), content_type='audio/webm')
+        self.assertEqual(self.post(audio).status_code, 413)
+
+    def test_declared_length_allows_for_multipart_overhead(self):
+        from .speech import MULTIPART_ALLOWANCE, AudioSizeLimitHandler
+
+        handler = AudioSizeLimitHandler(1000)
+        handler.handle_raw_input(None, {}, 1000 + MULTIPART_ALLOWANCE, b'boundary')
+        self.assertFalse(handler.exceeded)
+        handler.handle_raw_input(None, {}, 1001 + MULTIPART_ALLOWANCE, b'boundary')
+        self.assertTrue(handler.exceeded)
+
+    def test_size_limit_is_enforced_while_streaming(self):
+        from .speech import AudioSizeLimitHandler
+        from django.core.files.uploadhandler import StopUpload
+
+        handler = AudioSizeLimitHandler(10)
+        self.assertEqual(handler.receive_data_chunk(b'x' * 8, 0), b'x' * 8)
+        with self.assertRaises(StopUpload):
+            handler.receive_data_chunk(b'x' * 8, 8)
+        self.assertTrue(handler.exceeded)
+
+    def test_long_recording_is_rejected(self):
+        response = self.post(self.wav(3))
+        self.assertEqual(response.status_code, 413)
+        self.assertIn('seconds', response.data['error'])
+        self.assertEqual(self.stub.requests, {})
+
+
+class BenchmarkNLPTests(TestCase):
+    """Synthetic corpus and the benchmark_nlp report"""
+
+    def test_corpus_is_deterministic_and_sized_in_pages(self):
+        from .synthetic import WORDS_PER_PAGE, make_job_description, make_resume
+        from .nlp_module.skill_extractor import extract_skills
+
+        resume = make_resume(pages=3, seed=1)
+        self.assertEqual(resume, make_resume(pages=3, seed=1))
+        self.assertNotEqual(resume, make_resume(pages=3, seed=2))
+        self.assertGreaterEqual(len(resume.split()), 3 * WORDS_PER_PAGE)
+        self.assertLess(len(resume.split()), 4 * WORDS_PER_PAGE)
+        self.assertGreaterEqual(len(extract_skills(make_job_description(pages=1))), 8)
+
+    def test_report_and_regression_check(self):
+        import json
+        from io import StringIO
+        from django.core.management import call_command
+        from .management.commands.benchmark_nlp import FUNCTIONS, compare
+
+        out = StringIO()
+        with self.settings(SKILL_MATCHER='automaton'):
+            call_command('benchmark_nlp', '--in-process', sizes='1,2', docs=1, runs=2, stdout=out, stderr=StringIO())
+        report = json.loads(out.getvalue())
+        config = report['configs'][0]
+        self.assertEqual(config['engine'], 'automaton')
+        self.assertEqual(set(config['results']), set(FUNCTIONS))
+        stats = config['results']['analyze_gap']['2']
+        self.assertEqual(stats['calls'], 2)
+        self.assertLessEqual(stats['p50_ms'], stats['p99_ms'])
+        self.assertGreater(stats['peak_alloc_kb'], 0)
+
+        self.assertEqual(compare(report, report, 0.25), [])
+        slower = json.loads(out.getvalue())
+        slower['configs'][0]['results']['analyze_gap']['2']['p95_ms'] = stats['p95_ms'] * 2
+        regressions = compare(report, slower, 0.25)
+        self.assertEqual([(r[1], r[2], r[3]) for r in regressions], [('analyze_gap', '2', 'p95_ms')])
+
+
+class LoadTestToolTests(TestCase):
+    """Generated uploads, the query count header and the load test report"""
+
+    def setUp(self):
+        self.blob_root = use_temp_blob_store(self)
+        self.user = User.objects.create_user(username='loader', password='test12345')
+
+    def client_for(self):
+        client = APIClient()
+        client.force_authenticate(self.user)
+        return client
+
+    def test_generated_pdf_and_docx_are_extracted_on_upload(self):
+        from django.core.files.uploadedfile import SimpleUploadedFile
+        from .synthetic import make_docx, make_pdf, make_resume
+
+        text = make_resume(pages=2, seed=3)
+        client = self.client_for()
+        for name, content in (('cv.pdf', make_pdf(text)), ('cv.docx', make_docx(text))):
+            upload = SimpleUploadedFile(name, content)
+            with self.settings(RESUME_ASYNC_PROCESSING=False):
+                response = client.post('/api/resumes/', {'file': upload}, format='multipart')
+            self.assertEqual(response.status_code, 201, response.data)
+            resume = Resume.objects.get(pk=response.data['id'])
+            self.assertEqual(resume.processing_status, 'completed')
+            self.assertEqual(resume.parsed_text.split()[:4], text.split()[:4])
+            self.assertTrue(resume.skills)
+            self.assertEqual(resume.file_source(), os.path.join(
+                self.blob_root, resume.file_sha256[:2], resume.file_sha256[2:4], resume.file_sha256))
+
+    def test_query_count_header(self):
+        self.assertNotIn('X-DB-Queries', self.client_for().get('/api/dashboard/stats/'))
+        with self.settings(QUERY_COUNT_HEADER=True):
+            response = self.client_for().get('/api/dashboard/stats/')
+        self.assertEqual(response.status_code, 200)
+        self.assertGreater(int(response['X-DB-Queries']), 0)
+
+    def test_recorder_report(self):
+        from .management.commands.load_test import Recorder
+
+        recorder = Recorder()
+        for ms in range(1, 101):
+            recorder.add('GET /x/', ms / 1000, 200, 3)
+        recorder.add('GET /x/', 0.5, 500, 7, error='boom')
+        recorder.add('GET /x/', 0.5, None, None, error='refused')
+        stats = recorder.report()['GET /x/']
+        self.assertEqual(stats['requests'], 102)
+        self.assertEqual(stats['errors'], 2)
+        self.assertEqual(stats['p50_ms'], 51.0)
+        self.assertEqual(stats['db_queries_max'], 7)
+        self.assertEqual(stats['statuses'], {'200': 100, '500': 1, 'error': 1})
+        self.assertEqual(stats['first_error'], 'boom')
+
+
+class InstrumentationTests(TestCase):
+    """Stage timings, Server-Timing headers and the metrics endpoint"""
+
+    def setUp(self):
+        from .instrumentation import METRICS
+
+        for metric in METRICS:
+            metric.clear()
+        self.user = User.objects.create_user(username='timed', password='test12345')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.resume = Resume.objects.create(
+            user=self.user, file=b'', file_name='cv.pdf', processing_status='completed',
+            parsed_text='Python developer with 4 years of experience and a bachelor degree',
+        )
+        self.job = JobDescription.objects.create(user=self.user, title='Dev', description='Python and Django')
+        self.resume.update_skills()
+        self.job.update_skills()
+
+    def server_timing(self, response):
+        return {part.split(';')[0]: part for part in response['Server-Timing'].split(', ')}
+
+    def test_analyze_reports_its_stages(self):
+        response = self.client.post('/api/analyze/', {'resume_id': self.resume.id, 'job_id': self.job.id},
+                                    format='json')
+        self.assertEqual(response.status_code, 200)
+        timing = self.server_timing(response)
+        for name in ('db', 'db_fetch', 'resume_skills', 'job_skills', 'analyze_gap',
+                     'analyze_resume_section', 'db_insert', 'total'):
+            self.assertIn(name, timing)
+        self.assertRegex(timing['db'], r'desc="\d+ queries"')
+
+    def test_stage_records_queries_and_histogram(self):
+        from .instrumentation import STAGE_DURATION, finish_request, stage, start_request
+
+        timings, token = start_request()
+        try:
+            with stage('lookup'):
+                list(User.objects.all())
+                list(Resume.objects.only('id'))
+        finally:
+            finish_request(token)
+        self.assertEqual(timings.stages['lookup'][1:], [1, 2])
+        self.assertEqual(STAGE_DURATION.snapshot('lookup')[2], 1)
+
+    def test_async_stack_counts_queries_run_in_threads(self):
+        import asyncio
+        from asgiref.sync import iscoroutinefunction, sync_to_async
+        from django.contrib.auth.models import Permission
+        from django.db import connections
+        from django.http import HttpResponse
+        from django.test import RequestFactory
+        from .middleware import InstrumentationMiddleware
+
+        def query():
+            try:
+                return Permission.objects.count()
+            finally:
+                connections.close_all()
+
+        async def view(request):
+            await sync_to_async(query, thread_sensitive=False)()
+            return HttpResponse('ok')
+
+        middleware = InstrumentationMiddleware(view)
+        self.assertTrue(iscoroutinefunction(middleware))
+        response = asyncio.run(middleware(RequestFactory().get('/ping/')))
+        self.assertIn('desc="1 queries"', self.server_timing(response)['db'])
+
+    def test_metrics_endpoint(self):
+        self.client.get('/api/dashboard/stats/')
+        self.assertEqual(self.client.get('/api/metrics/').status_code, 403)
+
+        with self.settings(METRICS_TOKEN='scrape-me'):
+            response = APIClient().get('/api/metrics/', HTTP_AUTHORIZATION='Bearer scrape-me')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['Content-Type'].startswith('text/plain; version=0.0.4'))
+        body = response.content.decode()
+        self.assertIn('# TYPE http_request_duration_seconds histogram', body)
+        self.assertIn('http_request_duration_seconds_count{method="GET",view="dashboard-stats",status="200"} 1', body)
+        self.assertIn('http_request_db_queries_bucket{method="GET",view="dashboard-stats",le="+Inf"} 1', body)
+
+    def test_request_is_logged_as_json(self):
+        import json
+
+        with self.assertLogs('analysis.requests', level='INFO') as logs:
+            response = self.client.post('/api/analyze/', {'resume_id': self.resume.id, 'job_id': self.job.id},
+                                        format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(logs.records), 1)
+        line = json.loads(logs.records[0].getMessage())
+        self.assertEqual(
+            set(line), {'event', 'method', 'path', 'view', 'status', 'duration_ms', 'queries', 'db_ms', 'stages'},
+        )
+        self.assertEqual((line['event'], line['method'], line['path']), ('request', 'POST', '/api/analyze/'))
+        self.assertEqual((line['view'], line['status']), ('analyze_resume_job', 200))
+        self.assertGreater(line['queries'], 0)
+        self.assertEqual(line['stages']['db_fetch']['calls'], 1)
+
+    def test_request_log_skipped_when_level_is_off(self):
+        import logging
+
+        logger = logging.getLogger('analysis.requests')
+        previous = logger.level
+        logger.setLevel(logging.WARNING)
+        self.addCleanup(logger.setLevel, previous)
+        with mock.patch.object(logger, 'info') as info:
+            response = self.client.get('/api/dashboard/stats/')
+        self.assertEqual(response.status_code, 200)
+        info.assert_not_called()
+
+    def test_disabled_instrumentation_adds_no_header(self):
+        with self.settings(INSTRUMENTATION_ENABLED=False):
+            client = APIClient()
+            client.force_authenticate(self.user)
+            response = client.get('/api/dashboard/stats/')
+        self.assertNotIn('Server-Timing', response)
+
+
+class ProfilingTests(TestCase):
+    """On-demand request profiles, rotation and the admin listing"""
+
+    def setUp(self):
+        import shutil
+        import tempfile
+
+        self.profile_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.profile_dir, ignore_errors=True)
+        overrides = self.settings(PROFILE_DIR=self.profile_dir, PROFILE_SAMPLE_RATE=0)
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+
+        self.staff = User.objects.create_user(username='ops', password='test12345', is_staff=True)
+        self.user = User.objects.create_user(username='regular', password='test12345')
+
+    def get_stats(self, user, path='/api/dashboard/stats/', **extra):
+        # A real bearer token: the profiler decides before DRF authenticates
+        from rest_framework_simplejwt.tokens import RefreshToken
+
+        token = str(RefreshToken.for_user(user).access_token)
+        return APIClient().get(path, HTTP_AUTHORIZATION=f'Bearer {token}', **extra)
+
+    def prof_files(self):
+        import os
+        return sorted(name for name in os.listdir(self.profile_dir) if name.endswith('.prof'))
+
+    def test_staff_header_profiles_the_request(self):
+        import pstats
+        from .models import RequestProfile
+
+        response = self.get_stats(self.staff, HTTP_X_PROFILE='1')
+        self.assertEqual(response.status_code, 200)
+        profile = RequestProfile.objects.get(pk=response['X-Profile-Id'])
+        self.assertEqual((profile.view_name, profile.trigger, profile.user), ('dashboard-stats', 'requested', self.staff))
+        self.assertEqual(self.prof_files(), [profile.file_name])
+        self.assertTrue(pstats.Stats(profile.file_path).total_calls)
+
+    def test_query_flag(self):
+        self.assertIn('X-Profile-Id', self.get_stats(self.staff, path='/api/dashboard/stats/?profile=1'))
+
+    def test_non_staff_and_other_views_are_not_profiled(self):
+        self.assertNotIn('X-Profile-Id', self.get_stats(self.user, HTTP_X_PROFILE='1'))
+        self.assertNotIn('X-Profile-Id', self.get_stats(self.staff, path='/api/auth/profile/', HTTP_X_PROFILE='1'))
+        self.assertEqual(self.prof_files(), [])
+
+    def test_sampling_and_rotation(self):
+        import os
+        import time
+        from .models import RequestProfile
+
+        with self.settings(PROFILE_SAMPLE_RATE=1.0, PROFILE_MAX_FILES=2):
+            for _ in range(3):
+                self.get_stats(self.user)
+                # Rotation orders by mtime; keep the files distinguishable
+                for i, name in enumerate(reversed(self.prof_files())):
+                    os.utime(os.path.join(self.profile_dir, name), (time.time() - 10 * (i + 1),) * 2)
+        self.assertEqual(len(self.prof_files()), 2)
+        self.assertEqual(sorted(RequestProfile.objects.values_list('file_name', flat=True)), self.prof_files())
+        self.assertEqual(set(RequestProfile.objects.values_list('trigger', flat=True)), {'sampled'})
+
+        with self.settings(PROFILE_SAMPLE_RATE=1.0, PROFILE_MAX_BYTES=1):
+            self.get_stats(self.user)
+        self.assertEqual(self.prof_files(), [])
+        self.assertFalse(RequestProfile.objects.exists())
+
+    def test_async_stack_profiles_around_the_handler(self):
+        import asyncio
+        from asgiref.sync import iscoroutinefunction
+        from django.http import HttpResponse
+        from django.test import RequestFactory
+        from . import profiling
+
+        async def handler(request):
+            return HttpResponse('ok', status=201)
+
+        middleware = profiling.ProfilingMiddleware(handler)
+        self.assertTrue(iscoroutinefunction(middleware))
+        request = RequestFactory().get('/api/dashboard/stats/', HTTP_X_PROFILE='1')
+        request.user = self.staff
+        # Saving writes to the database from a worker thread; SQLite would block it here
+        with mock.patch.object(profiling, 'save_profile', return_value=mock.Mock(pk=7)) as save:
+            response = asyncio.run(middleware(request))
+        self.assertEqual(response['X-Profile-Id'], '7')
+        self.assertEqual(save.call_args.args[2:5], ('dashboard-stats', 'requested', 201))
+
+        request = RequestFactory().get('/api/dashboard/stats/')
+        request.user = self.staff
+        with mock.patch.object(profiling, 'save_profile') as save:
+            response = asyncio.run(middleware(request))
+        save.assert_not_called()
+        self.assertNotIn('X-Profile-Id', response)
+
+    def test_admin_lists_and_downloads_profiles(self):
+        from .models import RequestProfile
+
+        profile_id = self.get_stats(self.staff, HTTP_X_PROFILE='1')['X-Profile-Id']
+        admin = User.objects.create_superuser(username='root', password='test12345')
+        self.client.force_login(admin)
+        listing = self.client.get('/admin/analysis/requestprofile/')
+        self.assertContains(listing, '/api/dashboard/stats/')
+        detail = self.client.get(f'/admin/analysis/requestprofile/{profile_id}/change/')
+        self.assertContains(detail, 'cumulative')
+        download = self.client.get(f'/admin/analysis/requestprofile/{profile_id}/download/')
+        self.assertEqual(download.status_code, 200)
+        self.assertTrue(b''.join(download.streaming_content))
+        self.assertEqual(RequestProfile.objects.count(), 1)
@@ -0,0 +1,218 @@
+import pdfplumber
+from docx import Document
+from django.conf import settings
+from contextlib import contextmanager
+import io
+import math
+import multiprocessing
+import os
+import signal
+import threading
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class PageTimeout(Exception):
+    """A single PDF page took longer than PDF_PAGE_TIMEOUT to extract"""
+
+
+@contextmanager
+def _time_limit(seconds):
+    """
+    Raise PageTimeout if the block runs longer than seconds
+
+    Uses SIGALRM, so the limit only applies on Unix in the main thread of a
+    process (gunicorn sync workers and the extraction pool both qualify);
+    elsewhere the block runs unbounded.
+    """
+    if (not seconds or not hasattr(signal, "setitimer")
+            or threading.current_thread() is not threading.main_thread()):
+        yield
+        return
+
+    def _raise_timeout(signum, frame):
+        raise PageTimeout()
+
+    previous = signal.signal(signal.SIGALRM, _raise_timeout)
+    signal.setitimer(signal.ITIMER_REAL, seconds)
+    try:
+        yield
+    finally:
+        signal.setitimer(signal.ITIMER_REAL, 0)
+        signal.signal(signal.SIGALRM, previous)
+
+
+def _open_source(source):
+    """Accept either raw bytes or a filesystem path as a document source"""
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        return io.BytesIO(source)
+    return source
+
+
+def _extract_page_range(source, filename, start, end, page_timeout, deadline=None):
+    """
+    Extract pages [start, end) of a PDF in order; also runs inside pool workers
+
+    deadline is a time.monotonic() value (system-wide, so it holds in pool
+    workers too); pages left when it passes are skipped and no page may run
+    past it.
+    """
+    extracted_pages = []
+    with pdfplumber.open(_open_source(source)) as pdf:
+        for i in range(start, end):
+            limit = page_timeout
+            if deadline is not None:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    logger.warning(f"⚠️ {filename} ran out of its extraction time; pages {i+1}-{end} were skipped.")
+                    break
+                limit = min(limit, remaining) if limit else remaining
+            try:
+                with _time_limit(limit):
+                    page_text = pdf.pages[i].extract_text()
+            except PageTimeout:
+                logger.warning(f"⚠️ Page {i+1} of {filename} exceeded {limit:.1f}s and was skipped.")
+                continue
+            if page_text:
+                extracted_pages.append(page_text)
+            else:
+                logger.warning(f"⚠️ No text found on page {i+1} of {filename}.")
+    return extracted_pages
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+# Slack on top of the page timeouts before a stuck pool worker is given up on
+POOL_GRACE_SECONDS = 5
+
+
+def _get_pool(workers):
+    """
+    Process pool shared by all requests in this worker, created on first use
+
+    A multiprocessing.Pool rather than a ProcessPoolExecutor: its terminate()
+    kills workers stuck in a task, which the executor has no public way to do.
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = multiprocessing.Pool(processes=workers)
+        return _pool
+
+
+def _reset_pool(terminate=False):
+    """
+    Drop the shared pool; the next extraction starts a fresh one
+
+    close() lets running tasks finish, so a worker stuck in one would keep
+    its CPU; terminate=True kills the workers instead.
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            if terminate:
+                _pool.terminate()
+            else:
+                _pool.close()
+        _pool = None
+
+
+def _extract_pages_parallel(source, filename, page_count, workers, page_timeout, deadline=None):
+    """Split the pages into contiguous ranges, extract them in the pool and rejoin in order"""
+    chunk_size = math.ceil(page_count / workers)
+    ranges = [(start, min(start + chunk_size, page_count)) for start in range(0, page_count, chunk_size)]
+
+    pool = _get_pool(workers)
+    results = [
+        pool.apply_async(_extract_page_range, (source, filename, start, end, page_timeout, deadline))
+        for start, end in ranges
+    ]
+
+    # Ranges run side by side, so all of them are due by the time the longest
+    # one could take with every page hitting its limit, and never later than
+    # the document's deadline; each page is already capped inside the worker,
+    # this is a backstop for a worker that hangs or dies outside page extraction
+    wait_until = deadline
+    if page_timeout:
+        page_bound = time.monotonic() + page_timeout * chunk_size + POOL_GRACE_SECONDS
+        wait_until = page_bound if wait_until is None else min(wait_until, page_bound)
+    extracted_pages = []
+    timed_out = False
+    for (start, end), result in zip(ranges, results):
+        remaining = None if wait_until is None else max(0, wait_until - time.monotonic())
+        try:
+            extracted_pages.extend(result.get(timeout=remaining))
+        except multiprocessing.TimeoutError:
+            timed_out = True
+            logger.warning(f"⚠️ Pages {start+1}-{end} of {filename} timed out and were skipped.")
+    if timed_out:
+        # A running task can't be cancelled; kill the stuck workers instead
+        _reset_pool(terminate=True)
+    return extracted_pages
+
+
+def extract_pdf_text(source, filename):
+    """
+    Extract text from a PDF, honouring PDF_MAX_PAGES and PDF_PAGE_TIMEOUT
+
+    source is the PDF bytes or a path; with a path, pool workers open the
+    file themselves instead of receiving a copy of the bytes.
+
+    Documents with at least PDF_PARALLEL_MIN_PAGES pages are split across
+    PDF_EXTRACTION_WORKERS processes (pdfminer is pure Python and CPU-bound);
+    smaller ones are extracted in-process. Either way the whole document gets
+    PDF_EXTRACTION_BUDGET seconds, which stays below the gunicorn worker
+    timeout; pages not reached by then are skipped.
+    """
+    max_pages = settings.PDF_MAX_PAGES
+    page_timeout = settings.PDF_PAGE_TIMEOUT
+    workers = settings.PDF_EXTRACTION_WORKERS
+    budget = settings.PDF_EXTRACTION_BUDGET
+    deadline = time.monotonic() + budget if budget else None
+
+    with pdfplumber.open(_open_source(source)) as pdf:
+        page_count = len(pdf.pages)
+
+    if max_pages and page_count > max_pages:
+        logger.warning(f"⚠️ {filename} has {page_count} pages; only the first {max_pages} are extracted.")
+        page_count = max_pages
+
+    if workers > 1 and page_count >= settings.PDF_PARALLEL_MIN_PAGES:
+        return "\n".join(_extract_pages_parallel(source, filename, page_count, workers, page_timeout, deadline))
+
+    return "\n".join(_extract_page_range(source, filename, 0, page_count, page_timeout, deadline))
+
+
+def extract_text(source, filename):
+    """Extract text from file bytes or a file path (handles scanned PDFs safely)."""
+
+    ext = os.path.splitext(filename)[1].lower()
+    text = ""
+
+    try:
+        if ext == '.pdf':
+            text = extract_pdf_text(source, filename)
+
+        elif ext == '.docx':
+            doc = Document(_open_source(source))
+            text = "\n".join(p.text for p in doc.paragraphs if p.text.strip())
+
+        elif ext == '.txt':
+            if not isinstance(source, (bytes, bytearray, memoryview)):
+                with open(source, 'rb') as f:
+                    source = f.read()
+            text = bytes(source).decode('utf-8', errors='ignore')
+
+    except Exception as e:
+        logger.error(f"Error extracting text from {filename}: {e}", exc_info=True)
+        text = ""
+
+    # Final check: handle empty result gracefully
+    if not text.strip():
+        logger.warning(f"⚠️ No extractable text found in file: {filename}")
+        text = ""
+
+    return text
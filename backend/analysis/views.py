@@ -11,6 +11,8 @@ from django.contrib.auth import authenticate, login, logout
 from django.utils import timezone
 from django.core.mail import send_mail
 from django.conf import settings
+from django.db.models import Avg, Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
 from datetime import timedelta
 import secrets
 import os
@@ -25,7 +27,7 @@ from .serializers import (
 
 
 
-from django.http import JsonResponse
+from django.http import HttpResponse, JsonResponse
 
 @api_view(['GET'])
 @permission_classes([AllowAny])
@@ -49,6 +51,10 @@ def home(request):
             'jobs': '/api/jobs/',
             'dashboard': '/api/dashboard/stats/',
             'analyze': '/api/analyze/',
+            'analyze_batch': '/api/analyze/batch/',
+            'analyze_async': '/api/analyze/async/',
+            'cache_stats': '/api/cache/stats/',
+            'metrics': '/api/metrics/',
             'token': {
                 'obtain': '/api/token/',
                 'refresh': '/api/token/refresh/',
@@ -157,6 +163,30 @@ def api_root(request):
                 'auth_required': True,
                 'description': 'Analyze resume against job description'
             },
+            'analyze_batch': {
+                'url': f'{base_url}/api/analyze/batch/',
+                'method': 'POST',
+                'auth_required': True,
+                'description': 'Rank one resume against many jobs, or one job against many resumes'
+            },
+            'analyze_async': {
+                'url': f'{base_url}/api/analyze/async/',
+                'method': 'POST',
+                'auth_required': True,
+                'description': 'Analyze resume against job description (async, for ASGI servers)'
+            },
+            'cache_stats': {
+                'url': f'{base_url}/api/cache/stats/',
+                'method': 'GET',
+                'auth_required': True,
+                'description': 'Result cache hit/miss counters (staff only)'
+            },
+            'metrics': {
+                'url': f'{base_url}/api/metrics/',
+                'method': 'GET',
+                'auth_required': True,
+                'description': 'Request, SQL query and stage timing histograms in Prometheus text format (staff or METRICS_TOKEN)'
+            },
             'token': {
                 'obtain': {
                     'url': f'{base_url}/api/token/',
@@ -345,105 +375,56 @@ class UserProfileView(generics.RetrieveUpdateAPIView):
         return profile
 
 
+def _per_user(queryset, **aggregates):
+    """Correlated subquery computing one aggregate over queryset rows of the outer user"""
+    (name, aggregate), = aggregates.items()
+    return Subquery(
+        queryset.filter(user=OuterRef('pk')).order_by().values('user')
+        .annotate(**{name: aggregate}).values(name)[:1]
+    )
+
+
 class DashboardStatsView(APIView):
     permission_classes = [permissions.IsAuthenticated]
 
     def get(self, request):
         from django.utils import timezone
-        from datetime import timedelta
-        import json
+        import logging
+        logger = logging.getLogger(__name__)
         
         user = request.user
-        
-        # Calculate stats
-        total_resumes = Resume.objects.filter(user=user).count()
-        total_jobs = JobDescription.objects.filter(user=user).count()
-        total_analyses = AnalysisResult.objects.filter(user=user).count()
-        
-        # Calculate match accuracy from analysis results
+        analyses = AnalysisResult.objects.all()
+
+        # All counts and averages in a single query
+        stats_row = User.objects.filter(pk=user.pk).annotate(
+            total_resumes=Coalesce(_per_user(Resume.objects.all(), n=Count('id')), 0),
+            total_jobs=Coalesce(_per_user(JobDescription.objects.all(), n=Count('id')), 0),
+            total_analyses=Coalesce(_per_user(analyses, n=Count('id')), 0),
+            avg_match=_per_user(analyses, avg=Avg('match_percent')),
+            avg_duration_ms=_per_user(analyses, avg=Avg('duration_ms')),
+        ).values('total_resumes', 'total_jobs', 'total_analyses', 'avg_match', 'avg_duration_ms').get()
+
+        total_resumes = stats_row['total_resumes']
+        total_jobs = stats_row['total_jobs']
+        total_analyses = stats_row['total_analyses']
+
         match_accuracy = 0.0
-        if total_analyses > 0:
-            import logging
-            logger = logging.getLogger(__name__)
-            analyses = AnalysisResult.objects.filter(user=user)
-            total_match_score = 0
-            count_with_score = 0
-            
-            for analysis in analyses:
-                result_data = analysis.result_data
-                if isinstance(result_data, dict):
-                    # Try to extract match score from different possible keys
-                    # Note: analyze_gap returns 'match_percent' (not 'match_percentage')
-                    match_score = (
-                        result_data.get('match_percent') or  # Primary key from analyze_gap
-                        result_data.get('match_percentage') or
-                        result_data.get('match_score') or
-                        result_data.get('overall_match') or
-                        result_data.get('match_accuracy') or
-                        result_data.get('score')
-                    )
-                    if match_score is not None:
-                        try:
-                            score = float(match_score)
-                            if 0 <= score <= 100:
-                                total_match_score += score
-                                count_with_score += 1
-                        except (ValueError, TypeError):
-                            logger.warning(f"Invalid match score format: {match_score}")
-                            pass
-                    else:
-                        # Log if no match score found
-                        logger.debug(f"No match score found in analysis {analysis.id}. Keys: {list(result_data.keys())}")
-            
-            if count_with_score > 0:
-                match_accuracy = round(total_match_score / count_with_score, 1)
-                logger.info(f"Calculated match accuracy: {match_accuracy}% from {count_with_score} analyses")
-            else:
-                # Default to 0 if no scores found
-                match_accuracy = 0.0
-                logger.warning(f"No match scores found in {total_analyses} analyses")
-        
-        # Calculate average analysis time
-        # Since analysis is done synchronously, we can't measure actual processing time
-        # Instead, we'll use a reasonable estimate or calculate from a different metric
+        if stats_row['avg_match'] is not None:
+            match_accuracy = round(stats_row['avg_match'], 1)
+            logger.info(f"Calculated match accuracy: {match_accuracy}% from {total_analyses} analyses")
+        elif total_analyses > 0:
+            logger.warning(f"No match scores found in {total_analyses} analyses")
+
+        # Measured wall-clock time of analyze_resume_job, in seconds
         avg_analysis_time = 0.0
-        if total_analyses > 0:
-            # For now, estimate based on analysis complexity
-            # You could also store actual processing time when analysis is performed
-            analyses = AnalysisResult.objects.filter(user=user)
-            total_time_seconds = 0
-            count_with_time = 0
-            
-            for analysis in analyses:
-                # Calculate time difference between created_at and updated_at
-                # This might be very small if analysis is fast, so we use a minimum
-                if analysis.created_at and analysis.updated_at:
-                    time_diff = (analysis.updated_at - analysis.created_at).total_seconds()
-                    # If time difference is too small (less than 0.1s), use estimated time
-                    # based on result_data complexity
-                    if time_diff < 0.1:
-                        result_data = analysis.result_data
-                        if isinstance(result_data, dict):
-                            # Estimate: 1-3 seconds based on data complexity
-                            skills_count = len(result_data.get('resume_skills', [])) + len(result_data.get('job_skills', []))
-                            estimated_time = min(3.0, max(1.0, skills_count * 0.1))
-                            total_time_seconds += estimated_time
-                            count_with_time += 1
-                    else:
-                        total_time_seconds += time_diff
-                        count_with_time += 1
-            
-            if count_with_time > 0:
-                avg_analysis_time = round(total_time_seconds / count_with_time, 1)
-            else:
-                # Default estimate if no time data
-                avg_analysis_time = 2.0
+        if stats_row['avg_duration_ms'] is not None:
+            avg_analysis_time = round(stats_row['avg_duration_ms'] / 1000, 2)
         
         # Recent activities
         recent_activities = []
         
         # Recent resumes (ordered by most recent)
-        recent_resumes = Resume.objects.filter(user=user).order_by('-uploaded_at')[:5]
+        recent_resumes = Resume.objects.summary().filter(user=user).order_by('-uploaded_at')[:5]
         for resume in recent_resumes:
             file_name = resume.file_name or 'Untitled Resume'
             recent_activities.append({
@@ -455,7 +436,7 @@ class DashboardStatsView(APIView):
             })
         
         # Recent jobs (ordered by most recent)
-        recent_jobs = JobDescription.objects.filter(user=user).order_by('-uploaded_at')[:5]
+        recent_jobs = JobDescription.objects.summary().filter(user=user).order_by('-uploaded_at')[:5]
         for job in recent_jobs:
             recent_activities.append({
                 'type': 'job',
@@ -466,7 +447,13 @@ class DashboardStatsView(APIView):
             })
         
         # Recent analyses (ordered by most recent)
-        recent_analyses = AnalysisResult.objects.filter(user=user).order_by('-created_at')[:5]
+        recent_analyses = (
+            AnalysisResult.objects.summary()
+            .filter(user=user)
+            .select_related('resume', 'job')
+            .defer('resume__file', 'resume__parsed_text', 'job__description', 'job__requirements')
+            .order_by('-created_at')[:5]
+        )
         for analysis in recent_analyses:
             analysis_title = f"{analysis.analysis_type.replace('_', ' ').title()}"
             if analysis.resume:
@@ -504,10 +491,12 @@ from rest_framework import viewsets, permissions, status
 from rest_framework.parsers import MultiPartParser, FormParser
 from rest_framework.response import Response
 from .models import Resume
-from .serializers import ResumeSerializer
-import pdfplumber
-from docx import Document
-import io
+from .serializers import ResumeSerializer, ResumeSummarySerializer
+from .nlp_module.skill_extractor import extract_skill_ids, skill_names, TAXONOMY_VERSION
+from .text_extraction import extract_text
+from .tasks import enqueue_resume_processing
+from .storage import get_blob_store, release_blob
+from django.db import transaction
 import os
 import logging
 
@@ -519,85 +508,107 @@ class ResumeViewSet(viewsets.ModelViewSet):
     parser_classes = [MultiPartParser, FormParser]
 
     def get_queryset(self):
-        return Resume.objects.filter(user=self.request.user).order_by('-uploaded_at')[:1]
-
-    def extract_text(self, file_bytes, filename):
-        """Extract text from in-memory file bytes (handles scanned PDFs safely)."""
-
-        logger = logging.getLogger(__name__)
-        ext = os.path.splitext(filename)[1].lower()
-        text = ""
-
-        try:
-            if ext == '.pdf':
-                with pdfplumber.open(io.BytesIO(file_bytes)) as pdf:
-                    extracted_pages = []
-                    for i, page in enumerate(pdf.pages):
-                        page_text = page.extract_text()
-                        if page_text:
-                            extracted_pages.append(page_text)
-                        else:
-                            logger.warning(f"⚠️ No text found on page {i+1} of {filename}.")
-                    text = "\n".join(extracted_pages)
-
-            elif ext == '.docx':
-                doc = Document(io.BytesIO(file_bytes))
-                text = "\n".join(p.text for p in doc.paragraphs if p.text.strip())
-
-            elif ext == '.txt':
-                text = file_bytes.decode('utf-8', errors='ignore')
-
-        except Exception as e:
-            logger.error(f"Error extracting text from {filename}: {e}", exc_info=True)
-            text = ""
-
-        # Final check: handle empty result gracefully
-        if not text.strip():
-            logger.warning(f"⚠️ No extractable text found in file: {filename}")
-            text = ""
-
-        return text
+        queryset = Resume.objects.filter(user=self.request.user).order_by('-uploaded_at')
+        if self.action == 'list':
+            return queryset.summary()[:1]
+        if self.action == 'processing_status':
+            return queryset.summary()
+        return queryset.with_text()
+
+    def get_serializer_class(self):
+        if self.action == 'list':
+            return ResumeSummarySerializer
+        return ResumeSerializer
+
+    def extract_text(self, source, filename):
+        """Extract text from file bytes or a stored file path (handles scanned PDFs safely)."""
+        return extract_text(source, filename)
 
     def perform_create(self, serializer):
         file = self.request.FILES.get('file')
-        extracted_text = ""
         file_name = "unknown"
         file_type = None
         file_size = None
-        file_data = None
+        file_sha256 = None
 
         if file:
             file_name = file.name
             file_type = file.content_type.split(';')[0].strip()[:255]
-            file_size = file.size
-            file_data = file.read()  # ✅ Read full binary data into memory (for DB blob)
+            # Stream the upload into the content-addressed blob store chunk by chunk
+            file_sha256, file_size = get_blob_store().save(file.chunks())
+
+        if settings.RESUME_ASYNC_PROCESSING and file_sha256:
+            # Store the upload and let `manage.py process_tasks` extract text and skills
+            resume = serializer.save(
+                user=self.request.user,
+                parsed_text="",
+                file_size=file_size,
+                file_type=file_type,
+                file_sha256=file_sha256,
+                file_name=file_name,
+                processing_status='pending',
+            )
+            enqueue_resume_processing(resume)
+            return
 
-            # Extract text directly from in-memory bytes
-            extracted_text = self.extract_text(file_data, file_name)
+        extracted_text = ""
+        if file_sha256:
+            store = get_blob_store()
+            source = store.local_path(file_sha256) or store.read(file_sha256)
+            extracted_text = self.extract_text(source, file_name)
 
         if extracted_text:
             logger.info(f"Successfully extracted {len(extracted_text)} characters from {file_name}")
         else:
             logger.warning(f"No text extracted from {file_name}")
 
-        # Save everything, storing binary file content in DB
+        # Extract skills once at upload so analyses only compare stored lists
+        skills = extract_skill_ids(extracted_text)
+
         serializer.save(
             user=self.request.user,
             parsed_text=extracted_text,
             file_size=file_size,
             file_type=file_type,
-            file=file_data,
-            file_name=file_name, # ✅ store as blob (not FileField)
+            file_sha256=file_sha256,
+            file_name=file_name,
+            skills=skills,
+            skills_version=TAXONOMY_VERSION,
+            is_processed=True,
+            processing_status='completed' if extracted_text else 'failed',
         )
 
+    def perform_destroy(self, instance):
+        file_sha256 = instance.file_sha256
+        instance.delete()
+        # Blobs are shared between identical uploads; drop it once nothing
+        # points at it. Anything a concurrent upload may still claim is left to
+        # the worker's garbage collection.
+        if file_sha256:
+            transaction.on_commit(lambda: release_blob(file_sha256))
+
+    @action(detail=True, methods=['get'], url_path='status')
+    def processing_status(self, request, pk=None):
+        """Poll text/skill extraction progress for an uploaded resume"""
+        resume = self.get_object()
+        return Response({
+            "id": resume.id,
+            "processing_status": resume.processing_status,
+            "is_processed": resume.is_processed,
+            "skills": skill_names(resume.skills) if resume.processing_status == 'completed' else [],
+        })
+
     def create(self, request, *args, **kwargs):
         serializer = self.get_serializer(data=request.data)
         serializer.is_valid(raise_exception=True)
         self.perform_create(serializer)
         serializer = self.get_serializer(instance=serializer.instance)
         headers = self.get_success_headers(serializer.data)
+        message = "Resume uploaded successfully."
+        if serializer.instance.processing_status == 'pending':
+            message = "Resume uploaded successfully. Text extraction is in progress."
         return Response({
-            "message": "Resume uploaded successfully.",
+            "message": message,
             "id": serializer.data.get('id'),
             "data": serializer.data
         }, status=status.HTTP_201_CREATED, headers=headers)
@@ -614,10 +625,19 @@ class JobDescriptionViewSet(viewsets.ModelViewSet):
         return JobDescription.objects.filter(user=self.request.user)
 
     def perform_create(self, serializer):
-        job = serializer.save(user=self.request.user)
-        job_text = job.description or ""
+        job_text = serializer.validated_data.get('description') or ""
+        # Extract skills once here; every analysis against this job reuses them
+        serializer.save(
+            user=self.request.user,
+            skills=extract_skill_ids(job_text),
+            skills_version=TAXONOMY_VERSION,
+        )
         self.job_text = job_text
 
+    def perform_update(self, serializer):
+        job = serializer.save()
+        job.update_skills()
+
     def create(self, request, *args, **kwargs):
         from rest_framework import status
         
@@ -643,7 +663,10 @@ class JobDescriptionViewSet(viewsets.ModelViewSet):
 
 #it is for analysis of skills
 
-from .nlp_module.job_resume_analyzer import analyze_gap
+from .nlp_module.job_resume_analyzer import analyze_gap, build_gap_result
+from .nlp_module.section_analyzer import analyze_resume_section
+from .instrumentation import render_metrics, stage
+import time
 
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
@@ -659,8 +682,9 @@ def analyze_resume_job(request):
             )
 
         try:
-            resume = Resume.objects.get(id=resume_id, user=request.user)
-            job = JobDescription.objects.get(id=job_id, user=request.user)
+            with stage("db_fetch"):
+                resume = Resume.objects.with_text().get(id=resume_id, user=request.user)
+                job = JobDescription.objects.get(id=job_id, user=request.user)
         except Resume.DoesNotExist:
             return Response(
                 {"error": "Resume not found or you don't have permission to access it."},
@@ -672,6 +696,12 @@ def analyze_resume_job(request):
                 status=status.HTTP_404_NOT_FOUND
             )
 
+        if resume.processing_status in ('pending', 'processing') and not resume.parsed_text:
+            return Response(
+                {"error": "Resume is still being processed. Please try again shortly."},
+                status=status.HTTP_409_CONFLICT
+            )
+
         resume_text = getattr(resume, "parsed_text", "") or ""
         job_text = getattr(job, "description", "") or ""
 
@@ -681,7 +711,15 @@ def analyze_resume_job(request):
                 status=status.HTTP_400_BAD_REQUEST
             )
 
-        result = analyze_gap(resume_text, job_text)
+        started = time.perf_counter()
+        # Stored skills are only re-extracted when the taxonomy has changed
+        with stage("resume_skills"):
+            resume_skills = resume.get_skills()
+        with stage("job_skills"):
+            job_skills = job.get_skills()
+        with stage("analyze_gap"):
+            result = analyze_gap(resume_text, job_text, resume_skills=resume_skills, job_skills=job_skills)
+        duration_ms = round((time.perf_counter() - started) * 1000)
 
         if not result:
             return Response(
@@ -691,13 +729,16 @@ def analyze_resume_job(request):
 
         # Save analysis result to database
         try:
-            AnalysisResult.objects.create(
-                user=request.user,
-                resume=resume,
-                job=job,
-                analysis_type='gap_analysis',
-                result_data=result
-            )
+            with stage("db_insert"):
+                AnalysisResult.objects.create(
+                    user=request.user,
+                    resume=resume,
+                    job=job,
+                    analysis_type='gap_analysis',
+                    result_data=result,
+                    match_percent=result.get('match_percent'),
+                    duration_ms=duration_ms,
+                )
         except Exception as e:
             import logging
             logger = logging.getLogger(__name__)
@@ -721,6 +762,265 @@ def analyze_resume_job(request):
 
 
 
+from asgiref.sync import sync_to_async
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_GET, require_POST
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from .analysis_pool import run_analysis, PoolSaturated
+import asyncio
+import json
+
+
+async def _authenticate_jwt(request):
+    """User from the request's JWT bearer token, or None"""
+    try:
+        user_auth = await sync_to_async(JWTAuthentication().authenticate)(request)
+    except (InvalidToken, AuthenticationFailed):
+        return None
+    return user_auth[0] if user_auth else None
+
+
+@csrf_exempt
+@require_POST
+async def analyze_resume_job_async(request):
+    """
+    Async variant of analyze_resume_job for ASGI servers
+
+    Reads and writes use the async ORM and analyze_gap runs in the analysis
+    process pool, so the event loop keeps serving other requests meanwhile.
+    Answers 429 when ANALYSIS_POOL_MAX_PENDING analyses are already in flight.
+    Authentication is JWT only, like the rest of the API, so CSRF doesn't apply.
+    """
+    user = await _authenticate_jwt(request)
+    if user is None:
+        return JsonResponse(
+            {"detail": "Authentication credentials were not provided."},
+            status=status.HTTP_401_UNAUTHORIZED
+        )
+
+    try:
+        try:
+            data = json.loads(request.body or b"{}")
+        except ValueError:
+            return JsonResponse({"error": "Request body must be JSON."}, status=status.HTTP_400_BAD_REQUEST)
+
+        resume_id = data.get('resume_id')
+        job_id = data.get('job_id')
+
+        if not resume_id or not job_id:
+            return JsonResponse(
+                {"error": "resume_id and job_id are required."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        try:
+            resume = await Resume.objects.with_text().aget(id=resume_id, user=user)
+            job = await JobDescription.objects.aget(id=job_id, user=user)
+        except Resume.DoesNotExist:
+            return JsonResponse(
+                {"error": "Resume not found or you don't have permission to access it."},
+                status=status.HTTP_404_NOT_FOUND
+            )
+        except JobDescription.DoesNotExist:
+            return JsonResponse(
+                {"error": "Job description not found or you don't have permission to access it."},
+                status=status.HTTP_404_NOT_FOUND
+            )
+
+        if resume.processing_status in ('pending', 'processing') and not resume.parsed_text:
+            return JsonResponse(
+                {"error": "Resume is still being processed. Please try again shortly."},
+                status=status.HTTP_409_CONFLICT
+            )
+
+        resume_text = resume.parsed_text or ""
+        job_text = job.description or ""
+
+        if not resume_text.strip() or not job_text.strip():
+            return JsonResponse(
+                {"error": "Missing or empty text data in resume or job."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        # Stored skills are reused when current; stale ones are re-extracted
+        # inside the pool rather than on the event loop
+        try:
+            result, duration_ms = await run_analysis(
+                resume_text,
+                job_text,
+                resume_skills=resume.skills if resume.skills_version == TAXONOMY_VERSION else None,
+                job_skills=job.skills if job.skills_version == TAXONOMY_VERSION else None,
+            )
+        except PoolSaturated:
+            response = JsonResponse(
+                {"error": "The analysis service is busy. Please retry shortly."},
+                status=status.HTTP_429_TOO_MANY_REQUESTS
+            )
+            response['Retry-After'] = '1'
+            return response
+        except asyncio.TimeoutError:
+            return JsonResponse(
+                {"error": "Analysis timed out."},
+                status=status.HTTP_504_GATEWAY_TIMEOUT
+            )
+
+        if not result:
+            return JsonResponse(
+                {"error": "Analysis failed or returned no result."},
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR
+            )
+
+        try:
+            await AnalysisResult.objects.acreate(
+                user=user,
+                resume=resume,
+                job=job,
+                analysis_type='gap_analysis',
+                result_data=result,
+                match_percent=result.get('match_percent'),
+                duration_ms=duration_ms,
+            )
+        except Exception as e:
+            logger.error(f"Error saving analysis result: {e}", exc_info=True)
+            # Continue even if save fails
+
+        return JsonResponse(result, status=status.HTTP_200_OK)
+
+    except Exception as e:
+        logger.error(f"Error in analyze_resume_job_async: {e}", exc_info=True)
+        return JsonResponse(
+            {"error": f"Internal server error: {str(e)}"},
+            status=status.HTTP_500_INTERNAL_SERVER_ERROR
+        )
+
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def analyze_batch(request):
+    """
+    Rank one resume against many jobs, or one job against many resumes
+
+    Body: {"resume_id": 1, "job_ids": [...]} or {"job_id": 1, "resume_ids": [...]}.
+    Omitting the id list uses all of the user's jobs/resumes (newest first).
+    Requested ids that are not found, not the user's, or (for resumes) not
+    processed yet are listed under "missing" instead of being analyzed.
+    Stored skills are reused and only stale rows are re-extracted, in one
+    nlp.pipe batch; every pair is then a set comparison and all results are
+    written with a single bulk_create.
+    """
+    try:
+        resume_id = request.data.get('resume_id')
+        job_id = request.data.get('job_id')
+
+        if bool(resume_id) == bool(job_id):
+            return Response(
+                {"error": "Provide either resume_id (with optional job_ids) or job_id (with optional resume_ids)."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        max_items = settings.ANALYSIS_BATCH_MAX
+        started = time.perf_counter()
+
+        resumes = Resume.objects.with_text().filter(user=request.user, processing_status='completed')
+        jobs = JobDescription.objects.filter(user=request.user)
+
+        if resume_id:
+            mode = 'resume_vs_jobs'
+            requested = request.data.get('job_ids') or []
+            resumes = list(resumes.filter(id=resume_id))
+            if requested:
+                jobs = jobs.filter(id__in=requested)
+            jobs = list(jobs[:max_items + 1])
+            if not resumes:
+                return Response(
+                    {"error": "Resume not found, not processed yet, or you don't have permission to access it."},
+                    status=status.HTTP_404_NOT_FOUND
+                )
+            candidates = jobs
+        else:
+            mode = 'job_vs_resumes'
+            requested = request.data.get('resume_ids') or []
+            jobs = list(jobs.filter(id=job_id))
+            if requested:
+                resumes = resumes.filter(id__in=requested)
+            resumes = list(resumes[:max_items + 1])
+            if not jobs:
+                return Response(
+                    {"error": "Job description not found or you don't have permission to access it."},
+                    status=status.HTTP_404_NOT_FOUND
+                )
+            candidates = resumes
+
+        if len(candidates) > max_items:
+            return Response(
+                {"error": f"A batch can analyze at most {max_items} items."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        found = {str(candidate.id) for candidate in candidates}
+        missing = [item for item in requested if str(item) not in found]
+
+        # Tokenize only rows whose stored skills are missing or stale
+        Resume.ensure_skills(resumes)
+        JobDescription.ensure_skills(jobs)
+        overviews = {resume.id: analyze_resume_section(resume.parsed_text or "") for resume in resumes}
+
+        pairs = [(resume, job) for resume in resumes for job in jobs]
+        results = [
+            (resume, job, build_gap_result(resume.skills, job.skills, overviews[resume.id]))
+            for resume, job in pairs
+        ]
+
+        # The batch is measured as a whole; each row records its share
+        duration_ms = round((time.perf_counter() - started) * 1000 / max(len(results), 1))
+        try:
+            AnalysisResult.objects.bulk_create([
+                AnalysisResult(
+                    user=request.user,
+                    resume=resume,
+                    job=job,
+                    analysis_type='job_matching',
+                    result_data=result,
+                    match_percent=result['match_percent'],
+                    duration_ms=duration_ms,
+                )
+                for resume, job, result in results
+            ])
+        except Exception as e:
+            logger.error(f"Error saving batch analysis results: {e}", exc_info=True)
+            # Continue even if save fails
+
+        ranked = sorted(results, key=lambda item: item[2]['match_percent'], reverse=True)
+        return Response({
+            "mode": mode,
+            "count": len(ranked),
+            "missing": missing,
+            "results": [
+                {
+                    "rank": rank,
+                    "resume_id": resume.id,
+                    "resume_name": resume.file_name,
+                    "job_id": job.id,
+                    "job_title": job.title,
+                    **result,
+                }
+                for rank, (resume, job, result) in enumerate(ranked, start=1)
+            ]
+        }, status=status.HTTP_200_OK)
+
+    except Exception as e:
+        logger.error(f"Error in analyze_batch: {e}", exc_info=True)
+        return Response(
+            {"error": f"Internal server error: {str(e)}"},
+            status=status.HTTP_500_INTERNAL_SERVER_ERROR
+        )
+
+
+
+
+
+
 #Create a new Django view for Google login 
 import requests
 
@@ -835,20 +1135,70 @@ def google_callback(request):
 # resume generation views 
 import openai
 from .serializers import ResumeInputSerializer
+from .result_cache import get_result_cache, all_stats
+from . import llm_client
 
-openai.api_key= settings.OPENAI_API_KEY
-class GenerateResumeAPIView(APIView):
-    permission_classes = [IsAuthenticated]
-
-    def post(self, request):
-        serializer = ResumeInputSerializer(data=request.data)
-        if serializer.is_valid():
-            data = serializer.validated_data
-
-            projects = ", ".join(data.get('projects', []))
-            achievements = ", ".join(data.get('achievements', []))
 
-            prompt = f"""
+def _llm_error(e, action):
+    """(body, status, headers) for an OpenAI failure that survived retries, or None"""
+    if isinstance(e, llm_client.LLMBusy):
+        return (
+            {"error": "Too many requests to the AI service right now. Please retry shortly."},
+            status.HTTP_503_SERVICE_UNAVAILABLE,
+            {'Retry-After': '5'},
+        )
+    if isinstance(e, (openai.APITimeoutError, llm_client.LLMDeadlineExceeded)):
+        return (
+            {"error": f"The AI service timed out while trying to {action}."},
+            status.HTTP_504_GATEWAY_TIMEOUT,
+            {},
+        )
+    return None
+
+
+def _llm_error_response(e, action):
+    """Map an OpenAI failure that survived retries to a response"""
+    error = _llm_error(e, action)
+    if error is None:
+        return None
+    body, status_code, headers = error
+    return Response(body, status=status_code, headers=headers)
+
+
+def _llm_error_json(e, action):
+    """_llm_error_response() for the plain async views"""
+    error = _llm_error(e, action)
+    if error is None:
+        return None
+    body, status_code, headers = error
+    return JsonResponse(body, status=status_code, headers=headers)
+
+
+def _normalize_resume_input(data):
+    """
+    Canonical form of validated ResumeInputSerializer data
+
+    Whitespace is collapsed and empty values dropped, so requests that only
+    differ in spacing or blank optional fields share one cache entry.
+    """
+    normalized = {}
+    for field, value in data.items():
+        if isinstance(value, (list, tuple)):
+            value = [" ".join(str(item).split()) for item in value]
+            value = [item for item in value if item]
+        elif value is not None:
+            value = " ".join(str(value).split())
+        if value:
+            normalized[field] = value
+    return normalized
+
+
+def _resume_prompt(data):
+    """The resume rewrite prompt for normalized ResumeInputSerializer data"""
+    projects = ", ".join(data.get('projects', []))
+    achievements = ", ".join(data.get('achievements', []))
+
+    return f"""
             Rewrite the following resume details in a professional, ATS-friendly format:
             Name: {data.get('name', 'N/A')}
             Role: {data.get('role', 'N/A')}
@@ -867,80 +1217,252 @@ class GenerateResumeAPIView(APIView):
             6. Achievements (if available)
                         """
 
+
+class GenerateResumeAPIView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    model = "gpt-4.1-mini"
+    # Bump when the prompt in _resume_prompt changes so cached rewrites are not reused
+    prompt_version = "1"
+
+    @classmethod
+    def completion_options(cls, data):
+        """Arguments of the chat completion that rewrites data"""
+        return {
+            "model": cls.model,
+            "messages": [{"role": "user", "content": _resume_prompt(data)}],
+            "max_tokens": 1000,
+            "temperature": 0.4,
+        }
+
+    def post(self, request):
+        serializer = ResumeInputSerializer(data=request.data)
+        if serializer.is_valid():
+            data = _normalize_resume_input(serializer.validated_data)
+
+            # Identical input, model and prompt give the same rewrite; serve it
+            # from the shared cache instead of another LLM round trip
+            cache = get_result_cache("generate_resume")
+            cache_parts = (data, self.model)
+            formatted_resume = cache.get(cache_parts, self.prompt_version)
+            if formatted_resume is not None:
+                response = Response({"formatted_resume": formatted_resume}, status=200)
+                response['X-Cache'] = 'HIT'
+                return response
+
             try:
-                response = openai.chat.completions.create(
-                    model="gpt-4.1-mini",
-                    messages=[{"role": "user", "content": prompt}],
-                    max_tokens=1000,
-                    temperature=0.4
-                )
+                response = llm_client.chat_completion(**self.completion_options(data))
                 formatted_resume = response.choices[0].message.content.strip()
-                return Response({"formatted_resume": formatted_resume}, status=200)
             except Exception as e:
-                print("OpenAI API Error:", e)
+                logger.error(f"OpenAI API error: {e}", exc_info=True)
+                error_response = _llm_error_response(e, "generate the resume")
+                if error_response is not None:
+                    return error_response
                 return Response({"detail": "Failed to generate resume. Check server logs."}, status=500)
 
+            if formatted_resume:
+                try:
+                    cache.set(cache_parts, formatted_resume, self.prompt_version)
+                except Exception as e:
+                    logger.error(f"Error caching generated resume: {e}", exc_info=True)
+            response = Response({"formatted_resume": formatted_resume}, status=200)
+            response['X-Cache'] = 'MISS'
+            return response
+
         return Response(serializer.errors, status=400)
 
 
+@csrf_exempt
+@require_POST
+async def generate_resume_async(request):
+    """
+    Async variant of GenerateResumeAPIView for ASGI servers
+
+    The OpenAI call goes through the async client, so the worker keeps
+    serving other requests while it waits. JWT authentication only, like
+    analyze_resume_job_async.
+    """
+    user = await _authenticate_jwt(request)
+    if user is None:
+        return JsonResponse(
+            {"detail": "Authentication credentials were not provided."},
+            status=status.HTTP_401_UNAUTHORIZED
+        )
+    try:
+        payload = json.loads(request.body or b"{}")
+    except ValueError:
+        return JsonResponse({"error": "Request body must be JSON."}, status=status.HTTP_400_BAD_REQUEST)
+
+    serializer = ResumeInputSerializer(data=payload)
+    if not serializer.is_valid():
+        return JsonResponse(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+    data = _normalize_resume_input(serializer.validated_data)
+
+    # The result cache is synchronous (a database table by default)
+    cache = get_result_cache("generate_resume")
+    cache_parts = (data, GenerateResumeAPIView.model)
+    formatted_resume = await sync_to_async(cache.get)(cache_parts, GenerateResumeAPIView.prompt_version)
+    if formatted_resume is not None:
+        return JsonResponse({"formatted_resume": formatted_resume}, headers={'X-Cache': 'HIT'})
+
+    try:
+        response = await llm_client.achat_completion(**GenerateResumeAPIView.completion_options(data))
+        formatted_resume = response.choices[0].message.content.strip()
+    except Exception as e:
+        logger.error(f"OpenAI API error: {e}", exc_info=True)
+        error_response = _llm_error_json(e, "generate the resume")
+        if error_response is not None:
+            return error_response
+        return JsonResponse({"detail": "Failed to generate resume. Check server logs."}, status=500)
+
+    if formatted_resume:
+        try:
+            await sync_to_async(cache.set)(cache_parts, formatted_resume, GenerateResumeAPIView.prompt_version)
+        except Exception as e:
+            logger.error(f"Error caching generated resume: {e}", exc_info=True)
+    return JsonResponse({"formatted_resume": formatted_resume}, headers={'X-Cache': 'MISS'})
+
+
+class CacheStatsView(APIView):
+    """Hit/miss counters of the result caches in the answering worker process (staff only)"""
+    permission_classes = [permissions.IsAdminUser]
+
+    def get(self, request):
+        return Response({"pid": os.getpid(), "caches": all_stats()})
+
+
+@require_GET
+def metrics(request):
+    """
+    Request, query and stage histograms of this process in Prometheus format
+
+    Open to staff users (JWT) and to scrapers sending METRICS_TOKEN as a
+    bearer token; a plain view so the token isn't mistaken for a JWT.
+    """
+    header = request.META.get("HTTP_AUTHORIZATION", "")
+    allowed = bool(settings.METRICS_TOKEN) and secrets.compare_digest(header, f"Bearer {settings.METRICS_TOKEN}")
+    if not allowed:
+        try:
+            user_auth = JWTAuthentication().authenticate(request)
+        except (InvalidToken, AuthenticationFailed):
+            user_auth = None
+        allowed = bool(user_auth and user_auth[0].is_staff)
+    if not allowed:
+        return JsonResponse({"error": "Staff credentials or the metrics token are required."}, status=403)
+    return HttpResponse(render_metrics(), content_type="text/plain; version=0.0.4; charset=utf-8")
+
+
 
 
 
 # import wisper
-from openai import OpenAI
 import json
 import re
+from .speech import AudioSizeLimitHandler, AudioTooLarge, body_too_large, check_audio_limits, get_transcription_backend
 
-# Initialize OpenAI client with API key validation
-if not settings.OPENAI_API_KEY:
-    raise ValueError("OPENAI_API_KEY is not set in settings")
+# model_whisper=wisper.load_model("base")
 
-client = OpenAI(api_key=settings.OPENAI_API_KEY)
+SPEECH_MODEL = "gpt-4o-mini"
+
+
+def _speech_prompt(transcript):
+    """The communication-quality prompt for a transcript"""
+    return f"""
+            Analyze this speech text for communication quality:
+
+            "{transcript}"
+
+            Return a JSON object with the following structure:
+            {{
+                "clarity": <score out of 10>,
+                "confidence": <score out of 10>,
+                "fluency": <score out of 10>,
+                "feedback": "<short improvement feedback>"
+            }}
+
+            Only return the JSON object, no additional text.
+            """
+
+
+def _speech_scores(analysis_text):
+    """Scores from the model's answer, falling back to a regex parse of plain text"""
+    try:
+        return json.loads(analysis_text)
+    except json.JSONDecodeError as json_error:
+        logger.warning(f"JSON decode error, using fallback parser: {json_error}")
+        return AnalyzeSpeech._parse_analysis_text(analysis_text)
+
+
+def _speech_result(transcript, analysis_data, timings):
+    return {
+        "transcript": transcript,
+        "clarity": analysis_data.get("clarity", 0),
+        "confidence": analysis_data.get("confidence", 0),
+        "fluency": analysis_data.get("fluency", 0),
+        "feedback": analysis_data.get("feedback", "Unable to analyze speech."),
+        "timings_ms": timings,
+    }
 
-# model_whisper=wisper.load_model("base")
 
 class AnalyzeSpeech(APIView):
     permission_classes = [IsAuthenticated]
     parser_classes = [MultiPartParser, FormParser]
 
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        # Installed before the body is parsed so an oversized upload is cut
+        # off while streaming in, not after it has been spooled to disk
+        self.upload_limit = AudioSizeLimitHandler(settings.SPEECH_MAX_BYTES, request)
+        request.upload_handlers.insert(0, self.upload_limit)
+
     def post(self, request):
+        timings = {}
+        started = time.perf_counter()
+        too_large = Response(
+            {"error": f"Audio file is larger than {settings.SPEECH_MAX_BYTES // (1024 * 1024)} MB."},
+            status=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE
+        )
         try:
+            # Refuse on the declared length before any of the body is read;
+            # the exact limit on the file bytes is applied while streaming
+            if body_too_large(int(request.META.get("CONTENT_LENGTH") or 0), settings.SPEECH_MAX_BYTES):
+                return too_large
+
             audio_file = request.FILES.get("audio")
+            if self.upload_limit.exceeded:
+                return too_large
             if not audio_file:
                 return Response({"error": "No audio file uploaded"}, status=status.HTTP_400_BAD_REQUEST)
-            
-            # Ensure the file is at the beginning
-            audio_file.seek(0)
-            
-            # ✅ Speech → Text (using OpenAI Whisper cloud model)
+
+            try:
+                check_audio_limits(audio_file)
+            except AudioTooLarge as e:
+                return Response({"error": str(e)}, status=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE)
+            timings["upload"] = round((time.perf_counter() - started) * 1000)
+            # Both OpenAI calls below share one time budget
+            deadline = llm_client.Deadline()
+
+            # ✅ Speech → Text (backend from settings.SPEECH_TRANSCRIPTION_BACKEND)
+            stage_started = time.perf_counter()
             try:
-                # The Whisper API accepts the file directly
-                # Pass as tuple: (filename, file_object, content_type)
-                file_name = audio_file.name or "audio.webm"
-                file_content = audio_file.read()
-                content_type = audio_file.content_type or "audio/webm"
-                
-                # Reset file pointer after reading
-                audio_file.seek(0)
-                
-                # Create file tuple for OpenAI API
-                file_tuple = (file_name, file_content, content_type)
-                
-                transcript_response = client.audio.transcriptions.create(
-                    model="whisper-1",
-                    file=file_tuple
+                transcript = get_transcription_backend().transcribe(
+                    audio_file,
+                    audio_file.name or "audio.webm",
+                    audio_file.content_type or "audio/webm",
+                    deadline=deadline,
                 )
-                
-                # Extract transcript text
-                transcript = transcript_response.text
             except Exception as whisper_error:
                 import logging
                 logger = logging.getLogger(__name__)
                 logger.error(f"Whisper API error: {whisper_error}", exc_info=True)
+                error_response = _llm_error_response(whisper_error, "transcribe the audio")
+                if error_response is not None:
+                    return error_response
                 return Response(
                     {"error": f"Failed to transcribe audio: {str(whisper_error)}"},
                     status=status.HTTP_500_INTERNAL_SERVER_ERROR
                 )
+            timings["transcribe"] = round((time.perf_counter() - stage_started) * 1000)
 
             # Check if transcript is empty
             if not transcript or not transcript.strip():
@@ -950,26 +1472,12 @@ class AnalyzeSpeech(APIView):
                 )
 
             # Analyze speech using openai
-            prompt = f"""
-            Analyze this speech text for communication quality:
-
-            "{transcript}"
-
-            Return a JSON object with the following structure:
-            {{
-                "clarity": <score out of 10>,
-                "confidence": <score out of 10>,
-                "fluency": <score out of 10>,
-                "feedback": "<short improvement feedback>"
-            }}
-
-            Only return the JSON object, no additional text.
-            """
-
+            stage_started = time.perf_counter()
             try:
-                gpt_response = client.chat.completions.create(
-                    model="gpt-4o-mini",
-                    messages=[{"role": "user", "content": prompt}],
+                gpt_response = llm_client.chat_completion(
+                    deadline=deadline,
+                    model=SPEECH_MODEL,
+                    messages=[{"role": "user", "content": _speech_prompt(transcript)}],
                     response_format={"type": "json_object"}
                 )
                 analysis_text = gpt_response.choices[0].message.content
@@ -977,28 +1485,20 @@ class AnalyzeSpeech(APIView):
                 import logging
                 logger = logging.getLogger(__name__)
                 logger.error(f"GPT API error: {gpt_error}", exc_info=True)
+                error_response = _llm_error_response(gpt_error, "analyze the speech")
+                if error_response is not None:
+                    return error_response
                 return Response(
                     {"error": f"Failed to analyze speech: {str(gpt_error)}"},
                     status=status.HTTP_500_INTERNAL_SERVER_ERROR
                 )
             
             # Parse the JSON response
-            try:
-                analysis_data = json.loads(analysis_text)
-            except json.JSONDecodeError as json_error:
-                import logging
-                logger = logging.getLogger(__name__)
-                logger.warning(f"JSON decode error, using fallback parser: {json_error}")
-                # Fallback: try to extract scores from text if JSON parsing fails
-                analysis_data = self._parse_analysis_text(analysis_text)
+            analysis_data = _speech_scores(analysis_text)
+            timings["score"] = round((time.perf_counter() - stage_started) * 1000)
+            timings["total"] = round((time.perf_counter() - started) * 1000)
 
-            return Response({
-                "transcript": transcript,
-                "clarity": analysis_data.get("clarity", 0),
-                "confidence": analysis_data.get("confidence", 0),
-                "fluency": analysis_data.get("fluency", 0),
-                "feedback": analysis_data.get("feedback", "Unable to analyze speech.")
-            }, status=status.HTTP_200_OK)
+            return Response(_speech_result(transcript, analysis_data, timings), status=status.HTTP_200_OK)
 
         except Exception as e:
             import logging
@@ -1014,7 +1514,8 @@ class AnalyzeSpeech(APIView):
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
 
-    def _parse_analysis_text(self, text):
+    @staticmethod
+    def _parse_analysis_text(text):
         """Fallback method to extract scores from text if JSON parsing fails"""
         result = {
             "clarity": 0,
@@ -1036,3 +1537,93 @@ class AnalyzeSpeech(APIView):
             result["fluency"] = int(fluency_match.group(1))
         
         return result
+
+
+@csrf_exempt
+@require_POST
+async def analyze_speech_async(request):
+    """
+    Async variant of AnalyzeSpeech for ASGI servers
+
+    Transcription and scoring go through the async OpenAI client and share
+    one llm_client.Deadline, like the sync view. JWT authentication only.
+    """
+    user = await _authenticate_jwt(request)
+    if user is None:
+        return JsonResponse(
+            {"detail": "Authentication credentials were not provided."},
+            status=status.HTTP_401_UNAUTHORIZED
+        )
+
+    timings = {}
+    started = time.perf_counter()
+    too_large = JsonResponse(
+        {"error": f"Audio file is larger than {settings.SPEECH_MAX_BYTES // (1024 * 1024)} MB."},
+        status=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE
+    )
+    if body_too_large(int(request.META.get("CONTENT_LENGTH") or 0), settings.SPEECH_MAX_BYTES):
+        return too_large
+
+    upload_limit = AudioSizeLimitHandler(settings.SPEECH_MAX_BYTES, request)
+    request.upload_handlers.insert(0, upload_limit)
+    # Parsing may spool the upload to a temporary file; keep that off the loop
+    audio_file = await sync_to_async(request.FILES.get, thread_sensitive=False)("audio")
+    if upload_limit.exceeded:
+        return too_large
+    if not audio_file:
+        return JsonResponse({"error": "No audio file uploaded"}, status=status.HTTP_400_BAD_REQUEST)
+    try:
+        check_audio_limits(audio_file)
+    except AudioTooLarge as e:
+        return JsonResponse({"error": str(e)}, status=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE)
+    timings["upload"] = round((time.perf_counter() - started) * 1000)
+    deadline = llm_client.Deadline()
+
+    stage_started = time.perf_counter()
+    try:
+        transcript = await get_transcription_backend().atranscribe(
+            audio_file,
+            audio_file.name or "audio.webm",
+            audio_file.content_type or "audio/webm",
+            deadline=deadline,
+        )
+    except Exception as whisper_error:
+        logger.error(f"Whisper API error: {whisper_error}", exc_info=True)
+        error_response = _llm_error_json(whisper_error, "transcribe the audio")
+        if error_response is not None:
+            return error_response
+        return JsonResponse(
+            {"error": f"Failed to transcribe audio: {str(whisper_error)}"},
+            status=status.HTTP_500_INTERNAL_SERVER_ERROR
+        )
+    timings["transcribe"] = round((time.perf_counter() - stage_started) * 1000)
+
+    if not transcript or not transcript.strip():
+        return JsonResponse(
+            {"error": "No speech detected in the audio file. Please ensure the audio contains speech."},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+
+    stage_started = time.perf_counter()
+    try:
+        gpt_response = await llm_client.achat_completion(
+            deadline=deadline,
+            model=SPEECH_MODEL,
+            messages=[{"role": "user", "content": _speech_prompt(transcript)}],
+            response_format={"type": "json_object"}
+        )
+        analysis_text = gpt_response.choices[0].message.content
+    except Exception as gpt_error:
+        logger.error(f"GPT API error: {gpt_error}", exc_info=True)
+        error_response = _llm_error_json(gpt_error, "analyze the speech")
+        if error_response is not None:
+            return error_response
+        return JsonResponse(
+            {"error": f"Failed to analyze speech: {str(gpt_error)}"},
+            status=status.HTTP_500_INTERNAL_SERVER_ERROR
+        )
+
+    analysis_data = _speech_scores(analysis_text)
+    timings["score"] = round((time.perf_counter() - stage_started) * 1000)
+    timings["total"] = round((time.perf_counter() - started) * 1000)
+    return JsonResponse(_speech_result(transcript, analysis_data, timings))
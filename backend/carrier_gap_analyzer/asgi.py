@@ -3,6 +3,11 @@ ASGI config for carrier_gap_analyzer project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
 
+Serve it with any ASGI server (e.g. ``uvicorn carrier_gap_analyzer.asgi:application``)
+to run /api/analyze/async/ natively on the event loop; its CPU work goes to the
+process pool in analysis/analysis_pool.py. /api/generate-resume/async/ and
+/api/speak-assessment/async/ wait for OpenAI on the loop as well.
+
 For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
 """
@@ -14,3 +19,12 @@ from django.core.asgi import get_asgi_application
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "carrier_gap_analyzer.settings")
 
 application = get_asgi_application()
+
+# Load spaCy and the skill matchers before serving instead of on the first
+# analysis request (settings.NLP_WARMUP)
+from django.conf import settings  # noqa: E402
+
+if settings.NLP_WARMUP:
+    from analysis.nlp_module.nlp_setup import warm_up
+
+    warm_up()
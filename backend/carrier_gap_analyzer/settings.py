@@ -55,6 +55,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # First, so its timings cover the rest of the stack
+    "analysis.middleware.InstrumentationMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "whitenoise.middleware.WhiteNoiseMiddleware",
     "corsheaders.middleware.CorsMiddleware",
@@ -64,6 +66,8 @@ MIDDLEWARE = [
     "django.contrib.auth.middleware.AuthenticationMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
+    # Last, so it profiles the view alone
+    "analysis.profiling.ProfilingMiddleware",
 
 ]
 
@@ -101,6 +105,174 @@ CORS_ALLOW_HEADERS = [
 # Frontend URL for password reset links
 FRONTEND_URL = os.getenv("FRONTEND_URL", "http://localhost:3000")
 
+# NLP pipeline
+# Skill matching only needs the spaCy tokenizer. Set NLP_FULL_PIPELINE=TRUE to
+# also run the tagger, parser, NER and lemmatizer of en_core_web_sm.
+NLP_FULL_PIPELINE = os.getenv("NLP_FULL_PIPELINE", "False").upper() == "TRUE"
+
+# The spaCy model is loaded on first use, so manage.py commands and requests
+# that never analyze text don't load it. Web entry points (wsgi.py/asgi.py)
+# load it at startup unless NLP_WARMUP=FALSE.
+NLP_WARMUP = os.getenv("NLP_WARMUP", "True").upper() == "TRUE"
+
+# Skill matcher: "phrasematcher" (spaCy), "automaton" (pure-Python Aho–Corasick,
+# no model needed) or "auto" (PhraseMatcher when the model is installed)
+SKILL_MATCHER = os.getenv("SKILL_MATCHER", "auto")
+
+# Skill taxonomy (ids, aliases, categories, parents); defaults to
+# analysis/nlp_module/data/skills_taxonomy.json
+SKILL_TAXONOMY_PATH = os.getenv("SKILL_TAXONOMY_PATH") or None
+
+# When TRUE a resume skill also satisfies its taxonomy parents in gap
+# analysis (Django counts for a Python requirement). Off by default, so a
+# job skill is only matched by the same skill.
+SKILL_PARENT_COVERAGE = os.getenv("SKILL_PARENT_COVERAGE", "False").upper() == "TRUE"
+
+# Precompiled taxonomy and matcher patterns written by
+# `manage.py build_skill_matcher`; ignored while stale. Set to "" to disable.
+SKILL_MATCHER_ARTIFACT = os.getenv("SKILL_MATCHER_ARTIFACT", os.path.join(BASE_DIR, "var", "skill_matcher.pkl")) or None
+
+# Seconds gunicorn lets a worker spend on one request before killing it
+# (gunicorn.conf.py reads the same variable). Slow work such as OpenAI calls
+# budgets itself below it.
+GUNICORN_TIMEOUT = int(os.getenv("GUNICORN_TIMEOUT", 120))
+
+# Background processing
+# Uploads return immediately and text/skill extraction runs in
+# `python manage.py process_tasks` (the Procfile worker). Set
+# RESUME_ASYNC_PROCESSING=FALSE to extract inside the upload request instead.
+RESUME_ASYNC_PROCESSING = os.getenv("RESUME_ASYNC_PROCESSING", "True").upper() == "TRUE"
+# Seconds after which a task left 'running' by a dead worker is retried
+TASK_LOCK_TIMEOUT = int(os.getenv("TASK_LOCK_TIMEOUT", 600))
+
+# Resume file storage (see analysis/storage.py)
+# Uploads are stored content-addressed (by SHA-256) outside the database.
+# Point RESUME_BLOB_STORE_ROOT at a persistent disk in production.
+RESUME_BLOB_STORE = {
+    "BACKEND": os.getenv("RESUME_BLOB_STORE_BACKEND", "analysis.storage.LocalBlobStore"),
+    "OPTIONS": {
+        "root": os.getenv("RESUME_BLOB_STORE_ROOT", os.path.join(BASE_DIR, "blobstore")),
+    },
+}
+# Unreferenced blobs are only deleted once they have not been saved for this
+# many seconds, which must outlast an upload request (see analysis/storage.py)
+BLOB_GC_GRACE = int(os.getenv("BLOB_GC_GRACE", max(3600, GUNICORN_TIMEOUT * 2)))
+
+# PDF text extraction (see analysis/text_extraction.py)
+# Pages beyond PDF_MAX_PAGES are ignored and a page taking longer than
+# PDF_PAGE_TIMEOUT seconds is skipped. PDFs with at least
+# PDF_PARALLEL_MIN_PAGES pages are split across PDF_EXTRACTION_WORKERS
+# processes; set it to 0 or 1 to always extract in-process.
+PDF_MAX_PAGES = int(os.getenv("PDF_MAX_PAGES", 40))
+PDF_PAGE_TIMEOUT = float(os.getenv("PDF_PAGE_TIMEOUT", 10))
+PDF_PARALLEL_MIN_PAGES = int(os.getenv("PDF_PARALLEL_MIN_PAGES", 6))
+PDF_EXTRACTION_WORKERS = int(os.getenv("PDF_EXTRACTION_WORKERS", 2))
+# Seconds one document may take in total, in-process or in the pool; by
+# default a quarter of GUNICORN_TIMEOUT is left for the rest of the upload
+PDF_EXTRACTION_BUDGET = float(os.getenv("PDF_EXTRACTION_BUDGET", GUNICORN_TIMEOUT * 0.75))
+
+# Largest number of jobs/resumes one /api/analyze/batch/ request may rank
+ANALYSIS_BATCH_MAX = int(os.getenv("ANALYSIS_BATCH_MAX", 200))
+
+# Process pool behind the async analyze endpoint (see analysis/analysis_pool.py).
+# Requests beyond ANALYSIS_POOL_MAX_PENDING in-flight analyses get a 429.
+ANALYSIS_POOL_WORKERS = int(os.getenv("ANALYSIS_POOL_WORKERS", os.cpu_count() or 1))
+ANALYSIS_POOL_MAX_PENDING = int(os.getenv("ANALYSIS_POOL_MAX_PENDING", ANALYSIS_POOL_WORKERS * 4))
+ANALYSIS_POOL_TIMEOUT = float(os.getenv("ANALYSIS_POOL_TIMEOUT", 60))
+
+# Result caches (see analysis/result_cache.py)
+# BACKEND: "locmem" (per-worker LRU), "django" (an alias from CACHES, e.g. a
+# DatabaseCache table shared by all workers) or "none". TTL is in seconds.
+RESULT_CACHES = {
+    "analysis": {
+        "BACKEND": os.getenv("ANALYSIS_CACHE_BACKEND", "locmem"),
+        "TTL": int(os.getenv("ANALYSIS_CACHE_TTL", 60 * 60 * 24)),
+        "MAX_ENTRIES": int(os.getenv("ANALYSIS_CACHE_MAX_ENTRIES", 512)),
+        "ALIAS": os.getenv("ANALYSIS_CACHE_ALIAS", "default"),
+    },
+    # LLM resume rewrites, keyed on the normalized input, model and prompt
+    # version; stored in the "llm" database cache so all workers share it
+    "generate_resume": {
+        "BACKEND": os.getenv("GENERATE_RESUME_CACHE_BACKEND", "django"),
+        "TTL": int(os.getenv("GENERATE_RESUME_CACHE_TTL", 60 * 60 * 24 * 7)),
+        "ALIAS": "llm",
+    },
+}
+
+# "llm" is a database table (created by `manage.py createcachetable`) that
+# survives restarts; once it holds MAX_ENTRIES rows the oldest third is culled.
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+    },
+    "llm": {
+        "BACKEND": "django.core.cache.backends.db.DatabaseCache",
+        "LOCATION": "llm_response_cache",
+        "OPTIONS": {
+            "MAX_ENTRIES": int(os.getenv("GENERATE_RESUME_CACHE_MAX_ENTRIES", 2000)),
+            "CULL_FREQUENCY": 3,
+        },
+    },
+}
+
+# OpenAI calls (see analysis/llm_client.py). OPENAI_BASE_URL can point at the
+# local stub (`manage.py run_openai_stub`) for tests and load tests.
+OPENAI_BASE_URL = os.getenv("OPENAI_BASE_URL") or None
+OPENAI_TIMEOUT = float(os.getenv("OPENAI_TIMEOUT", 30))
+OPENAI_CONNECT_TIMEOUT = float(os.getenv("OPENAI_CONNECT_TIMEOUT", 5))
+OPENAI_MAX_CONNECTIONS = int(os.getenv("OPENAI_MAX_CONNECTIONS", 20))
+OPENAI_MAX_CONCURRENCY = int(os.getenv("OPENAI_MAX_CONCURRENCY", 8))
+OPENAI_QUEUE_TIMEOUT = float(os.getenv("OPENAI_QUEUE_TIMEOUT", 5))
+# OPENAI_MAX_CONCURRENCY is enforced across all workers through this cache
+# alias; a slot held by a killed worker frees itself after OPENAI_SLOT_LEASE
+OPENAI_SLOT_CACHE = os.getenv("OPENAI_SLOT_CACHE", "llm")
+OPENAI_SLOT_LEASE = float(os.getenv("OPENAI_SLOT_LEASE", 120))
+OPENAI_MAX_RETRIES = int(os.getenv("OPENAI_MAX_RETRIES", 2))
+OPENAI_RETRY_BASE_DELAY = float(os.getenv("OPENAI_RETRY_BASE_DELAY", 0.5))
+OPENAI_RETRY_MAX_DELAY = float(os.getenv("OPENAI_RETRY_MAX_DELAY", 8))
+# Total seconds the OpenAI calls of one request may take, slot wait and
+# retries included; well inside GUNICORN_TIMEOUT by default
+OPENAI_REQUEST_DEADLINE = float(os.getenv("OPENAI_REQUEST_DEADLINE", GUNICORN_TIMEOUT * 0.75))
+
+# Request instrumentation (see analysis/instrumentation.py): stage timings and
+# SQL query counts per request, in a Server-Timing header, a JSON log line on
+# the "analysis.requests" logger and Prometheus histograms at /api/metrics/.
+# The metrics endpoint is open to staff users, or to scrapers sending
+# "Authorization: Bearer $METRICS_TOKEN".
+INSTRUMENTATION_ENABLED = os.getenv("INSTRUMENTATION_ENABLED", "True").upper() == "TRUE"
+SERVER_TIMING_HEADER = os.getenv("SERVER_TIMING_HEADER", "True").upper() == "TRUE"
+METRICS_TOKEN = os.getenv("METRICS_TOKEN", "")
+# Also report the query count in an X-DB-Queries header. Off by default;
+# manage.py load_test turns it on for the server it starts.
+QUERY_COUNT_HEADER = os.getenv("QUERY_COUNT_HEADER", "False").upper() == "TRUE"
+
+# On-demand profiling (see analysis/profiling.py). Staff can profile a request
+# to one of PROFILE_VIEWS with an "X-Profile: 1" header or ?profile=1; a
+# PROFILE_SAMPLE_RATE above 0 also profiles that share of all their requests.
+# The .prof files are rotated to stay within PROFILE_MAX_FILES and
+# PROFILE_MAX_BYTES, and listed in the admin under "Request profiles".
+PROFILING_ENABLED = os.getenv("PROFILING_ENABLED", "True").upper() == "TRUE"
+PROFILE_VIEWS = [
+    name.strip()
+    for name in os.getenv("PROFILE_VIEWS", "analyze_resume_job,resume-list,dashboard-stats").split(",")
+    if name.strip()
+]
+PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", 0))
+PROFILE_DIR = os.getenv("PROFILE_DIR", os.path.join(BASE_DIR, "var", "profiles"))
+PROFILE_MAX_FILES = int(os.getenv("PROFILE_MAX_FILES", 100))
+PROFILE_MAX_BYTES = int(os.getenv("PROFILE_MAX_BYTES", 50 * 1024 * 1024))
+
+# Speech assessment (see analysis/speech.py). Uploads are cut off past
+# SPEECH_MAX_BYTES; SPEECH_MAX_SECONDS applies where the duration is readable
+# from the header (WAV). Use analysis.speech.StubTranscriptionBackend for
+# offline tests and load tests.
+SPEECH_MAX_BYTES = int(os.getenv("SPEECH_MAX_BYTES", 25 * 1024 * 1024))
+SPEECH_MAX_SECONDS = int(os.getenv("SPEECH_MAX_SECONDS", 300))
+SPEECH_TRANSCRIPTION_BACKEND = {
+    "BACKEND": os.getenv("SPEECH_TRANSCRIPTION_BACKEND", "analysis.speech.OpenAITranscriptionBackend"),
+    "OPTIONS": {},
+}
+
 TEMPLATES = [
     {
         "BACKEND": "django.template.backends.django.DjangoTemplates",
@@ -128,10 +300,13 @@ DATABASES = {}
 # Production database configuration
 import dj_database_url
 if os.getenv("DATABASE_URL"):
+    # SSL is required for hosted Postgres; a local server or a SQLite URL
+    # (e.g. the one manage.py load_test creates) can't use it
     DATABASES["default"] = dj_database_url.config(
         default=os.getenv("DATABASE_URL"),
         conn_max_age=600,
-        ssl_require=True
+        ssl_require=(os.getenv("DATABASE_SSL_REQUIRE", "True").upper() == "TRUE"
+                     and not os.getenv("DATABASE_URL").startswith("sqlite"))
     )
 else:
     DB_NAME = os.getenv("DB_NAME", "carrier_gap_db")
@@ -274,6 +449,11 @@ SECURE_PROXY_SSL_HEADER = ('HTTP_X_FORWARDED_PROTO', 'https')
 # Logging Configuration
 import logging
 
+# Level of the root, django and analysis loggers. Warnings and errors only by
+# default, so SQL queries and HTTP client traces stay out of the console even
+# with DEBUG on; the per-request JSON lines have their own REQUEST_LOG_LEVEL.
+LOG_LEVEL = os.getenv("LOG_LEVEL", "WARNING")
+
 LOGGING = {
     'version': 1,
     'disable_existing_loggers': False,
@@ -282,30 +462,64 @@ LOGGING = {
             'format': '{levelname} {asctime} {module} {message}',
             'style': '{',
         },
+        # One JSON object per line, as written by InstrumentationMiddleware
+        'json': {
+            'format': '{message}',
+            'style': '{',
+        },
     },
     'handlers': {
         'console': {
             'class': 'logging.StreamHandler',
             'formatter': 'verbose',
         },
+        'json_console': {
+            'class': 'logging.StreamHandler',
+            'formatter': 'json',
+        },
     },
     'root': {
         'handlers': ['console'],
-        # Show less noise in production
-        'level': 'INFO' if not DEBUG else 'DEBUG',
+        'level': LOG_LEVEL,
     },
     'loggers': {
         'django': {
             'handlers': ['console'],
-            'level': 'INFO' if not DEBUG else 'DEBUG',
+            'level': LOG_LEVEL,
             'propagate': False,
         },
         'analysis': {
             'handlers': ['console'],
-            'level': 'DEBUG' if DEBUG else 'INFO',
+            'level': LOG_LEVEL,
+            'propagate': False,
+        },
+        # Per-request JSON lines; REQUEST_LOG_LEVEL=WARNING turns them off
+        'analysis.requests': {
+            'handlers': ['json_console'],
+            'level': os.getenv('REQUEST_LOG_LEVEL', 'INFO'),
+            'propagate': False,
+        },
+        # 🚫 Silence noisy libraries; these stay quiet whatever LOG_LEVEL says
+        'django.db.backends': {
+            'handlers': ['console'],
+            'level': 'WARNING',
+            'propagate': False,
+        },
+        'httpx': {
+            'handlers': ['console'],
+            'level': 'WARNING',
+            'propagate': False,
+        },
+        'httpcore': {
+            'handlers': ['console'],
+            'level': 'WARNING',
+            'propagate': False,
+        },
+        'openai': {
+            'handlers': ['console'],
+            'level': 'WARNING',
             'propagate': False,
         },
-        # 🚫 Silence noisy libraries
         'pdfminer': {
             'handlers': ['console'],
             'level': 'ERROR',  # suppress verbose debug logs
@@ -323,8 +537,3 @@ LOGGING = {
 logging.getLogger("pdfminer").setLevel(logging.ERROR)
 logging.getLogger("pdfplumber").setLevel(logging.ERROR)
 
-
-
-import logging
-logging.disable(logging.CRITICAL)
-
@@ -14,3 +14,12 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "carrier_gap_analyzer.settings")
 
 application = get_wsgi_application()
+
+# Load spaCy and the skill matchers before serving instead of on the first
+# analysis request (settings.NLP_WARMUP)
+from django.conf import settings  # noqa: E402
+
+if settings.NLP_WARMUP:
+    from analysis.nlp_module.nlp_setup import warm_up
+
+    warm_up()
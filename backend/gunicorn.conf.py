@@ -0,0 +1,35 @@
+"""
+Gunicorn settings for the web process
+
+With GUNICORN_PRELOAD (the default) the app is imported in the master before
+workers are forked. wsgi.py warms up spaCy and the skill matchers there, and
+when_ready() freezes the garbage collector so those objects are never touched
+by a collection in the workers; their pages then stay shared copy-on-write
+instead of being copied into every worker. `python manage.py memory_report`
+shows the resulting per-worker RSS/PSS.
+"""
+import gc
+import os
+
+preload_app = os.getenv("GUNICORN_PRELOAD", "True").upper() == "TRUE"
+workers = int(os.getenv("WEB_CONCURRENCY", 2))
+timeout = int(os.getenv("GUNICORN_TIMEOUT", 120))
+
+
+def when_ready(server):
+    if preload_app:
+        # Everything allocated so far (Django, the model, the matchers) moves
+        # to the permanent generation and is skipped by later collections
+        gc.freeze()
+        server.log.info(f"Preloaded app; froze {gc.get_freeze_count()} objects before forking workers")
+
+
+def post_fork(server, worker):
+    if not preload_app:
+        return
+    # Connections must never be shared between processes; the master only
+    # opens one if something queried the database while preloading
+    from django.db import connections
+
+    for connection in connections.all(initialized_only=True):
+        connection.close()